@@ -93,6 +93,18 @@ def create_app():
             "task": "server.celery_tasks.maintenance.delete_backed_up_files",
             "schedule": {"type": "crontab", "hour": 5, "minute":0},
         },
+        "rank-hot-posts": {
+            "task": "server.celery_tasks.maintenance.rank_hot_posts",
+            "schedule": {"type": "crontab", "minute": "*/10"},
+        },
+        "flush-reaction-counters": {
+            "task": "server.celery_tasks.maintenance.flush_reaction_counters",
+            "schedule": {"type": "crontab", "minute": "*"},
+        },
+        "purge-deleted-comments": {
+            "task": "server.celery_tasks.maintenance.purge_deleted_comments",
+            "schedule": {"type": "crontab", "minute": "*/15"},
+        },
     }
     
     @app.before_request
@@ -1,7 +1,7 @@
 import functools
 from flask import Blueprint, flash, g, request, session, current_app, jsonify, make_response
-from werkzeug.security import check_password_hash, generate_password_hash
-from .extensions import db
+from .extensions import db, get_redis
+from .passwords import hash_password, verify_password
 from .models import User, BlacklistedEmails
 from sqlalchemy.exc import IntegrityError
 from email_validator import validate_email, EmailNotValidError
@@ -15,6 +15,7 @@ import logging
 import traceback
 import regex
 import unicodedata
+import json
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -113,9 +114,11 @@ def register():
     
     try:
         from .celery_tasks import send_verification_email
-        new_user = User(username=username, password=generate_password_hash(password, method='pbkdf2:sha256'), email=email_form, lang=lang)
+        new_user = User(username=username, password=hash_password(password), email=email_form, lang=lang)
         db.session.add(new_user)
         db.session.commit()       
+        from .blog import username_index_add
+        username_index_add([(new_user.id, new_user.username)])
         send_verification_email.delay(new_user.id)
         return '', 201
                 
@@ -230,6 +233,7 @@ def confirm_email(token):
       user.is_active = True
       user.reset_token_issued_at = datetime.utcnow()
       db.session.commit()
+      invalidate_session_user(user.id)
       return '', 200
         
 
@@ -271,7 +275,7 @@ def login():
 
         if user is None:
             return jsonify(message="USERNAME_OR_PASSWORD_NOT_VALID"), 400
-        elif not check_password_hash(user.password, password): 
+        elif not verify_password(user.password, password): 
             return jsonify(message="USERNAME_OR_PASSWORD_NOT_VALID"), 400
         elif not user.is_active:
             return jsonify(message="USER_NOT_ACTIVE"), 400
@@ -288,7 +292,10 @@ def login():
             user.is_suspended = False
             user.is_tobedeleted = False
             db.session.commit()
+            from .blog import user_suspension_changed
+            user_suspension_changed(user.id, False)
   
+        invalidate_session_user(user.id)
         session.clear()                     
         session['user_id'] = user.id               
         
@@ -388,7 +395,7 @@ def reset_password(token):
         if password1 != password2:
             return jsonify(message="PASSWORD_DONT_CORRESPOND"), 400
         try:
-            user.password = generate_password_hash(password1, method='pbkdf2:sha256')  
+            user.password = hash_password(password1)  
             user.reset_token_issued_at = datetime.utcnow()             
             db.session.commit()
             return '', 200
@@ -409,6 +416,81 @@ def reset_password(token):
 ###############################################################################################################
     
 
+# The request identity is a snapshot of the session's user (SESSION_USER_FIELDS) kept in Redis (user:{id}:session),
+# so most requests never read the user row and its MEDIUMTEXT bio. Any other attribute loads the full row on first
+# use and attribute writes go to that row; handlers that change a snapshotted field call invalidate_session_user
+# after committing. There is no per-process copy: a suspension or deactivation must reach every worker at once.
+# The snapshot carries the user:{id}:session:gen it was loaded under, and one written by a load that raced an
+# invalidation is ignored and reloaded.
+SESSION_USER_FIELDS = ("id", "username", "lang", "is_active", "is_premium", "is_suspended", "is_moderated")
+SESSION_USER_REDIS_TTL = 3600
+
+
+class SessionUser:
+    __slots__ = ("_snapshot", "_row")
+
+    def __init__(self, snapshot):
+        object.__setattr__(self, "_snapshot", snapshot)
+        object.__setattr__(self, "_row", None)
+
+    @property
+    def row(self) -> User:
+        if self._row is None:
+            object.__setattr__(self, "_row", db.session.get(User, self._snapshot["id"]))
+        return self._row
+
+    def __getattr__(self, name):
+        if self._row is None and name in self._snapshot:
+            return self._snapshot[name]
+        return getattr(self.row, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.row, name, value)
+
+
+def _load_session_snapshot(user_id):
+    row = db.session.query(*[getattr(User, f) for f in SESSION_USER_FIELDS]).filter(User.id == user_id).first()
+    return dict(zip(SESSION_USER_FIELDS, row)) if row else None
+
+
+def session_user(user_id):
+
+    snapshot = None
+    key = f"user:{int(user_id)}:session"
+    try:
+        r = get_redis()
+        raw, gen = r.mget(key, f"{key}:gen")
+        gen = int(gen or 0)
+        cached = json.loads(raw) if raw else None
+        if cached and cached.get("gen") == gen:
+            snapshot = cached["user"]
+        else:
+            snapshot = _load_session_snapshot(user_id)
+            if snapshot:
+                r.set(key, json.dumps({"gen": gen, "user": snapshot}), ex=SESSION_USER_REDIS_TTL)
+    except Exception as e:
+        auth_logger.error(f"[{datetime.utcnow()}] SESSION USER CACHE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        if snapshot is None:
+            snapshot = _load_session_snapshot(user_id)
+    if snapshot is None:
+        return None
+
+    return SessionUser(snapshot)
+
+
+def invalidate_session_user(*user_ids):
+    if not user_ids:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        for uid in user_ids:
+            pipe.incr(f"user:{int(uid)}:session:gen")
+            pipe.delete(f"user:{int(uid)}:session")
+        pipe.execute()
+    except Exception as e:
+        auth_logger.error(f"[{datetime.utcnow()}] SESSION USER CACHE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+
 @bp.before_app_request
 def load_logged_in_user():
     user_id = session.get('user_id')
@@ -416,7 +498,7 @@ def load_logged_in_user():
     if user_id is None:
         g.user = None
     else:
-        g.user = User.query.filter_by(id = user_id).first()
+        g.user = session_user(user_id)
     
       
 ###############################################################################################################
@@ -479,6 +561,7 @@ def login_required(view):
 @login_required
 def logout():
     try:
+        invalidate_session_user(g.user.id)
         session.clear()
         resp = jsonify(message="Logout succesful!")
         resp.set_cookie('session', '', expires=0)
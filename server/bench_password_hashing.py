@@ -0,0 +1,58 @@
+# Gevent hub latency during a burst of concurrent logins, with the password check run inline in each greenlet (as
+# login did before) and through server.passwords.verify_password. A ticker greenlet sleeps TICK seconds in a loop and
+# records how late it wakes up, which is how long chat sockets on the worker would have waited.
+# Run from the repository root on an app host:
+#     USE_GEVENT_PATCH=1 python -m server.bench_password_hashing --logins 50
+# (the variable makes the server package patch before anything else is imported)
+from gevent import monkey
+monkey.patch_all()
+
+import argparse, time
+import gevent
+from gevent.event import Event
+from werkzeug.security import check_password_hash, generate_password_hash
+from server.passwords import verify_password, PASSWORD_HASH_METHOD, PASSWORD_HASH_CONCURRENCY
+
+TICK = 0.005
+
+
+def hub_lag(stop, lags):
+    while not stop.is_set():
+        start = time.perf_counter()
+        gevent.sleep(TICK)
+        lags.append((time.perf_counter() - start - TICK) * 1000)
+
+
+def burst(check, pwhash, logins):
+    lags = []
+    stop = Event()
+    ticker = gevent.spawn(hub_lag, stop, lags)
+    gevent.sleep(0.2)
+    del lags[:]
+
+    started = time.perf_counter()
+    gevent.joinall([gevent.spawn(check, pwhash, "not the password") for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    ticker.join()
+    return elapsed, sorted(lags)
+
+
+def report(label, elapsed, lags, logins):
+    def pct(q):
+        return lags[min(len(lags) - 1, int(q * len(lags)))]
+    print(f"{label:<8} {logins / elapsed:8.1f} checks/s | hub lag ms  p50 {pct(0.5):8.2f}  p99 {pct(0.99):8.2f}  max {lags[-1]:8.2f}  ({len(lags)} ticks)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    pwhash = generate_password_hash("Bench-password-1", method=PASSWORD_HASH_METHOD)
+    print(f"{PASSWORD_HASH_METHOD}, {args.logins} concurrent checks, PASSWORD_HASH_CONCURRENCY={PASSWORD_HASH_CONCURRENCY}")
+    for _ in range(args.rounds):
+        report("inline", *burst(check_password_hash, pwhash, args.logins), args.logins)
+        report("pool", *burst(verify_password, pwhash, args.logins), args.logins)
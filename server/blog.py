@@ -1,33 +1,40 @@
-import re, os, stripe, functools, bleach, magic, traceback, logging, regex, json, typing as t, unicodedata, hmac, hashlib, time
+import re, os, stripe, functools, bleach, magic, traceback, logging, regex, json, typing as t, unicodedata, hmac, hashlib, time, base64, gzip, math
 from flask import Blueprint, g, request, session, jsonify, current_app, redirect, send_file
-from werkzeug.security import check_password_hash, generate_password_hash
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
-from .models import FileUpload, User, BioAttachment, BlockedUsers, FavoriteUsers, Post, PostAttachment, Comment, PostReactions, CommentAttachment, CommentReactions, Notification
-from .extensions import db, csrf
+from .models import FileUpload, User, BioAttachment, BlockedUsers, FavoriteUsers, Post, PostAttachment, Comment, PostReactions, CommentAttachment, CommentReactions, Notification, MessageAttachment, PostSlugHistory, SlugCounter, CommentClosure
+from .extensions import db, csrf, get_redis
+from redis.exceptions import WatchError
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func, select, update, union_all, exists, or_, and_, case, true, delete
-from sqlalchemy.sql import bindparam
-from sqlalchemy.orm import joinedload, aliased
+from sqlalchemy import func, select, update, union_all, exists, or_, and_, case, true, delete, literal, insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import joinedload, aliased, load_only
 from email_validator import validate_email, EmailNotValidError
 from .extensions import mail, limiter
 from .auth import login_required
 from werkzeug.utils import secure_filename
-from datetime import datetime, timezone
-from slugify import slugify
+from datetime import datetime, timezone, timedelta
+from .slugs import slug_base, next_free_slug
 from flask_mail import Message
 from PIL import Image
-from .auth import is_valid_user, is_valid_password, USER_RE, PWD_RE
+from .auth import is_valid_user, is_valid_password, USER_RE, PWD_RE, invalidate_session_user
+from .passwords import hash_password, verify_password
 from collections import defaultdict
+import heapq
 from bs4 import BeautifulSoup
 from flask_wtf.csrf import CSRFError
 from random import choices
 from cachetools import TTLCache
 from uuid import uuid4
 from urllib.parse import urljoin
-import boto3
+import boto3, click
 from pathlib import Path
 import subprocess
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 
 
 
@@ -188,32 +195,86 @@ def abs_url(path: str) -> str:
 
 
 
-def serialize_upload(fu):    
-    variants = getattr(fu, 'variants', None)
-    url = None
-    thumbnail = None
-    if not variants:
-        url = abs_url(f"static/uploads/{os.path.basename(fu.path)}")
-        if fu.thumbnail is not None:
-            thumbnail = abs_url(f"static/uploads/{os.path.basename(fu.thumbnail)}")
+# Absolute urls of an upload, computed once when the file is approved and stored in file_uploads.public_urls.
+# "src" records what they were built from so rows whose variants changed afterwards are rebuilt on the fly.
+def upload_public_urls(fu):
+    variants = fu.variants or None
+    urls = {"src": [fu.path, fu.thumbnail, variants], "url": None, "thumbnail": None, "variants": None}
+    if variants:
+        urls["variants"] = {k: abs_url(v) for k, v in variants.items()}
     else:
-        for k, v in list(variants.items()):
-            variants[k] = abs_url(v)
+        urls["url"] = abs_url(f"static/uploads/{os.path.basename(fu.path)}")
+        if fu.thumbnail is not None:
+            urls["thumbnail"] = abs_url(f"static/uploads/{os.path.basename(fu.thumbnail)}")
+    return urls
+    
+    
+# Serialized uploads are shared between requests: treat them as read-only.
+ATTACHMENT_CACHE = TTLCache(maxsize=50000, ttl=3600)
+
 
-    return {
+def serialize_upload(fu):
+    
+    # every column the serialized form is derived from, so a change to any of them misses the cache
+    fingerprint = (fu.status, fu.path, fu.thumbnail, fu.filename, fu.mime, fu.width, fu.height, fu.duration_sec, fu.w_path, str(fu.w_variants), str(fu.variants), str(fu.public_urls))
+    cached = ATTACHMENT_CACHE.get(fu.id)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+        
+    urls = fu.public_urls
+    if not urls or urls.get("src") != [fu.path, fu.thumbnail, fu.variants or None]:
+        urls = upload_public_urls(fu)
+        
+    data = {
         "id": int(fu.id),
         "mime": fu.mime,
-        "variants": variants,
-        "url": url,
+        "variants": urls["variants"],
+        "url": urls["url"],
         "w_variants": fu.w_variants,
         "w_path": fu.w_path,
-        "width": getattr(fu, 'width', None),
-        "height": getattr(fu, 'height', None),
-        "duration_sec": getattr(fu, 'duration_sec', None),
+        "width": fu.width,
+        "height": fu.height,
+        "duration_sec": fu.duration_sec,
         "status": fu.status,
         "name": fu.filename,
-        "thumbnail": thumbnail
+        "thumbnail": urls["thumbnail"]
     }
+    ATTACHMENT_CACHE[fu.id] = (fingerprint, data)
+    return data
+    
+    
+ATTACHMENT_LINKS = {
+    "post": (PostAttachment, PostAttachment.post_id),
+    "comment": (CommentAttachment, CommentAttachment.comment_id),
+    "message": (MessageAttachment, MessageAttachment.message_id),
+    "bio": (BioAttachment, BioAttachment.user_id),
+}
+
+
+# One round trip for any mix of parents: load_attachment_groups({"post": [...], "comment": [...]})
+# returns {kind: {parent_id: [serialized uploads]}}.
+def load_attachment_groups(groups):
+    
+    selects = []
+    for kind, ids in groups.items():
+        ids = list(ids)
+        if ids:
+            link, parent_col = ATTACHMENT_LINKS[kind]
+            selects.append(select(literal(kind).label("kind"), parent_col.label("parent_id"), link.file_upload_id.label("upload_id")).where(parent_col.in_(ids)))
+            
+    out = {kind: defaultdict(list) for kind in groups}
+    if not selects:
+        return out
+        
+    links = (union_all(*selects) if len(selects) > 1 else selects[0]).subquery()
+    rows = db.session.query(links.c.kind, links.c.parent_id, FileUpload).join(FileUpload, FileUpload.id == links.c.upload_id).order_by(FileUpload.id.asc()).all()
+    for kind, parent_id, fu in rows:
+        out[kind][parent_id].append(serialize_upload(fu))
+    return out
+    
+    
+def load_attachments(kind, parent_ids):
+    return load_attachment_groups({kind: parent_ids})[kind]
 
 
 
@@ -332,7 +393,8 @@ def edit_user():
             db.session.bulk_save_objects([ BioAttachment(user_id=g.user.id, file_upload_id=fid) for fid in to_add ])
             
         db.session.commit()
-        atts = db.session.query(FileUpload).join(BioAttachment, BioAttachment.file_upload_id == FileUpload.id).filter(BioAttachment.user_id == g.user.id).all()        
+        invalidate_session_user(g.user.id)
+        atts = load_attachments("bio", [g.user.id])[g.user.id]
         
         if email_changed:
             from .celery_tasks import send_verification_email
@@ -347,7 +409,7 @@ def edit_user():
             "age": g.user.age,
             "bio": g.user.bio,
             "sex": g.user.sex,
-            "attachments": [serialize_upload(a) for a in atts],
+            "attachments": atts,
         }      
         
         return jsonify(data=data, message=msg), 200    
@@ -368,9 +430,220 @@ def edit_user():
 ###############################################################################################################
 
 
+# Block graph: each user's blocking / blocked-by ids are loaded with one query, kept in Redis as blocks:{id}
+# ("b:<id>" = I blocked, "r:<id>" = blocked me, "-" marks the set as loaded even when empty), memoised per process
+# and per request. block_user/unblock_user bump blocks:{id}:gen for both sides after committing: a rebuild only
+# writes the set back if the generation it started from is still current, and the process copy is only reused
+# while its generation matches.
+class BlockSet(t.NamedTuple):
+    blocking: frozenset
+    blocked_by: frozenset
+    hidden: frozenset
+
+
+EMPTY_BLOCK_SET = BlockSet(frozenset(), frozenset(), frozenset())
+BLOCK_LOCAL_CACHE = TTLCache(maxsize=20000, ttl=10)
+BLOCK_REDIS_TTL = 600
+
+
+def _block_set(blocking, blocked_by):
+    return BlockSet(frozenset(blocking), frozenset(blocked_by), frozenset(blocking) | frozenset(blocked_by))
+
+
+# {user_id: BlockSet} for all of user_ids from one statement
+def _load_block_sets(user_ids):
+    B = BlockedUsers
+    stmt = union_all(select(B.blocker_id, B.blocked_id).where(B.blocker_id.in_(user_ids)), select(B.blocker_id, B.blocked_id).where(B.blocked_id.in_(user_ids)))
+    blocking, blocked_by = defaultdict(set), defaultdict(set)
+    for blocker, blocked in db.session.execute(stmt).all():
+        blocking[blocker].add(blocked)
+        blocked_by[blocked].add(blocker)
+    return {uid: _block_set(blocking[uid], blocked_by[uid]) for uid in user_ids}
+
+
+# Runs write(pipe) in a MULTI only while every gen_keys[i] still holds gens[i]; a bump in between drops the write.
+def write_if_generations(r, gen_keys, gens, write):
+    try:
+        with r.pipeline(transaction=True) as pipe:
+            pipe.watch(*gen_keys)
+            if list(pipe.mget(gen_keys)) != list(gens):
+                return False
+            pipe.multi()
+            write(pipe)
+            pipe.execute()
+            return True
+    except WatchError:
+        return False
+
+
+# {user_id: BlockSet} with a fixed number of round trips however many users are asked for
+def block_sets(user_ids) -> dict:
+
+    memo = g.setdefault("block_sets", {})
+    ids = list({uid for uid in user_ids if uid is not None and uid not in memo})
+
+    if ids:
+        found = {}
+        gens = None
+        try:
+            r = get_redis()
+            gens = dict(zip(ids, r.mget([f"blocks:{uid}:gen" for uid in ids])))
+            for uid in ids:
+                cached = BLOCK_LOCAL_CACHE.get(uid)
+                if cached is not None and cached[0] == gens[uid]:
+                    found[uid] = cached[1]
+
+            pending = [uid for uid in ids if uid not in found]
+            if pending:
+                pipe = r.pipeline(transaction=False)
+                for uid in pending:
+                    pipe.smembers(f"blocks:{uid}")
+                for uid, members in zip(pending, pipe.execute()):
+                    if members:
+                        blocking, blocked_by = set(), set()
+                        for m in members:
+                            kind, _, other = m.decode().partition(":")
+                            if kind == "b":
+                                blocking.add(int(other))
+                            elif kind == "r":
+                                blocked_by.add(int(other))
+                        found[uid] = _block_set(blocking, blocked_by)
+
+            missing = [uid for uid in ids if uid not in found]
+            if missing:
+                loaded = _load_block_sets(missing)
+                found.update(loaded)
+
+                def write(pipe):
+                    for uid, bs in loaded.items():
+                        key = f"blocks:{uid}"
+                        pipe.delete(key)
+                        pipe.sadd(key, "-", *[f"b:{other}" for other in bs.blocking], *[f"r:{other}" for other in bs.blocked_by])
+                        pipe.expire(key, BLOCK_REDIS_TTL)
+
+                write_if_generations(r, [f"blocks:{uid}:gen" for uid in missing], [gens[uid] for uid in missing], write)
+
+        except Exception as e:
+            blog_logger.error(f"[{datetime.utcnow()}] BLOCK CACHE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+            gens = None
+            missing = [uid for uid in ids if uid not in found]
+            if missing:
+                found.update(_load_block_sets(missing))
+
+        for uid in ids:
+            memo[uid] = found[uid]
+            if gens is not None:
+                BLOCK_LOCAL_CACHE[uid] = (gens[uid], found[uid])
+
+    return {uid: memo[uid] if uid is not None else EMPTY_BLOCK_SET for uid in user_ids}
+
+
+def block_set(user_id) -> BlockSet:
+    if user_id is None:
+        return EMPTY_BLOCK_SET
+    return block_sets([user_id])[user_id]
+
+
+def invalidate_block_sets(*user_ids):
+    memo = g.get("block_sets", {})
+    for uid in user_ids:
+        BLOCK_LOCAL_CACHE.pop(uid, None)
+        memo.pop(uid, None)
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        for uid in user_ids:
+            pipe.incr(f"blocks:{uid}:gen")
+            pipe.delete(f"blocks:{uid}")
+        pipe.execute()
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] BLOCK CACHE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+
+def viewer_block_ids(viewer_id) -> frozenset:
+    return block_set(viewer_id).hidden
+
+
+def not_hidden(column, hidden):
+    return column.notin_(hidden) if hidden else true()
+
+
 def is_user_blocked(a: int, b: int) -> bool:
-    stmt = select(exists().where(BlockedUsers.blocker_id == a, BlockedUsers.blocked_id == b,))
-    return db.session.scalar(stmt)
+    return b in block_set(a).blocking
+
+
+# Suspended accounts, kept as one Redis set (users:suspended, "-" marks it loaded) plus a per-process and a
+# per-request copy, all tied to users:suspended:gen like the block sets. A suspension change bumps the generation
+# and drops the set, which the next reader rebuilds from MySQL.
+SUSPENDED_KEY = "users:suspended"
+SUSPENDED_GEN_KEY = "users:suspended:gen"
+SUSPENDED_LOCAL_CACHE = TTLCache(maxsize=1, ttl=10)
+SUSPENDED_REDIS_TTL = 3600
+
+
+def _load_suspended_ids():
+    return frozenset(db.session.scalars(select(User.id).where(User.is_suspended.is_(True))))
+
+
+def suspended_user_ids() -> frozenset:
+
+    if "suspended_ids" in g:
+        return g.suspended_ids
+
+    ids = None
+    gen = None
+    try:
+        r = get_redis()
+        gen = r.get(SUSPENDED_GEN_KEY)
+        cached = SUSPENDED_LOCAL_CACHE.get(SUSPENDED_KEY)
+        if cached is not None and cached[0] == gen:
+            ids = cached[1]
+        else:
+            members = r.smembers(SUSPENDED_KEY)
+            if members:
+                ids = frozenset(int(m) for m in members if m != b"-")
+            else:
+                ids = _load_suspended_ids()
+
+                def write(pipe):
+                    pipe.sadd(SUSPENDED_KEY, "-", *ids)
+                    pipe.expire(SUSPENDED_KEY, SUSPENDED_REDIS_TTL)
+
+                write_if_generations(r, [SUSPENDED_GEN_KEY], [gen], write)
+            SUSPENDED_LOCAL_CACHE[SUSPENDED_KEY] = (gen, ids)
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] SUSPENDED CACHE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        if ids is None:
+            ids = _load_suspended_ids()
+
+    g.suspended_ids = ids
+    return ids
+
+
+# called after the change is committed
+def set_suspended_ids(user_ids, suspended):
+    SUSPENDED_LOCAL_CACHE.clear()
+    g.pop("suspended_ids", None)
+    if not user_ids:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.incr(SUSPENDED_GEN_KEY)
+        pipe.delete(SUSPENDED_KEY)
+        pipe.execute()
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] SUSPENDED CACHE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+
+def user_suspension_changed(user_id, suspended):
+    set_suspended_ids([user_id], suspended)
+    invalidate_session_user(user_id)
+    account = db.session.query(User.id, User.username).filter(User.id == user_id).all()
+    if suspended:
+        feed_index_remove_author(user_id)
+        username_index_remove(account)
+    else:
+        feed_index_add_author(user_id)
+        username_index_add(account)
     
     
 def favorite_stats(session, a: int, b: int) -> tuple[int, bool]:    
@@ -392,7 +665,7 @@ def get_user_by_id(user_id):
     try:
         user_id = int(user_id)
         user = User.query.filter_by(id = user_id).first()      
-        atts = db.session.query(FileUpload).join(BioAttachment, BioAttachment.file_upload_id == FileUpload.id).filter(BioAttachment.user_id == user_id).all()
+        atts = load_attachments("bio", [user_id])[user_id]
         message = ''
     
         if user is None:
@@ -431,7 +704,7 @@ def get_user_by_id(user_id):
             "sex": user.sex,
             "is_favorited": is_favorited,
             "n_favorites": n_favorites,
-            "attachments": [serialize_upload(a) for a in atts],
+            "attachments": atts,
         }
         return jsonify(data), 200
         
@@ -468,6 +741,7 @@ def change_language():
 
         user.lang = lang
         db.session.commit()
+        invalidate_session_user(user.id)
         return jsonify(ok=True, lang=lang), 200
 
     except Exception as e:
@@ -494,14 +768,15 @@ def modify_password():
         
         if not is_valid_password(password1) or not is_valid_password(password2) or not is_valid_password(old_password):
             return jsonify(message="PASSWORD_NOT_VALID"), 400
-        if not check_password_hash(g.user.password, old_password): 
+        if not verify_password(g.user.password, old_password): 
             return jsonify(message="CURRENT_PASSWORD_WRONG"), 400     
         if password1 != password2:
             return jsonify(message="PASSWORD_DONT_CORRESPOND"), 400
         try:
-            g.user.password = generate_password_hash(password1, method='pbkdf2:sha256')  
+            g.user.password = hash_password(password1)  
             g.user.reset_token_issued_at = datetime.utcnow()             
             db.session.commit()
+            invalidate_session_user(g.user.id)
             return '', 200
         except IntegrityError as e:
             db.session.rollback()
@@ -526,21 +801,61 @@ def to_iso_utc(dt):
     return dt.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
 
 
+# slug_counter holds, per base slug, the last suffix handed out; the upsert locks that row until the post
+# is committed, so concurrent posts with the same title get distinct numbers. A suffix can still land on a slug
+# some other title produced ("Foo 1" takes foo-1 before the second "Foo"), so the counter is bumped past any
+# slug already used by a post or kept in the slug history. Every slug handed out also gets a counter row of its
+# own so a later title slugifying to it starts from there.
+def slug_taken(slug):
+    return db.session.scalar(select(exists().where(Post.slug == slug))) or db.session.scalar(select(exists().where(PostSlugHistory.slug == slug)))
+
+
 def create_slug(title):
-    slug = slugify(title)  
-    existing = Post.query.filter(Post.slug.like(f"{slug}%")).all()
-    if existing:
-        numbers = []
-        for post in existing:
-            parts = post.slug.rsplit("-", 1)
-            if len(parts) > 1 and parts[-1].isdigit():
-                numbers.append(int(parts[-1]))
-        if numbers:
-            new_number = max(numbers) + 1
-            slug = f"{slug}-{new_number}"
-        else:
-            slug = f"{slug}-1"
-    return slug       
+    base = slug_base(title)
+
+    def bump():
+        db.session.execute(mysql_insert(SlugCounter).values(base=base, n=0).on_duplicate_key_update(n=SlugCounter.n + 1))
+        return db.session.scalar(select(SlugCounter.n).where(SlugCounter.base == base))
+
+    slug = next_free_slug(base, bump, slug_taken)
+    if slug != base:
+        db.session.execute(mysql_insert(SlugCounter).prefix_with("IGNORE").values(base=slug, n=0))
+    return slug
+    
+    
+def resolve_slug(slug):
+    post_id = db.session.scalar(select(Post.id).where(Post.slug == slug))
+    if post_id is None:
+        post_id = db.session.scalar(select(PostSlugHistory.post_id).where(PostSlugHistory.slug == slug))
+    return post_id
+    
+    
+@bp.cli.command('seed-slug-counters')
+def seed_slug_counters_command():
+    
+    counters = {}
+    for model, key in ((Post, Post.id), (PostSlugHistory, PostSlugHistory.slug)):
+        last = None
+        while True:
+            q = db.session.query(key, model.slug).order_by(key.asc()).limit(5000)
+            rows = (q.filter(key > last) if last is not None else q).all()
+            if not rows:
+                break
+            for _, slug in rows:
+                if not slug:
+                    continue
+                counters.setdefault(slug, 0)
+                base, sep, suffix = slug.rpartition("-")
+                if sep and suffix.isdigit():
+                    counters[base] = max(counters.get(base, 0), int(suffix))
+            last = rows[-1][0]
+            
+    items = list(counters.items())
+    for i in range(0, len(items), 1000):
+        stmt = mysql_insert(SlugCounter).values([{"base": base, "n": n} for base, n in items[i:i + 1000]])
+        db.session.execute(stmt.on_duplicate_key_update(n=func.greatest(SlugCounter.n, stmt.inserted.n)))
+        db.session.commit()
+    click.echo(f"Seeded {len(items)} slug counters")
      
 
 def serialize_post(post):
@@ -557,122 +872,211 @@ def serialize_post(post):
     n_comments = post.n_comments
     
     author_username = db.session.query(User.username).filter(User.id == author_id).scalar()
-    atts = (db.session.query(FileUpload).join(PostAttachment, PostAttachment.file_upload_id == FileUpload.id).filter(PostAttachment.post_id == post.id).all())
+    atts = load_attachments("post", [post.id])[post.id]
     
-    C = Comment
-    B = BlockedUsers
     R = PostReactions
-    U = User
-    C2 = aliased(C)
     
     viewer_id = getattr(getattr(g, "user", None), "id", None)
+    hidden = viewer_block_ids(viewer_id)
     
-    if viewer_id is None:   
-        not_blocked_parent = true()
-        not_blocked_child = true()
-        
-    else:   
-        not_blocked_parent = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)).correlate(C))       
-        not_blocked_child = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id),and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2))
-        
-        like_sum, dislike_sum = (db.session.query(func.sum(case((R.value == 1, 1), else_=0)), func.sum(case((R.value == -1, 1), else_=0)),).filter(R.post_id == post_id).filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == R.user_id), and_(B.blocker_id == R.user_id, B.blocked_id == viewer_id),)))).one()
+    if hidden:   
+        like_sum, dislike_sum = (db.session.query(func.sum(case((R.value == 1, 1), else_=0)), func.sum(case((R.value == -1, 1), else_=0)),).filter(R.post_id == post_id, R.user_id.notin_(hidden))).one()
         likes    = int(like_sum or 0)
         dislikes = int(dislike_sum or 0)
               
-    root_filter = C.parent_id.is_(None)
-    seed = db.session.query(C.id.label("id"), C.post_id.label("post_id")).join(U, U.id == C.author_id).filter(C.post_id == post_id, U.is_suspended.is_(False), root_filter, not_blocked_parent)
-    tree = seed.cte(name="visible_tree", recursive=True)
-    step = db.session.query(C2.id, C2.post_id).join(tree, C2.parent_id == tree.c.id).join(U, U.id == C2.author_id).filter(not_blocked_child, U.is_suspended.is_(False))
-    tree = tree.union_all(step)
-    n_comments = int(db.session.query(func.count()).select_from(tree).scalar() or 0) 
+    n_comments = visible_comment_counts({post_id: post.n_comments}, hidden)[post_id]
     
-    if viewer_id is not None:  
-        r = PostReactions.query.get((viewer_id, post_id))
-        is_liked   = (r is not None and r.value == 1)
-        is_disliked = (r is not None and r.value == -1)
+    value = viewer_reactions(viewer_id, "p", [post_id]).get(post_id)
+    is_liked   = (value == 1)
+    is_disliked = (value == -1)
         
-    else:
-        is_liked = False
-        is_disliked = False
-        
-    data = {"post_id" : post_id, "author_id" : author_id, "title" : title, "category" : category, "body" : body, "slug" : slug,  "is_modified" : is_modified, "likes" : likes, "dislikes" : dislikes, "created" : created, "n_comments" : n_comments, "is_liked" : is_liked, "is_disliked" : is_disliked, "isliking" : False, "isdisliking" : False, "isreplying" : False, "author_username" : author_username, "attachments": [serialize_upload(a) for a in atts],}
+    data = {"post_id" : post_id, "author_id" : author_id, "title" : title, "category" : category, "body" : body, "slug" : slug,  "is_modified" : is_modified, "likes" : likes, "dislikes" : dislikes, "created" : created, "n_comments" : n_comments, "is_liked" : is_liked, "is_disliked" : is_disliked, "isliking" : False, "isdisliking" : False, "isreplying" : False, "author_username" : author_username, "attachments": atts,}
     return data
 
 
 
 def calc_n_comments(post):
     post_id = post.id
-    n_comments = post.n_comments
+    n_comments = db.session.scalar(select(Post.n_comments).where(Post.id == post_id))
     
-    C = Comment
-    B = BlockedUsers
-    R = PostReactions
-    U = User
-    C2 = aliased(C)
     viewer_id = getattr(getattr(g, "user", None), "id", None)
-    
-    if viewer_id is None:   
-        not_blocked_parent = true()
-        not_blocked_child = true()
-        
-    else:
-        not_blocked_parent = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)).correlate(C))
-        not_blocked_child = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id),and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2))
-                       
-    root_filter = C.parent_id.is_(None)
-    seed = db.session.query(C.id.label("id"), C.post_id.label("post_id")).join(U, U.id == C.author_id).filter(C.post_id == post_id, U.is_suspended.is_(False), root_filter, not_blocked_parent)
-    tree = seed.cte(name="visible_tree", recursive=True)
-    step = db.session.query(C2.id, C2.post_id).join(U, U.id == C2.author_id).join(tree, C2.parent_id == tree.c.id).filter(not_blocked_child, U.is_suspended.is_(False))
-    tree = tree.union_all(step)
-    n_comments = int(db.session.query(func.count()).select_from(tree).scalar() or 0) 
+    n_comments = visible_comment_counts({post_id: n_comments}, viewer_block_ids(viewer_id))[post_id]
         
     data = {"post_id" : post_id, "n_comments" : n_comments,}
     return data
 
 
 
-def calc_likes_post(post):
+def fetch_post_info(post):
     post_id = post.id
-    likes = post.likes
-    dislikes = post.dislikes
-
-    C = Comment
-    B = BlockedUsers
-    R = PostReactions
-    viewer_id = getattr(getattr(g, "user", None), "id", None)
+    author_id = post.author_id
+    title = post.title
+    slug = post.slug
     
-    if viewer_id is not None:
+    author_username = db.session.query(User.username).filter(User.id == author_id).scalar()
+                
+    data = {"post_id" : post_id, "author_id" : author_id, "title" : title, "slug" : slug, "author_username" : author_username, }
+    return data
+
+
+# get-post is assembled from two statements (post + author, attachments) as an anonymous visitor sees it,
+# cached against post:{id}:ver and personalised with overlay_post_items().
+POST_DETAIL_TTL = 120
+
+
+def load_post_detail(post_id):
     
-        like_sum, dislike_sum = (db.session.query(func.sum(case((R.value == 1, 1), else_=0)), func.sum(case((R.value == -1, 1), else_=0)),).filter(R.post_id == post_id).filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == R.user_id), and_(B.blocker_id == R.user_id, B.blocked_id == viewer_id),)))).one()
+    row = db.session.query(Post, User.username).join(User, User.id == Post.author_id).filter(Post.id == post_id, User.is_suspended.is_(False)).first()
+    if row is None:
+        return None
         
-        likes    = int(like_sum or 0)
-        dislikes = int(dislike_sum or 0)
+    post, author_username = row
+    likes, dislikes = reaction_counts("p", [post.id])[post.id]
+    return {"post_id" : post.id, "author_id" : post.author_id, "title" : post.title, "category" : post.category, "body" : post.body, "slug" : post.slug,  "is_modified" : post.is_modified, "likes" : likes, "dislikes" : dislikes, "created" : to_iso_utc(post.created), "n_comments" : visible_comment_counts({post.id: post.n_comments})[post.id], "is_liked" : False, "is_disliked" : False, "isliking" : False, "isdisliking" : False, "isreplying" : False, "author_username" : author_username, "attachments": load_attachments("post", [post.id])[post.id],}
     
-    if viewer_id is not None:  
-        r = PostReactions.query.get((viewer_id, post_id))
-        is_liked   = (r is not None and r.value == 1)
-        is_disliked = (r is not None and r.value == -1)
-        
-    else:
-        is_liked = False
-        is_disliked = False
-        
+    
+def cached_post_detail(post_id):
+    
+    key = f"post:{int(post_id)}:detail"
+    r = None
+    version = 0
+    
+    try:
+        r = get_redis()
+        raw, ver = r.mget(key, post_version_key(post_id))
+        version = int(ver or 0)
+        if raw:
+            cached = json.loads(raw)
+            if cached.get("version") == version:
+                detail = cached["post"]
+                return None if detail["author_id"] in suspended_user_ids() else detail
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] POST DETAIL CACHE READ | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
         
-    data = {"likes" : likes, "dislikes" : dislikes, "is_liked" : is_liked, "is_disliked" : is_disliked, }
-    return data
+    detail = load_post_detail(post_id)
+    
+    if detail is not None and r is not None:
+        try:
+            r.set(key, json.dumps({"version": version, "post": detail}), ex=POST_DETAIL_TTL)
+        except Exception as e:
+            blog_logger.error(f"[{datetime.utcnow()}] POST DETAIL CACHE WRITE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+            
+    return detail
 
 
+###############################################################################################################
+##########################################Conditional GET / Compression########################################
+###############################################################################################################
 
-def fetch_post_info(post):
-    post_id = post.id
-    author_id = post.author_id
-    title = post.title
-    slug = post.slug
+
+# Redis counters stamping what a cached response was built from. post:{id}:ver moves on anything shown by
+# get-post (body, reactions, comment count), post:{id}:cver on anything shown by the comment threads.
+# The epoch changes if Redis loses its data, so counters restarting from zero can't revive old ETags.
+ETAG_EPOCH_KEY = "etag:epoch"
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_LEVEL = 6
+
+
+def post_version_key(post_id):
+    return f"post:{int(post_id)}:ver"
     
-    author_username = db.session.query(User.username).filter(User.id == author_id).scalar()
+    
+def comment_version_key(post_id):
+    return f"post:{int(post_id)}:cver"
+    
+    
+def bump_post_versions(post_id, post=True, comments=False):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        if post:
+            pipe.incr(post_version_key(post_id))
+        if comments:
+            pipe.incr(comment_version_key(post_id))
+        pipe.execute()
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] POST VERSION | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        
+        
+def read_versions(*keys):
+    r = get_redis()
+    epoch, *versions = r.mget(ETAG_EPOCH_KEY, *keys)
+    if epoch is None:
+        r.set(ETAG_EPOCH_KEY, uuid4().hex, nx=True)
+        return None
+    return [epoch, *[v or b"0" for v in versions]]
+    
+    
+def feed_versions(category=None):
+    return lambda **kwargs: read_versions(f"{feed_key(request.headers.get('X-Lang', 'en'), category)}:ver")
+    
+    
+def post_versions(**kwargs):
+    return read_versions(post_version_key(kwargs["post_id"]))
+    
+    
+def thread_versions(**kwargs):
+    return read_versions(post_version_key(kwargs["post_id"]), comment_version_key(kwargs["post_id"]))
+    
+    
+# Answers If-None-Match with 304 before the view runs. stamp(**view_args) returns the version list the
+# response depends on, or None to serve without an ETag. Viewer, block set and suspended set are always part of it.
+def conditional_get(stamp):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(*args, **kwargs):
+            try:
+                versions = stamp(**kwargs)
+                if versions is None:
+                    return view(*args, **kwargs)
+                viewer_id = getattr(getattr(g, "user", None), "id", None)
+                seed = repr((request.full_path, request.headers.get('X-Lang', 'en'), viewer_id, hash(viewer_block_ids(viewer_id)), hash(suspended_user_ids()), versions))
+                etag = hashlib.sha1(seed.encode()).hexdigest()
+            except Exception as e:
+                blog_logger.error(f"[{datetime.utcnow()}] ETAG | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+                return view(*args, **kwargs)
                 
-    data = {"post_id" : post_id, "author_id" : author_id, "title" : title, "slug" : slug, "author_username" : author_username, }
-    return data
+            matched = next((etag + suffix for suffix in ("", "-br", "-gz") if request.if_none_match.contains(etag + suffix)), None)
+            if matched:
+                response = current_app.response_class(status=304)
+                response.set_etag(matched)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.update(('Cookie', 'X-Lang'))
+            return response
+        return wrapped
+    return decorator
+    
+    
+# Strong ETags name one representation, so compressed bodies get their own suffix (stripped again by conditional_get).
+@bp.after_request
+def compress_response(response):
+    if (request.method != 'GET' or response.status_code != 200 or response.direct_passthrough or response.is_streamed or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+        
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+        
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        encoding, suffix, body = 'br', '-br', brotli.compress(body, quality=5)
+    elif accepted['gzip']:
+        encoding, suffix, body = 'gzip', '-gz', gzip.compress(body, compresslevel=COMPRESS_LEVEL)
+    else:
+        return response
+        
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + suffix, weak)
+    return response
+
 
 
 ###############################################################################################################
@@ -682,35 +1086,28 @@ def fetch_post_info(post):
 
 @bp.route('/get-post/<int:post_id>/<slug>', methods=['GET'])
 @limiter.limit("10 per 1 minute")
+@conditional_get(post_versions)
 def get_post_by_id(post_id,slug):
     
     try:
         post_id = int(post_id)
-        post = Post.query.join(User, User.id == Post.author_id).filter(Post.id == post_id, User.is_suspended.is_(False)).first()       
+        data = cached_post_detail(post_id)
         viewer_id  = getattr(getattr(g, "user", None), "id", None)
         
-        if post is None:
+        if data is None:
             return '', 404
         if viewer_id:
-            if is_user_blocked(viewer_id, post.author_id):
+            blocks = block_set(viewer_id)
+            if data["author_id"] in blocks.blocking:
                 message = 'USER_IS_BLOCKED'
                 return jsonify(message=message), 403
-            elif is_user_blocked(post.author_id, viewer_id):
+            elif data["author_id"] in blocks.blocked_by:
                 message = 'IM_BLOCKED'
                 return jsonify(message=message), 403
-                           
-            if post.slug != slug:
-                slug=create_slug(post.title)
-                post.slug=slug
-                db.session.commit()
                 
-        data = serialize_post(post)
+        # a stale slug is answered with the canonical one in data["slug"]; GETs never write
+        overlay_post_items([data], viewer_id)
               
-    except IntegrityError as ef:
-        db.session.rollback()
-        blog_logger.error(f"[{datetime.utcnow()}] | USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 400
-    
     except Exception as e:
         db.session.rollback()
         blog_logger.error(f"[{datetime.utcnow()}] | USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
@@ -720,6 +1117,25 @@ def get_post_by_id(post_id,slug):
 
 
 
+# Old links only carry a slug: answer with the post it belongs to (current or renamed) and its canonical slug.
+@bp.route('/resolve-slug/<slug>', methods=['GET'])
+@limiter.limit("20 per 1 minute")
+def resolve_post_slug(slug):
+    
+    try:
+        post_id = resolve_slug(slug)
+        if post_id is None:
+            return '', 404
+        canonical = db.session.scalar(select(Post.slug).where(Post.id == post_id))
+        
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] | USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        return '', 500
+        
+    return jsonify(post_id=post_id, slug=canonical), 200
+
+
+
 ###############################################################################################################
 ##############################################Create Post######################################################
 ###############################################################################################################
@@ -796,6 +1212,8 @@ def create_post():
         for u in uploads:
             db.session.add(PostAttachment(post_id=new_post.id, file_upload_id=u.id))
         db.session.commit()        
+        feed_index_add([new_post])
+        search_index_add([new_post])
         serialized = serialize_post(new_post)
         
         return jsonify( post_id=new_post.id, post_slug=new_post.slug, serialized=serialized), 200
@@ -873,10 +1291,14 @@ def modify_post(post_id):
                 return '', 403
              
         
-        new_slug = create_slug(title)
+        indexed = (post.id, post.lang, post.category)
+        if title != post.title:
+            # legacy posts may have no slug yet, and NULL can't be a history key
+            if post.slug:
+                db.session.add(PostSlugHistory(slug=post.slug, post_id=post.id))
+            post.slug = create_slug(title)
         post.title = title
         post.body = body
-        post.slug = new_slug
         post.category = category 
         post.is_modified = True
         post.created = utcnow_naive()
@@ -895,6 +1317,10 @@ def modify_post(post_id):
           db.session.bulk_save_objects([ PostAttachment(post_id=post.id, file_upload_id=fid) for fid in to_add ])
         
         db.session.commit()
+        feed_index_remove([indexed])
+        feed_index_add([post])
+        search_index_add([post])
+        bump_post_versions(post.id)
         serialized = serialize_post(post)
         
         return jsonify(post_id=post.id, post_slug=post.slug, serialized=serialized), 200
@@ -914,324 +1340,420 @@ def modify_post(post_id):
         
 
 ####################################################################################################################
-###########################################Retrieve Home Posts######################################################
+###########################################Post Feed Engine#########################################################
 ####################################################################################################################
 
 
-@bp.route('/retrieve-posts/<int:page>', methods=['GET'])
-@limiter.limit("20 per 1 minute")
-def retrieve_home_posts(page):
+FEED_PER_PAGE = 10
 
+
+def encode_cursor(*values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+    
+    
+def decode_cursor(token, *types):
     try:
-        per_page = 10
-        lang = request.headers.get('X-Lang', 'en')
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            return None
+        return tuple(datetime.fromisoformat(v) if typ is datetime else typ(v) for v, typ in zip(values, types))
+    except (ValueError, TypeError):
+        return None
+
+
+# post.n_comments is kept exact by the trg_comment_ai/ad triggers (tombstoned comments are already taken out by
+# tombstone_comment); a viewer only needs the live comments written by authors hidden from them (blocked or
+# suspended) taken out, counted through ix_comment_post_author.
+def hidden_comment_counts(post_ids, author_ids):
+    if not post_ids or not author_ids:
+        return {}
+    return dict(db.session.query(Comment.post_id, func.count()).filter(Comment.post_id.in_(post_ids), Comment.author_id.in_(author_ids), Comment.is_deleted.is_(False)).group_by(Comment.post_id).all())
+    
+    
+def visible_comment_counts(counts, hidden=frozenset()):
+    removed = hidden_comment_counts(list(counts), hidden | suspended_user_ids())
+    return {pid: max(0, int(n or 0) - removed.get(pid, 0)) for pid, n in counts.items()}
+    
+    
+def hydrate_posts(posts, viewer_id):
+    
+    if not posts:
+        return []
         
-        C = Comment
-        R = PostReactions
-        B = BlockedUsers
-        U = User        
-        C2 = aliased(C) 
+    U = User        
+    
+    hidden = viewer_block_ids(viewer_id)
+    post_ids   = [p.id for p in posts]
+    author_ids = [p.author_id for p in posts]
+    
+    attachs_by_post = load_attachments("post", post_ids)
+     
+    usernames_by_author = dict(db.session.query(U.id, U.username).filter(U.id.in_(author_ids)).all())
+    visible_comments_by_post = visible_comment_counts({p.id: p.n_comments for p in posts}, hidden)
+        
+    # same write-behind counters as the post detail, less the reactions of users hidden from the viewer
+    totals = reaction_counts("p", post_ids)
+    hidden_totals = count_reactions("p", post_ids, users=hidden) if hidden else {}
+    reactions_by_post = {}
+    for pid in post_ids:
+        likes, dislikes = totals.get(pid, (0, 0))
+        hidden_likes, hidden_dislikes = hidden_totals.get(pid, (0, 0))
+        reactions_by_post[pid] = {"likes": max(0, likes - hidden_likes), "dislikes": max(0, dislikes - hidden_dislikes)}
+    
+    user_reaction_by_post = viewer_reactions(viewer_id, "p", post_ids)
+                
+    def serialize_post_batched(p):
+        pid = p.id
+        val = user_reaction_by_post.get(pid)
+        attachs = attachs_by_post.get(pid, [])
+        return {
+            "post_id": pid,
+            "author_id": p.author_id,
+            "title": p.title,
+            "category": p.category,
+            "body": p.body,
+            "slug": p.slug,
+            "is_modified": p.is_modified,
+            "likes": reactions_by_post.get(pid, {}).get("likes", 0),
+            "dislikes": reactions_by_post.get(pid, {}).get("dislikes", 0),
+            "created": to_iso_utc(p.created),
+            "n_comments": visible_comments_by_post.get(pid, 0),
+            "is_liked": (val == 1),
+            "is_disliked": (val == -1),
+            "isliking": False,
+            "isdisliking": False,
+            "isreplying": False,
+            "author_username": usernames_by_author.get(p.author_id, ""),
+            "attachments": attachs,
+        }            
+    
+    return [serialize_post_batched(p) for p in posts]
+
+
+####################################################################################################################
+###########################################Redis Feed Index#########################################################
+####################################################################################################################
+
+
+# One ZSET per (lang, category) plus a per-lang "home" set holding every category != 0. Members are zero-padded
+# post ids (so equal scores fall back to id order) scored by the created timestamp. The index is only read once
+# FEED_READY_KEY exists, i.e. after a full rebuild; until then the feeds are served from MySQL.
+FEED_LANGS = ('en', 'it', 'fr', 'es', 'de', 'pt', 'ru', 'zh', 'ja', 'ar', 'hi')
+FEED_CATEGORIES = (1, 2, 3, 4, 5, 6)
+FEED_READY_KEY = "feed:ready"
+FEED_REBUILD_LOCK = "feed:rebuild:lock"
+FEED_INDEX_MAX_ROUNDS = 4
+
+
+def feed_key(lang, category=None):
+    return f"feed:{lang}:{category or 'home'}"
+    
+    
+def feed_keys(lang, category):
+    if not category:
+        return []
+    return [feed_key(lang, category), feed_key(lang)]
+    
+    
+def _feed_member(post_id):
+    return f"{int(post_id):020d}"
+    
+    
+def _feed_score(created):
+    return created.replace(tzinfo=timezone.utc).timestamp()
+    
+    
+def feed_index_add(posts):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for p in posts:
+            for key in feed_keys(p.lang, p.category):
+                pipe.zadd(key, {_feed_member(p.id): _feed_score(p.created)})
+                pipe.incr(f"{key}:ver")
+        pipe.execute()
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] FEED INDEX ADD | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
         
-        viewer_id  = getattr(getattr(g, "user", None), "id", None)
-        not_blocked_post = true()
-        if viewer_id:
-            not_blocked_post = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == Post.author_id), and_(B.blocker_id == Post.author_id, B.blocked_id == viewer_id),)).correlate(Post))
         
-        pagination = (Post.query.join(User, User.id == Post.author_id).filter(User.is_suspended.is_(False),Post.category != 0, Post.lang == lang, not_blocked_post).order_by(Post.created.desc(), Post.id.desc()).paginate(page=page, per_page=per_page, error_out=False))
+def feed_index_remove(entries):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for post_id, lang, category in entries:
+            for key in feed_keys(lang, category):
+                pipe.zrem(key, _feed_member(post_id))
+                pipe.incr(f"{key}:ver")
+        pipe.execute()
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] FEED INDEX REMOVE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
         
-        if page > 0 and page > pagination.pages:
-            return jsonify({"items" : [] , "has_more": False}), 200
-            
-        posts = pagination.items
-        if not posts:
-            return jsonify({"items": [], "has_more": False}), 200
-            
-        post_ids   = [p.id for p in posts]
-        author_ids = [p.author_id for p in posts]
         
-        atts = (db.session.query(PostAttachment.post_id, FileUpload).join(FileUpload, FileUpload.id == PostAttachment.file_upload_id).filter(PostAttachment.post_id.in_(post_ids)).all())
+def bump_feed_versions(entries):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for lang, category in entries:
+            for key in feed_keys(lang, category):
+                pipe.incr(f"{key}:ver")
+        pipe.execute()
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] FEED VERSION | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
         
-        attachs_by_comment = defaultdict(list)
-        for cid, fu in atts:
-            attachs_by_comment[cid].append(fu)
-         
-        usernames_by_author = dict(db.session.query(U.id, U.username).filter(U.id.in_(author_ids)).all())
-        
-        if viewer_id is None:
-            
-            not_blocked_parent = true()
-            not_blocked_child  = true()
-            
-        else:
-        
-            not_blocked_parent = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)).correlate(C))
-            not_blocked_child = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id),and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2)) 
-               
-        root_filter = C.parent_id.is_(None)
-        seed = db.session.query(C.id.label("id"), C.post_id.label("post_id")).join(U, U.id == C.author_id).filter(C.post_id.in_(post_ids), U.is_suspended.is_(False), root_filter, not_blocked_parent)
-        tree = seed.cte(name="visible_tree", recursive=True)
-        step = db.session.query(C2.id, C2.post_id).join(tree, C2.parent_id == tree.c.id).join(U, U.id == C2.author_id).filter(not_blocked_child, U.is_suspended.is_(False))
-        tree = tree.union_all(step)
-        visible_comments_by_post = dict(db.session.query(tree.c.post_id, func.count()).select_from(tree).group_by(tree.c.post_id).all()) 
-            
-        q_reactions = db.session.query(R.post_id, func.sum(case((R.value == 1, 1), else_=0)).label("likes"),func.sum(case((R.value == -1, 1), else_=0)).label("dislikes"),).filter(R.post_id.in_(post_ids))
-        if viewer_id is not None:
-            q_reactions = q_reactions.filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == R.user_id),and_(B.blocker_id == R.user_id, B.blocked_id == viewer_id),)))
-        reactions_by_post = { pid: {"likes": likes or 0, "dislikes": dislikes or 0} for pid, likes, dislikes in q_reactions.group_by(R.post_id).all()}
-        
-        user_reaction_by_post = {}
-        if viewer_id is not None:
-            for pid, val in (db.session.query(R.post_id, R.value).filter(R.post_id.in_(post_ids), R.user_id == viewer_id).all()):
-                user_reaction_by_post[pid] = val              
-                    
-        def serialize_post_batched(p):
-            pid = p.id
-            val = user_reaction_by_post.get(pid)
-            attachs = attachs_by_comment.get(pid, [])
-            return {
-                "post_id": pid,
-                "author_id": p.author_id,
-                "title": p.title,
-                "category": p.category,
-                "body": p.body,
-                "slug": p.slug,
-                "is_modified": p.is_modified,
-                "likes": reactions_by_post.get(pid, {}).get("likes", 0),
-                "dislikes": reactions_by_post.get(pid, {}).get("dislikes", 0),
-                "created": to_iso_utc(p.created),
-                "n_comments": visible_comments_by_post.get(pid, 0),
-                "is_liked": (val == 1),
-                "is_disliked": (val == -1),
-                "isliking": False,
-                "isdisliking": False,
-                "isreplying": False,
-                "author_username": usernames_by_author.get(p.author_id, ""),
-                "attachments": [serialize_upload(a) for a in attachs],
-            }            
-        
-        items = [serialize_post_batched(p) for p in posts]
-        
-        return jsonify({"items" : items, "has_more": pagination.has_next}), 200       
-            
-    except IntegrityError as ef:
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 400
-        
-    except Exception as e:      
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 500
         
+def feed_index_add_author(user_id):
+    feed_index_add(db.session.query(Post.id, Post.lang, Post.category, Post.created).filter(Post.author_id == user_id).all())
+    
+    
+def feed_index_remove_author(user_id):
+    feed_index_remove(db.session.query(Post.id, Post.lang, Post.category).filter(Post.author_id == user_id).all())
+    
+    
+def build_feed_index(batch_size=2000):
+    
+    r = get_redis()
+    token = uuid4().hex
+    staged = {}
+    last_id = 0
+    count = 0
+    
+    while True:
+        rows = (db.session.query(Post.id, Post.lang, Post.category, Post.created).join(User, User.id == Post.author_id).filter(User.is_suspended.is_(False), Post.category != 0, Post.id > last_id).order_by(Post.id.asc()).limit(batch_size).all())
+        if not rows:
+            break
             
-####################################################################################################################
-###########################################Retrieve Books Posts#####################################################
-####################################################################################################################
-
-
-@bp.route('/retrieve-book-posts/<int:page>', methods=['GET'])
-@limiter.limit("15 per 1 minute")
-def retrieve_book_posts(page):
-
+        pipe = r.pipeline(transaction=False)
+        for row in rows:
+            for key in feed_keys(row.lang, row.category):
+                tmp = staged.setdefault(key, f"{key}:rebuild:{token}")
+                pipe.zadd(tmp, {_feed_member(row.id): _feed_score(row.created)})
+                pipe.expire(tmp, 3600)
+        pipe.execute()
+        
+        last_id = rows[-1].id
+        count += len(rows)
+        
+    pipe = r.pipeline(transaction=True)
+    for lang in FEED_LANGS:
+        for category in (None, *FEED_CATEGORIES):
+            key = feed_key(lang, category)
+            if key in staged:
+                pipe.rename(staged[key], key)
+                pipe.persist(key)
+            else:
+                pipe.delete(key)
+            pipe.incr(f"{key}:ver")
+    pipe.set(FEED_READY_KEY, 1)
+    pipe.delete(FEED_REBUILD_LOCK)
+    pipe.execute()
+    
+    # posts created while the snapshot was being copied
+    late = (db.session.query(Post.id, Post.lang, Post.category, Post.created).join(User, User.id == Post.author_id).filter(User.is_suspended.is_(False), Post.category != 0, Post.id > last_id).all())
+    feed_index_add(late)
+    
+    return count + len(late)
+    
+    
+def schedule_feed_rebuild(r):
     try:
-        per_page = 10       
-        lang = request.headers.get('X-Lang', 'en')       
-        
-        C = Comment
-        R = PostReactions
-        B = BlockedUsers
-        U = User        
-        C2 = aliased(C) 
-        
-        viewer_id  = getattr(getattr(g, "user", None), "id", None)
-        not_blocked_post = true()
-        if viewer_id:
-            not_blocked_post = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == Post.author_id), and_(B.blocker_id == Post.author_id, B.blocked_id == viewer_id),)).correlate(Post)) 
+        if r.set(FEED_REBUILD_LOCK, 1, nx=True, ex=600):
+            from .celery_tasks import rebuild_feed_index
+            rebuild_feed_index.delay()
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] FEED INDEX REBUILD | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
         
-        pagination = (Post.query.join(User, User.id == Post.author_id).filter(User.is_suspended.is_(False),Post.category == 1, Post.lang == lang, not_blocked_post).order_by(Post.created.desc(), Post.id.desc()).paginate(page=page, per_page=per_page, error_out=False))
         
-        if page > 0 and page > pagination.pages:
-            return jsonify({"items" : [] , "has_more": False}), 200
-            
-        posts = pagination.items
-        if not posts:
-            return jsonify({"items": [], "has_more": False}), 200
+def feed_index_page(index, cursor, filters):
+    
+    try:
+        r = get_redis()
+        if not r.exists(FEED_READY_KEY):
+            schedule_feed_rebuild(r)
+            return None
+    
+        key = feed_key(*index)
+        max_score = _feed_score(cursor[0]) if cursor else "+inf"
+        want = FEED_PER_PAGE + 1
+        offset = 0
+        posts = []
+        
+        for _ in range(FEED_INDEX_MAX_ROUNDS):
+            window = r.zrevrangebyscore(key, max_score, "-inf", start=offset, num=want * 2, withscores=True)
+            offset += len(window)
             
-        post_ids   = [p.id for p in posts]
-        author_ids = [p.author_id for p in posts]
+            ids = []
+            for member, score in window:
+                pid = int(member)
+                if cursor and score == max_score and pid >= cursor[1]:
+                    continue
+                ids.append(pid)
                 
-        atts = (db.session.query(PostAttachment.post_id, FileUpload).join(FileUpload, FileUpload.id == PostAttachment.file_upload_id).filter(PostAttachment.post_id.in_(post_ids)).all())
-        
-        attachs_by_comment = defaultdict(list)
-        for cid, fu in atts:
-            attachs_by_comment[cid].append(fu)
-              
-        usernames_by_author = dict(db.session.query(U.id, U.username).filter(U.id.in_(author_ids)).all())
-        
-        if viewer_id is None:
-            
-            not_blocked_parent = true()
-            not_blocked_child  = true()
-            
-        else:
-        
-            not_blocked_parent = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)).correlate(C))
-            not_blocked_child = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id),and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2)) 
-               
-        root_filter = C.parent_id.is_(None)
-        seed = db.session.query(C.id.label("id"), C.post_id.label("post_id")).join(U, U.id == C.author_id).filter(C.post_id.in_(post_ids), U.is_suspended.is_(False), root_filter, not_blocked_parent)
-        tree = seed.cte(name="visible_tree", recursive=True)
-        step = db.session.query(C2.id, C2.post_id).join(tree, C2.parent_id == tree.c.id).join(U, U.id == C2.author_id).filter(not_blocked_child, U.is_suspended.is_(False))
-        tree = tree.union_all(step)
-        visible_comments_by_post = dict(db.session.query(tree.c.post_id, func.count()).select_from(tree).group_by(tree.c.post_id).all()) 
-            
-        q_reactions = db.session.query(R.post_id, func.sum(case((R.value == 1, 1), else_=0)).label("likes"),func.sum(case((R.value == -1, 1), else_=0)).label("dislikes"),).filter(R.post_id.in_(post_ids))
-        if viewer_id is not None:
-            q_reactions = q_reactions.filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == R.user_id),and_(B.blocker_id == R.user_id, B.blocked_id == viewer_id),)))
-        reactions_by_post = { pid: {"likes": likes or 0, "dislikes": dislikes or 0} for pid, likes, dislikes in q_reactions.group_by(R.post_id).all()}
-        
-        user_reaction_by_post = {}
-        if viewer_id is not None:
-            for pid, val in (db.session.query(R.post_id, R.value).filter(R.post_id.in_(post_ids), R.user_id == viewer_id).all()):
-                user_reaction_by_post[pid] = val
-                                   
-                    
-        def serialize_post_batched(p):
-            pid = p.id
-            val = user_reaction_by_post.get(pid)
-            attachs = attachs_by_comment.get(pid, [])
-            return {
-                "post_id": pid,
-                "author_id": p.author_id,
-                "title": p.title,
-                "category": p.category,
-                "body": p.body,
-                "slug": p.slug,
-                "is_modified": p.is_modified,
-                "likes": reactions_by_post.get(pid, {}).get("likes", 0),
-                "dislikes": reactions_by_post.get(pid, {}).get("dislikes", 0),
-                "created": to_iso_utc(p.created),
-                "n_comments": visible_comments_by_post.get(pid, 0),
-                "is_liked": (val == 1),
-                "is_disliked": (val == -1),
-                "isliking": False,
-                "isdisliking": False,
-                "isreplying": False,
-                "author_username": usernames_by_author.get(p.author_id, ""),
-                "attachments": [serialize_upload(a) for a in attachs],
-            } 
-                  
-        items = [serialize_post_batched(p) for p in posts]
-        
-        return jsonify({"items" : items, "has_more": pagination.has_next}), 200
-                    
-    except IntegrityError as ef:
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 400
-        
-    except Exception as e:      
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 500
-        
+            if ids:
+                rows = Post.query.join(User, User.id == Post.author_id).filter(Post.id.in_(ids), User.is_suspended.is_(False), *filters).all()
+                by_id = {p.id: p for p in rows}
+                posts.extend(by_id[pid] for pid in ids if pid in by_id)
+                
+            if len(posts) >= want or len(window) < want * 2:
+                return posts[:FEED_PER_PAGE], len(posts) > FEED_PER_PAGE
         
+        # too many hidden posts in a row for this viewer, let MySQL do the filtering
+        return None
         
-####################################################################################################################
-###########################################Retrieve Tech Posts#####################################################
-####################################################################################################################
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] FEED INDEX READ | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        return None
 
 
-@bp.route('/retrieve-tech-posts/<int:page>', methods=['GET'])
-@limiter.limit("15 per 1 minute")
-def retrieve_tech_posts(page):
+@bp.cli.command('rebuild-feed-index')
+def rebuild_feed_index_command():
+    click.echo(f"Indexed {build_feed_index()} posts")
+    
+    
+# Keyset pagination on (created, id): the client sends back the opaque next_cursor and every page costs one
+# index range scan. The legacy <int:page> urls are still honoured with a plain OFFSET (no COUNT) when no cursor is given.
+def query_feed_page(filters, joins=(), cursor=None, page=1):
+    
+    q = Post.query.join(User, User.id == Post.author_id)
+    for target, onclause in joins:
+        q = q.join(target, onclause)
+    q = q.filter(User.is_suspended.is_(False), *filters)
+    
+    if cursor:
+        created, last_id = cursor
+        q = q.filter(or_(Post.created < created, and_(Post.created == created, Post.id < last_id)))
+    elif page > 1:
+        q = q.offset((page - 1) * FEED_PER_PAGE)
+        
+    rows = q.order_by(Post.created.desc(), Post.id.desc()).limit(FEED_PER_PAGE + 1).all()
+    return rows[:FEED_PER_PAGE], len(rows) > FEED_PER_PAGE
+    
+    
+def feed_payload(posts, has_more, viewer_id):
+    next_cursor = encode_cursor(posts[-1].created, posts[-1].id) if has_more else None
+    return {"items": hydrate_posts(posts, viewer_id), "has_more": has_more, "next_cursor": next_cursor}
+    
+    
+FEED_CACHE_TTL = 120
 
+
+# Viewer-independent layer: the page as an anonymous visitor sees it, shared by everybody for (lang, category, cursor).
+# Entries carry the feed version they were built against; post, reaction and comment writes bump it, and the cursor
+# of every item so a viewer's page can stop part way through one.
+def cached_feed_page(index, cursor, filters):
+    
+    key = feed_key(*index)
+    page_key = f"{key}:page:{encode_cursor(*cursor) if cursor else 'first'}"
+    r = None
+    version = 0
+    
     try:
-        per_page = 10       
-        lang = request.headers.get('X-Lang', 'en')
-        viewer_id  = getattr(getattr(g, "user", None), "id", None)
-        
-        C = Comment
-        R = PostReactions
-        B = BlockedUsers
-        U = User     
-        C2 = aliased(C)
-        
-        not_blocked_post = true()
-        if viewer_id:
-            not_blocked_post = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == Post.author_id), and_(B.blocker_id == Post.author_id, B.blocked_id == viewer_id),)).correlate(Post)) 
-        
-        pagination = (Post.query.join(User, User.id == Post.author_id).filter(User.is_suspended.is_(False),Post.category == 2, Post.lang == lang, not_blocked_post).order_by(Post.created.desc(), Post.id.desc()).paginate(page=page, per_page=per_page, error_out=False))
+        r = get_redis()
+        raw, ver = r.mget(page_key, f"{key}:ver")
+        version = int(ver or 0)
+        if raw:
+            cached = json.loads(raw)
+            if cached.get("version") == version and "cursors" in cached:
+                return cached
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] FEED CACHE READ | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
         
-        if page > 0 and page > pagination.pages:
-            return jsonify({"items" : [] , "has_more": False}), 200
-            
-        posts = pagination.items
-        if not posts:
-            return jsonify({"items": [], "has_more": False}), 200
+    found = feed_index_page(index, cursor, filters)
+    posts, has_more = found if found is not None else query_feed_page(filters, cursor=cursor)
+    page = {"version": version, **feed_payload(posts, has_more, None), "cursors": [encode_cursor(p.created, p.id) for p in posts]}
+    
+    if r is not None:
+        try:
+            r.set(page_key, json.dumps(page), ex=FEED_CACHE_TTL)
+        except Exception as e:
+            blog_logger.error(f"[{datetime.utcnow()}] FEED CACHE WRITE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
             
-        post_ids   = [p.id for p in posts]
-        author_ids = [p.author_id for p in posts]       
-        
-        atts = (db.session.query(PostAttachment.post_id, FileUpload).join(FileUpload, FileUpload.id == PostAttachment.file_upload_id).filter(PostAttachment.post_id.in_(post_ids)).all())
+    return page
+    
+    
+# Per-viewer layer over posts serialized for an anonymous visitor: take blocked users' reactions and comments
+# out of the totals and set the viewer's own reaction flags with a single primary-key lookup. Edits in place.
+def overlay_post_items(items, viewer_id):
+    
+    if viewer_id is None or not items:
+        return items
         
-        attachs_by_comment = defaultdict(list)
-        for cid, fu in atts:
-            attachs_by_comment[cid].append(fu)      
+    R = PostReactions
+    hidden = viewer_block_ids(viewer_id)
+    post_ids = [it["post_id"] for it in items]
+    hidden_reactions = defaultdict(int)
+    hidden_comments = {}
+    
+    own = viewer_reactions(viewer_id, "p", post_ids)
+    if hidden:
+        for pid, value, n in db.session.query(R.post_id, R.value, func.count()).filter(R.post_id.in_(post_ids), R.user_id.in_(hidden)).group_by(R.post_id, R.value).all():
+            hidden_reactions[(pid, value)] = n
+        # the shared layer already excludes suspended authors
+        hidden_comments = hidden_comment_counts(post_ids, hidden - suspended_user_ids())
+        
+    for it in items:
+        pid = it["post_id"]
+        it["likes"] -= hidden_reactions[(pid, 1)]
+        it["dislikes"] -= hidden_reactions[(pid, -1)]
+        it["n_comments"] = max(0, it["n_comments"] - hidden_comments.get(pid, 0))
+        it["is_liked"] = (own.get(pid) == 1)
+        it["is_disliked"] = (own.get(pid) == -1)
+    return items
+    
+    
+# Fills a viewer's page from consecutive shared pages, skipping the authors they have blocked, so every page but
+# the last holds FEED_PER_PAGE posts and has_more is exact. After FEED_INDEX_MAX_ROUNDS shared pages MySQL does the
+# filtering instead.
+def viewer_feed_page(index, cursor, filters, viewer_id):
+    
+    hidden = viewer_block_ids(viewer_id)
+    start = cursor
+    items = []
+    last_cursor = None
+    
+    for _ in range(FEED_INDEX_MAX_ROUNDS):
+        page = cached_feed_page(index, cursor, filters)
+        for it, it_cursor in zip(page["items"], page["cursors"]):
+            if it["author_id"] in hidden:
+                continue
+            if len(items) == FEED_PER_PAGE:
+                return {"items": overlay_post_items(items, viewer_id), "has_more": True, "next_cursor": last_cursor}
+            items.append(it)
+            last_cursor = it_cursor
+            
+        if not page["has_more"]:
+            return {"items": overlay_post_items(items, viewer_id), "has_more": False, "next_cursor": None}
+        cursor = decode_cursor(page["next_cursor"], datetime, int)
         
-        usernames_by_author = dict(db.session.query(U.id, U.username).filter(U.id.in_(author_ids)).all())
+    posts, has_more = query_feed_page((*filters, not_hidden(Post.author_id, hidden)), cursor=start)
+    return feed_payload(posts, has_more, viewer_id)
+    
+    
+def fetch_feed(page, *filters, joins=(), index=None):
+    
+    viewer_id  = getattr(getattr(g, "user", None), "id", None)
+    
+    cursor = None
+    token = request.args.get("cursor")
+    if token:
+        cursor = decode_cursor(token, datetime, int)
+        if cursor is None:
+            return None
+    
+    if index is not None and (cursor or page <= 1):
+        return viewer_feed_page(index, cursor, filters, viewer_id)
         
-        if viewer_id is None:
-            
-            not_blocked_parent = true()
-            not_blocked_child  = true()
+    hidden = viewer_block_ids(viewer_id)
+    not_blocked_post = Post.author_id.notin_(hidden) if hidden else true()
+    posts, has_more = query_feed_page((*filters, not_blocked_post), joins, cursor, page)
+    return feed_payload(posts, has_more, viewer_id)
+    
+    
+def feed_response(page, *filters, joins=(), index=None):
+    
+    try:
+        payload = fetch_feed(page, *filters, joins=joins, index=index)
+        if payload is None:
+            return jsonify({"error": "Invalid cursor"}), 400
             
-        else:
-        
-            not_blocked_parent = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)).correlate(C))
-            not_blocked_child = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id),and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2)) 
-               
-        root_filter = C.parent_id.is_(None)
-        seed = db.session.query(C.id.label("id"), C.post_id.label("post_id")).join(U, U.id == C.author_id).filter(C.post_id.in_(post_ids), U.is_suspended.is_(False), root_filter, not_blocked_parent)
-        tree = seed.cte(name="visible_tree", recursive=True)
-        step = db.session.query(C2.id, C2.post_id).join(tree, C2.parent_id == tree.c.id).join(U, U.id == C2.author_id).filter(not_blocked_child, U.is_suspended.is_(False))
-        tree = tree.union_all(step)
-        visible_comments_by_post = dict(db.session.query(tree.c.post_id, func.count()).select_from(tree).group_by(tree.c.post_id).all()) 
-            
-        q_reactions = db.session.query(R.post_id, func.sum(case((R.value == 1, 1), else_=0)).label("likes"),func.sum(case((R.value == -1, 1), else_=0)).label("dislikes"),).filter(R.post_id.in_(post_ids))
-        if viewer_id is not None:
-            q_reactions = q_reactions.filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == R.user_id),and_(B.blocker_id == R.user_id, B.blocked_id == viewer_id),)))
-        reactions_by_post = { pid: {"likes": likes or 0, "dislikes": dislikes or 0} for pid, likes, dislikes in q_reactions.group_by(R.post_id).all()}
-        
-        user_reaction_by_post = {}
-        if viewer_id is not None:
-            for pid, val in (db.session.query(R.post_id, R.value).filter(R.post_id.in_(post_ids), R.user_id == viewer_id).all()):
-                user_reaction_by_post[pid] = val
-                                   
-        def serialize_post_batched(p):
-            pid = p.id
-            val = user_reaction_by_post.get(pid)
-            attachs = attachs_by_comment.get(pid, [])
-            return {
-                "post_id": pid,
-                "author_id": p.author_id,
-                "title": p.title,
-                "category": p.category,
-                "body": p.body,
-                "slug": p.slug,
-                "is_modified": p.is_modified,
-                "likes": reactions_by_post.get(pid, {}).get("likes", 0),
-                "dislikes": reactions_by_post.get(pid, {}).get("dislikes", 0),
-                "created": to_iso_utc(p.created),
-                "n_comments": visible_comments_by_post.get(pid, 0),
-                "is_liked": (val == 1),
-                "is_disliked": (val == -1),
-                "isliking": False,
-                "isdisliking": False,
-                "isreplying": False,
-                "author_username": usernames_by_author.get(p.author_id, ""),
-                "attachments": [serialize_upload(a) for a in attachs],
-            }           
-        
-        items = [serialize_post_batched(p) for p in posts]
-        
-        return jsonify({"items" : items, "has_more": pagination.has_next}), 200    
+        return jsonify(payload), 200
             
     except IntegrityError as ef:
         blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
@@ -1242,667 +1764,455 @@ def retrieve_tech_posts(page):
         return '', 500
         
         
-
-
 ####################################################################################################################
-###########################################Retrieve Serie Posts#####################################################
+###########################################Retrieve Home Posts######################################################
 ####################################################################################################################
 
 
-@bp.route('/retrieve-serie-posts/<int:page>', methods=['GET'])
-@limiter.limit("15 per 1 minute")
-def retrieve_serie_posts(page):
-
-    try:
-        per_page = 10       
-        lang = request.headers.get('X-Lang', 'en')
-        viewer_id  = getattr(getattr(g, "user", None), "id", None)
-        
-        C = Comment
-        R = PostReactions
-        B = BlockedUsers
-        U = User     
-        C2 = aliased(C)
-        
-        not_blocked_post = true()
-        if viewer_id:
-            not_blocked_post = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == Post.author_id), and_(B.blocker_id == Post.author_id, B.blocked_id == viewer_id),)).correlate(Post)) 
-        
-        pagination = (Post.query.join(User, User.id == Post.author_id).filter(User.is_suspended.is_(False),Post.category == 3, Post.lang == lang, not_blocked_post).order_by(Post.created.desc(), Post.id.desc()).paginate(page=page, per_page=per_page, error_out=False))
-        
-        if page > 0 and page > pagination.pages:
-            return jsonify({"items" : [] , "has_more": False}), 200
-            
-        posts = pagination.items
-        if not posts:
-            return jsonify({"items": [], "has_more": False}), 200
-            
-        post_ids   = [p.id for p in posts]
-        author_ids = [p.author_id for p in posts]     
-        
-        atts = (db.session.query(PostAttachment.post_id, FileUpload).join(FileUpload, FileUpload.id == PostAttachment.file_upload_id).filter(PostAttachment.post_id.in_(post_ids)).all())
-        
-        attachs_by_comment = defaultdict(list)
-        for cid, fu in atts:
-            attachs_by_comment[cid].append(fu) 
-        
-        usernames_by_author = dict(db.session.query(U.id, U.username).filter(U.id.in_(author_ids)).all())
-        
-        if viewer_id is None:
-            
-            not_blocked_parent = true()
-            not_blocked_child  = true()
-            
-        else:
+@bp.route('/retrieve-posts/<int:page>', methods=['GET'])
+@limiter.limit("20 per 1 minute")
+@conditional_get(feed_versions())
+def retrieve_home_posts(page):
+    lang = request.headers.get('X-Lang', 'en')
+    return feed_response(page, Post.category != 0, Post.lang == lang, index=(lang, None))
         
-            not_blocked_parent = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)).correlate(C))
-            not_blocked_child = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id),and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2)) 
-               
-        root_filter = C.parent_id.is_(None)
-        seed = db.session.query(C.id.label("id"), C.post_id.label("post_id")).join(U, U.id == C.author_id).filter(C.post_id.in_(post_ids), U.is_suspended.is_(False), root_filter, not_blocked_parent)
-        tree = seed.cte(name="visible_tree", recursive=True)
-        step = db.session.query(C2.id, C2.post_id).join(tree, C2.parent_id == tree.c.id).join(U, U.id == C2.author_id).filter(not_blocked_child, U.is_suspended.is_(False))
-        tree = tree.union_all(step)
-        visible_comments_by_post = dict(db.session.query(tree.c.post_id, func.count()).select_from(tree).group_by(tree.c.post_id).all()) 
-            
-        q_reactions = db.session.query(R.post_id, func.sum(case((R.value == 1, 1), else_=0)).label("likes"),func.sum(case((R.value == -1, 1), else_=0)).label("dislikes"),).filter(R.post_id.in_(post_ids))
-        if viewer_id is not None:
-            q_reactions = q_reactions.filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == R.user_id),and_(B.blocker_id == R.user_id, B.blocked_id == viewer_id),)))
-        reactions_by_post = { pid: {"likes": likes or 0, "dislikes": dislikes or 0} for pid, likes, dislikes in q_reactions.group_by(R.post_id).all()}
-        
-        user_reaction_by_post = {}
-        if viewer_id is not None:
-            for pid, val in (db.session.query(R.post_id, R.value).filter(R.post_id.in_(post_ids), R.user_id == viewer_id).all()):
-                user_reaction_by_post[pid] = val
-                    
-        def serialize_post_batched(p):
-            pid = p.id
-            val = user_reaction_by_post.get(pid)
-            attachs = attachs_by_comment.get(pid, [])
-            return {
-                "post_id": pid,
-                "author_id": p.author_id,
-                "title": p.title,
-                "category": p.category,
-                "body": p.body,
-                "slug": p.slug,
-                "is_modified": p.is_modified,
-                "likes": reactions_by_post.get(pid, {}).get("likes", 0),
-                "dislikes": reactions_by_post.get(pid, {}).get("dislikes", 0),
-                "created": to_iso_utc(p.created),
-                "n_comments": visible_comments_by_post.get(pid, 0),
-                "is_liked": (val == 1),
-                "is_disliked": (val == -1),
-                "isliking": False,
-                "isdisliking": False,
-                "isreplying": False,
-                "author_username": usernames_by_author.get(p.author_id, ""),
-                "attachments": [serialize_upload(a) for a in attachs],
-            }    
-        
-        items = [serialize_post_batched(p) for p in posts]
-        
-        return jsonify({"items" : items, "has_more": pagination.has_next}), 200    
             
-    except IntegrityError as ef:
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 400
-        
-    except Exception as e:      
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 500
-
-
-
-
 ####################################################################################################################
-#############################################Retrieve Art Posts#####################################################
+###########################################Retrieve Category Posts##################################################
 ####################################################################################################################
 
 
+@bp.route('/retrieve-book-posts/<int:page>', methods=['GET'])
+@limiter.limit("15 per 1 minute")
+@conditional_get(feed_versions(1))
+def retrieve_book_posts(page):
+    lang = request.headers.get('X-Lang', 'en')
+    return feed_response(page, Post.category == 1, Post.lang == lang, index=(lang, 1))
+    
+    
+@bp.route('/retrieve-tech-posts/<int:page>', methods=['GET'])
+@limiter.limit("15 per 1 minute")
+@conditional_get(feed_versions(2))
+def retrieve_tech_posts(page):
+    lang = request.headers.get('X-Lang', 'en')
+    return feed_response(page, Post.category == 2, Post.lang == lang, index=(lang, 2))
+    
+    
+@bp.route('/retrieve-serie-posts/<int:page>', methods=['GET'])
+@limiter.limit("15 per 1 minute")
+@conditional_get(feed_versions(3))
+def retrieve_serie_posts(page):
+    lang = request.headers.get('X-Lang', 'en')
+    return feed_response(page, Post.category == 3, Post.lang == lang, index=(lang, 3))
+    
+    
 @bp.route('/retrieve-art-posts/<int:page>', methods=['GET'])
 @limiter.limit("15 per 1 minute")
+@conditional_get(feed_versions(4))
 def retrieve_art_posts(page):
-
-    try:
-        per_page = 10       
-        lang = request.headers.get('X-Lang', 'en')
-        viewer_id  = getattr(getattr(g, "user", None), "id", None)
-        
-        C = Comment
-        R = PostReactions
-        B = BlockedUsers
-        U = User     
-        C2 = aliased(C)
-        
-        not_blocked_post = true()
-        if viewer_id:
-            not_blocked_post = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == Post.author_id), and_(B.blocker_id == Post.author_id, B.blocked_id == viewer_id),)).correlate(Post)) 
-        
-        pagination = (Post.query.join(User, User.id == Post.author_id).filter(User.is_suspended.is_(False),Post.category == 4, Post.lang == lang, not_blocked_post).order_by(Post.created.desc(), Post.id.desc()).paginate(page=page, per_page=per_page, error_out=False))
-        
-        if page > 0 and page > pagination.pages:
-            return jsonify({"items" : [] , "has_more": False}), 200
-            
-        posts = pagination.items
-        if not posts:
-            return jsonify({"items": [], "has_more": False}), 200
-            
-        post_ids   = [p.id for p in posts]
-        author_ids = [p.author_id for p in posts]      
-        atts = (db.session.query(PostAttachment.post_id, FileUpload).join(FileUpload, FileUpload.id == PostAttachment.file_upload_id).filter(PostAttachment.post_id.in_(post_ids)).all())
-        
-        attachs_by_comment = defaultdict(list)
-        for cid, fu in atts:
-            attachs_by_comment[cid].append(fu)     
-        
-        usernames_by_author = dict(db.session.query(U.id, U.username).filter(U.id.in_(author_ids)).all())
-        
-        if viewer_id is None:
-            
-            not_blocked_parent = true()
-            not_blocked_child  = true()
-            
-        else:
-        
-            not_blocked_parent = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)).correlate(C))
-            not_blocked_child = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id),and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2)) 
-               
-        root_filter = C.parent_id.is_(None)
-        seed = db.session.query(C.id.label("id"), C.post_id.label("post_id")).join(U, U.id == C.author_id).filter(C.post_id.in_(post_ids), U.is_suspended.is_(False), root_filter, not_blocked_parent)
-        tree = seed.cte(name="visible_tree", recursive=True)
-        step = db.session.query(C2.id, C2.post_id).join(tree, C2.parent_id == tree.c.id).join(U, U.id == C2.author_id).filter(not_blocked_child, U.is_suspended.is_(False))
-        tree = tree.union_all(step)
-        visible_comments_by_post = dict(db.session.query(tree.c.post_id, func.count()).select_from(tree).group_by(tree.c.post_id).all()) 
-            
-        q_reactions = db.session.query(R.post_id, func.sum(case((R.value == 1, 1), else_=0)).label("likes"),func.sum(case((R.value == -1, 1), else_=0)).label("dislikes"),).filter(R.post_id.in_(post_ids))
-        if viewer_id is not None:
-            q_reactions = q_reactions.filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == R.user_id),and_(B.blocker_id == R.user_id, B.blocked_id == viewer_id),)))
-        reactions_by_post = { pid: {"likes": likes or 0, "dislikes": dislikes or 0} for pid, likes, dislikes in q_reactions.group_by(R.post_id).all()}
-        
-        user_reaction_by_post = {}
-        if viewer_id is not None:
-            for pid, val in (db.session.query(R.post_id, R.value).filter(R.post_id.in_(post_ids), R.user_id == viewer_id).all()):
-                user_reaction_by_post[pid] = val          
-                    
-        def serialize_post_batched(p):
-            pid = p.id
-            val = user_reaction_by_post.get(pid)
-            attachs = attachs_by_comment.get(pid, [])
-            return {
-                "post_id": pid,
-                "author_id": p.author_id,
-                "title": p.title,
-                "category": p.category,
-                "body": p.body,
-                "slug": p.slug,
-                "is_modified": p.is_modified,
-                "likes": reactions_by_post.get(pid, {}).get("likes", 0),
-                "dislikes": reactions_by_post.get(pid, {}).get("dislikes", 0),
-                "created": to_iso_utc(p.created),
-                "n_comments": visible_comments_by_post.get(pid, 0),
-                "is_liked": (val == 1),
-                "is_disliked": (val == -1),
-                "isliking": False,
-                "isdisliking": False,
-                "isreplying": False,
-                "author_username": usernames_by_author.get(p.author_id, ""),
-                "attachments": [serialize_upload(a) for a in attachs],
-            }           
-        
-        items = [serialize_post_batched(p) for p in posts]
-        
-        return jsonify({"items" : items, "has_more": pagination.has_next}), 200      
-            
-    except IntegrityError as ef:
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 400
-        
-    except Exception as e:      
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 500
-
-
-
-####################################################################################################################
-#############################################Retrieve Sport Posts#####################################################
-####################################################################################################################
-
-
+    lang = request.headers.get('X-Lang', 'en')
+    return feed_response(page, Post.category == 4, Post.lang == lang, index=(lang, 4))
+    
+    
 @bp.route('/retrieve-sport-posts/<int:page>', methods=['GET'])
 @limiter.limit("15 per 1 minute")
+@conditional_get(feed_versions(5))
 def retrieve_sport_posts(page):
-
-    try:
-        per_page = 10       
-        lang = request.headers.get('X-Lang', 'en')
-        viewer_id  = getattr(getattr(g, "user", None), "id", None)
-        
-        C = Comment
-        R = PostReactions
-        B = BlockedUsers
-        U = User     
-        C2 = aliased(C)
-        
-        not_blocked_post = true()
-        if viewer_id:
-            not_blocked_post = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == Post.author_id), and_(B.blocker_id == Post.author_id, B.blocked_id == viewer_id),)).correlate(Post))
-            
-        pagination = (Post.query.join(User, User.id == Post.author_id).filter(User.is_suspended.is_(False),Post.category == 5, Post.lang == lang, not_blocked_post).order_by(Post.created.desc(), Post.id.desc()).paginate(page=page, per_page=per_page, error_out=False))
-        
-        if page > 0 and page > pagination.pages:
-            return jsonify({"items" : [] , "has_more": False}), 200
-            
-        posts = pagination.items
-        if not posts:
-            return jsonify({"items": [], "has_more": False}), 200
-            
-        post_ids   = [p.id for p in posts]
-        author_ids = [p.author_id for p in posts]
-        
-        atts = (db.session.query(PostAttachment.post_id, FileUpload).join(FileUpload, FileUpload.id == PostAttachment.file_upload_id).filter(PostAttachment.post_id.in_(post_ids)).all())
-        
-        attachs_by_comment = defaultdict(list)
-        for cid, fu in atts:
-            attachs_by_comment[cid].append(fu)
-               
-        usernames_by_author = dict(db.session.query(U.id, U.username).filter(U.id.in_(author_ids)).all())
-        
-        if viewer_id is None:
-            
-            not_blocked_parent = true()
-            not_blocked_child  = true()
-            
-        else:
-        
-            not_blocked_parent = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)).correlate(C))
-            not_blocked_child = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id),and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2)) 
-               
-        root_filter = C.parent_id.is_(None)
-        seed = db.session.query(C.id.label("id"), C.post_id.label("post_id")).join(U, U.id == C.author_id).filter(C.post_id.in_(post_ids), U.is_suspended.is_(False), root_filter, not_blocked_parent)
-        tree = seed.cte(name="visible_tree", recursive=True)
-        step = db.session.query(C2.id, C2.post_id).join(tree, C2.parent_id == tree.c.id).join(U, U.id == C2.author_id).filter(not_blocked_child, U.is_suspended.is_(False))
-        tree = tree.union_all(step)
-        visible_comments_by_post = dict(db.session.query(tree.c.post_id, func.count()).select_from(tree).group_by(tree.c.post_id).all()) 
-            
-        q_reactions = db.session.query(R.post_id, func.sum(case((R.value == 1, 1), else_=0)).label("likes"),func.sum(case((R.value == -1, 1), else_=0)).label("dislikes"),).filter(R.post_id.in_(post_ids))
-        if viewer_id is not None:
-            q_reactions = q_reactions.filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == R.user_id),and_(B.blocker_id == R.user_id, B.blocked_id == viewer_id),)))
-        reactions_by_post = { pid: {"likes": likes or 0, "dislikes": dislikes or 0} for pid, likes, dislikes in q_reactions.group_by(R.post_id).all()}
-        
-        user_reaction_by_post = {}
-        if viewer_id is not None:
-            for pid, val in (db.session.query(R.post_id, R.value).filter(R.post_id.in_(post_ids), R.user_id == viewer_id).all()):
-                user_reaction_by_post[pid] = val
-                                                       
-        def serialize_post_batched(p):
-            pid = p.id
-            val = user_reaction_by_post.get(pid)
-            attachs = attachs_by_comment.get(pid, [])
-            return {
-                "post_id": pid,
-                "author_id": p.author_id,
-                "title": p.title,
-                "category": p.category,
-                "body": p.body,
-                "slug": p.slug,
-                "is_modified": p.is_modified,
-                "likes": reactions_by_post.get(pid, {}).get("likes", 0),
-                "dislikes": reactions_by_post.get(pid, {}).get("dislikes", 0),
-                "created": to_iso_utc(p.created),
-                "n_comments": visible_comments_by_post.get(pid, 0),
-                "is_liked": (val == 1),
-                "is_disliked": (val == -1),
-                "isliking": False,
-                "isdisliking": False,
-                "isreplying": False,
-                "author_username": usernames_by_author.get(p.author_id, ""),
-                "attachments": [serialize_upload(a) for a in attachs],
-            } 
-             
-        items = [serialize_post_batched(p) for p in posts]
-        
-        return jsonify({"items" : items, "has_more": pagination.has_next}), 200      
-            
-    except IntegrityError as ef:
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 400
-        
-    except Exception as e:      
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 500
-
-
-
-
+    lang = request.headers.get('X-Lang', 'en')
+    return feed_response(page, Post.category == 5, Post.lang == lang, index=(lang, 5))
+    
+    
+@bp.route('/retrieve-social-posts/<int:page>', methods=['GET'])
+@limiter.limit("15 per 1 minute")
+@conditional_get(feed_versions(6))
+def retrieve_social_posts(page):
+    lang = request.headers.get('X-Lang', 'en')
+    return feed_response(page, Post.category == 6, Post.lang == lang, index=(lang, 6))
+    
+    
 ####################################################################################################################
-#############################################Retrieve Social Posts##################################################
+###########################################Retrieve Hot Posts#######################################################
 ####################################################################################################################
 
 
-@bp.route('/retrieve-social-posts/<int:page>', methods=['GET'])
-@limiter.limit("15 per 1 minute")
-def retrieve_social_posts(page):
+# Ranked by celery beat into hot:{gen}:{lang}:{category|home}. Every run writes a new generation and moves
+# hot:gen to it; cursors are (gen, offset) so a client keeps paging through the ranking it started on.
+HOT_GEN_KEY = "hot:gen"
+HOT_WINDOW_DAYS = 7
+HOT_GRAVITY = 1.5
+HOT_MAX_POSTS = 500
+HOT_TTL = 3600
 
-    try:
-        per_page = 10       
-        lang = request.headers.get('X-Lang', 'en')
-        viewer_id  = getattr(getattr(g, "user", None), "id", None)
-        
-        C = Comment
-        R = PostReactions
-        B = BlockedUsers
-        U = User     
-        C2 = aliased(C)
-        
-        not_blocked_post = true()
-        if viewer_id:
-            not_blocked_post = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == Post.author_id), and_(B.blocker_id == Post.author_id, B.blocked_id == viewer_id),)).correlate(Post))
-        
-        pagination = (Post.query.join(User, User.id == Post.author_id).filter(User.is_suspended.is_(False),Post.category == 6, Post.lang == lang, not_blocked_post).order_by(Post.created.desc(), Post.id.desc()).paginate(page=page, per_page=per_page, error_out=False))
-        
-        if page > 0 and page > pagination.pages:
-            return jsonify({"items" : [] , "has_more": False}), 200
-            
-        posts = pagination.items
-        if not posts:
-            return jsonify({"items": [], "has_more": False}), 200
-            
-        post_ids   = [p.id for p in posts]
-        author_ids = [p.author_id for p in posts]
-        
-        atts = (db.session.query(PostAttachment.post_id, FileUpload).join(FileUpload, FileUpload.id == PostAttachment.file_upload_id).filter(PostAttachment.post_id.in_(post_ids)).all())
-        
-        attachs_by_comment = defaultdict(list)
-        for cid, fu in atts:
-            attachs_by_comment[cid].append(fu)
-        
-        usernames_by_author = dict(db.session.query(U.id, U.username).filter(U.id.in_(author_ids)).all())
-        
-        if viewer_id is None:
-            
-            not_blocked_parent = true()
-            not_blocked_child  = true()
+
+def hot_key(gen, lang, category=None):
+    return f"hot:{gen}:{lang}:{category or 'home'}"
+    
+    
+def hot_score(likes, dislikes, n_comments, created, now):
+    age_hours = max(0.0, (now - created).total_seconds() / 3600)
+    return (likes - dislikes + 2 * n_comments) / (age_hours + 2) ** HOT_GRAVITY
+    
+    
+def build_hot_index(batch_size=2000):
+    
+    now = utcnow_naive()
+    since = now - timedelta(days=HOT_WINDOW_DAYS)
+    gen = int(time.time())
+    ranked = defaultdict(list)
+    last_id = 0
+    
+    while True:
+        rows = (db.session.query(Post.id, Post.lang, Post.category, Post.likes, Post.dislikes, Post.n_comments, Post.created).join(User, User.id == Post.author_id).filter(User.is_suspended.is_(False), Post.category != 0, Post.created >= since, Post.id > last_id).order_by(Post.id.asc()).limit(batch_size).all())
+        if not rows:
+            break
             
-        else:
-        
-            not_blocked_parent = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)).correlate(C))
-            not_blocked_child = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id),and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2)) 
-               
-        root_filter = C.parent_id.is_(None)
-        seed = db.session.query(C.id.label("id"), C.post_id.label("post_id")).join(U, U.id == C.author_id).filter(C.post_id.in_(post_ids), U.is_suspended.is_(False), root_filter, not_blocked_parent)
-        tree = seed.cte(name="visible_tree", recursive=True)
-        step = db.session.query(C2.id, C2.post_id).join(tree, C2.parent_id == tree.c.id).join(U, U.id == C2.author_id).filter(not_blocked_child, U.is_suspended.is_(False))
-        tree = tree.union_all(step)
-        visible_comments_by_post = dict(db.session.query(tree.c.post_id, func.count()).select_from(tree).group_by(tree.c.post_id).all()) 
-            
-        q_reactions = db.session.query(R.post_id, func.sum(case((R.value == 1, 1), else_=0)).label("likes"),func.sum(case((R.value == -1, 1), else_=0)).label("dislikes"),).filter(R.post_id.in_(post_ids))
-        if viewer_id is not None:
-            q_reactions = q_reactions.filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == R.user_id),and_(B.blocker_id == R.user_id, B.blocked_id == viewer_id),)))
-        reactions_by_post = { pid: {"likes": likes or 0, "dislikes": dislikes or 0} for pid, likes, dislikes in q_reactions.group_by(R.post_id).all()}
-        
-        user_reaction_by_post = {}
-        if viewer_id is not None:
-            for pid, val in (db.session.query(R.post_id, R.value).filter(R.post_id.in_(post_ids), R.user_id == viewer_id).all()):
-                user_reaction_by_post[pid] = val                  
+        for row in rows:
+            entry = (hot_score(row.likes or 0, row.dislikes or 0, row.n_comments or 0, row.created, now), row.id)
+            for key in (hot_key(gen, row.lang, row.category), hot_key(gen, row.lang)):
+                heap = ranked[key]
+                if len(heap) < HOT_MAX_POSTS:
+                    heapq.heappush(heap, entry)
+                else:
+                    heapq.heappushpop(heap, entry)
                     
-        def serialize_post_batched(p):
-            pid = p.id
-            val = user_reaction_by_post.get(pid)
-            attachs = attachs_by_comment.get(pid, [])
-            return {
-                "post_id": pid,
-                "author_id": p.author_id,
-                "title": p.title,
-                "category": p.category,
-                "body": p.body,
-                "slug": p.slug,
-                "is_modified": p.is_modified,
-                "likes": reactions_by_post.get(pid, {}).get("likes", 0),
-                "dislikes": reactions_by_post.get(pid, {}).get("dislikes", 0),
-                "created": to_iso_utc(p.created),
-                "n_comments": visible_comments_by_post.get(pid, 0),
-                "is_liked": (val == 1),
-                "is_disliked": (val == -1),
-                "isliking": False,
-                "isdisliking": False,
-                "isreplying": False,
-                "author_username": usernames_by_author.get(p.author_id, ""),
-                "attachments": [serialize_upload(a) for a in attachs],
-            }          
-        
-        items = [serialize_post_batched(p) for p in posts]
-        
-        return jsonify({"items" : items, "has_more": pagination.has_next}), 200       
-            
-    except IntegrityError as ef:
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        last_id = rows[-1].id
+        
+    pipe = get_redis().pipeline(transaction=False)
+    for key, heap in ranked.items():
+        pipe.zadd(key, {_feed_member(pid): score for score, pid in heap})
+        pipe.expire(key, HOT_TTL)
+    pipe.set(HOT_GEN_KEY, gen)
+    pipe.execute()
+    
+    return gen
+    
+    
+def hot_feed_page(lang, category, cursor, viewer_id):
+    
+    r = get_redis()
+    if cursor:
+        gen, offset = cursor
+        if not r.exists(hot_key(gen, lang, category)):
+            return None
+    else:
+        gen, offset = r.get(HOT_GEN_KEY), 0
+        if gen is None:
+            return {"items": [], "has_more": False, "next_cursor": None}
+        gen = int(gen)
+        
+    ids = [int(m) for m in r.zrevrange(hot_key(gen, lang, category), offset, offset + FEED_PER_PAGE)]
+    has_more = len(ids) > FEED_PER_PAGE
+    ids = ids[:FEED_PER_PAGE]
+    
+    posts = []
+    if ids:
+        hidden = viewer_block_ids(viewer_id)
+        rows = Post.query.join(User, User.id == Post.author_id).filter(Post.id.in_(ids), User.is_suspended.is_(False), not_hidden(Post.author_id, hidden)).all()
+        by_id = {p.id: p for p in rows}
+        posts = [by_id[pid] for pid in ids if pid in by_id]
+        
+    next_cursor = encode_cursor(gen, offset + FEED_PER_PAGE) if has_more else None
+    return {"items": hydrate_posts(posts, viewer_id), "has_more": has_more, "next_cursor": next_cursor}
+    
+    
+@bp.route('/retrieve-hot-posts', methods=['GET'])
+@limiter.limit("20 per 1 minute")
+def retrieve_hot_posts():
+    
+    lang = request.headers.get('X-Lang', 'en')
+    category = request.args.get('category', 0, type=int)
+    viewer_id  = getattr(getattr(g, "user", None), "id", None)
+    if category not in (0, *FEED_CATEGORIES):
         return '', 400
+    
+    try:
+        cursor = None
+        token = request.args.get("cursor")
+        if token:
+            cursor = decode_cursor(token, int, int)
+            if cursor is None:
+                return jsonify({"error": "Invalid cursor"}), 400
+                
+        # None: the generation behind the cursor has expired
+        payload = hot_feed_page(lang, category, cursor, viewer_id)
+        if payload is None:
+            return jsonify({"error": "Invalid cursor"}), 400
+            
+        return jsonify(payload), 200
         
     except Exception as e:      
         blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
         return '', 500
-
-
-
-
+        
+        
 ####################################################################################################################
 ###########################################Retrieve Personal Posts##################################################
 ####################################################################################################################
-           
+
 
 @bp.route('/retrieve-personal-posts/<int:userId>/<int:page>', methods=['GET'])
 @limiter.limit("15 per 1 minute")
 def retrieve_personal_posts(userId, page):
-        
-    try:
-        per_page = 10
-        viewer_id  = getattr(getattr(g, "user", None), "id", None)
-        
-        C = Comment
-        R = PostReactions
-        B = BlockedUsers
-        U = User     
-        C2 = aliased(C)
-        
-        not_blocked_post = true()
-        if viewer_id:
-            not_blocked_post = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == Post.author_id), and_(B.blocker_id == Post.author_id, B.blocked_id == viewer_id),)).correlate(Post))
-
-        pagination = (Post.query.join(User, User.id == Post.author_id).filter(User.is_suspended.is_(False), Post.author_id==userId, not_blocked_post).order_by(Post.created.desc(), Post.id.desc()).paginate(page=page, per_page=per_page, error_out=False))
-        
-        if page > 0 and page > pagination.pages:
-            return jsonify({"items" : [] , "has_more": False}), 200
-            
-        posts = pagination.items
-        if not posts:
-            return jsonify({"items": [], "has_more": False}), 200
-            
-        post_ids   = [p.id for p in posts]
-        author_ids = [p.author_id for p in posts]
-        
-        atts = (db.session.query(PostAttachment.post_id, FileUpload).join(FileUpload, FileUpload.id == PostAttachment.file_upload_id).filter(PostAttachment.post_id.in_(post_ids)).all())
-        
-        attachs_by_comment = defaultdict(list)
-        for cid, fu in atts:
-            attachs_by_comment[cid].append(fu)
-        
-        usernames_by_author = dict(db.session.query(U.id, U.username).filter(U.id.in_(author_ids)).all())
-        
-        if viewer_id is None:
-            
-            not_blocked_parent = true()
-            not_blocked_child  = true()
-            
-        else:
-        
-            not_blocked_parent = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)).correlate(C))
-            not_blocked_child = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id),and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2)) 
-               
-        root_filter = C.parent_id.is_(None)
-        seed = db.session.query(C.id.label("id"), C.post_id.label("post_id")).join(U, U.id == C.author_id).filter(C.post_id.in_(post_ids), U.is_suspended.is_(False), root_filter, not_blocked_parent)
-        tree = seed.cte(name="visible_tree", recursive=True)
-        step = db.session.query(C2.id, C2.post_id).join(tree, C2.parent_id == tree.c.id).join(U, U.id == C2.author_id).filter(not_blocked_child, U.is_suspended.is_(False))
-        tree = tree.union_all(step)
-        visible_comments_by_post = dict(db.session.query(tree.c.post_id, func.count()).select_from(tree).group_by(tree.c.post_id).all()) 
-            
-        q_reactions = db.session.query(R.post_id, func.sum(case((R.value == 1, 1), else_=0)).label("likes"),func.sum(case((R.value == -1, 1), else_=0)).label("dislikes"),).filter(R.post_id.in_(post_ids))
-        if viewer_id is not None:
-            q_reactions = q_reactions.filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == R.user_id),and_(B.blocker_id == R.user_id, B.blocked_id == viewer_id),)))
-        reactions_by_post = { pid: {"likes": likes or 0, "dislikes": dislikes or 0} for pid, likes, dislikes in q_reactions.group_by(R.post_id).all()}
-        
-        user_reaction_by_post = {}
-        if viewer_id is not None:
-            for pid, val in (db.session.query(R.post_id, R.value).filter(R.post_id.in_(post_ids), R.user_id == viewer_id).all()):
-                user_reaction_by_post[pid] = val
-                               
-        def serialize_post_batched(p):
-            pid = p.id
-            val = user_reaction_by_post.get(pid)
-            attachs = attachs_by_comment.get(pid, [])
-            return {
-                "post_id": pid,
-                "author_id": p.author_id,
-                "title": p.title,
-                "category": p.category,
-                "body": p.body,
-                "slug": p.slug,
-                "is_modified": p.is_modified,
-                "likes": reactions_by_post.get(pid, {}).get("likes", 0),
-                "dislikes": reactions_by_post.get(pid, {}).get("dislikes", 0),
-                "created": to_iso_utc(p.created),
-                "n_comments": visible_comments_by_post.get(pid, 0),
-                "is_liked": (val == 1),
-                "is_disliked": (val == -1),
-                "isliking": False,
-                "isdisliking": False,
-                "isreplying": False,
-                "author_username": usernames_by_author.get(p.author_id, ""),
-                "attachments": [serialize_upload(a) for a in attachs],
-            }           
-        
-        items = [serialize_post_batched(p) for p in posts]
-        
-        return jsonify({"items" : items, "has_more": pagination.has_next}), 200        
-            
-    except IntegrityError as ef:
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 400
-        
-    except Exception as e:      
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 500
-        
-        
+    return feed_response(page, Post.author_id == userId)
+    
+    
 ####################################################################################################################
 ###########################################Retrieve Favorite Posts##################################################
-####################################################################################################################
-        
-        
+####################################################################################################################
+
+
 @bp.route('/retrieve-favorite-posts/<int:page>', methods=['GET'])
 @limiter.limit("15 per 1 minute")
 @login_required
 def retrieve_favorite_posts(page):
+    return feed_response(page, Post.category != 0, joins=[(FavoriteUsers, and_(FavoriteUsers.liked_id == Post.author_id, FavoriteUsers.liker_id == g.user.id))])
+        
+        
+###############################################################################################################
+###########################################Reaction Counters###################################################
+###############################################################################################################
+
 
+# Reactions are written to post_reactions/comment_reactions straight away (no triggers on those tables any more, so
+# the hot post/comment row is never locked by a like). Live totals sit in rx:{p|c}:{id} hashes, seeded from COUNT(*)
+# when missing; touched ids go to reactions:dirty and the flush task copies exact counts into post/comment.likes.
+REACTION_DIRTY_KEY = "reactions:dirty"
+REACTION_COUNTER_TTL = 86400
+REACTION_TARGETS = {
+    "p": (Post, PostReactions, PostReactions.post_id),
+    "c": (Comment, CommentReactions, CommentReactions.comment_id),
+}
+
+# only applies a delta to a counter that exists, a missing one is seeded from the committed rows instead
+REACTION_INCR_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'likes', ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'dislikes', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+# Lower bound of the Wilson interval for the share of likes (z = 1.96, 95%): a few votes rank below many votes with
+# the same ratio, and dislikes count against a comment. Stored in comment.score by the flush task.
+WILSON_Z = 1.96
+
+
+def wilson_score(likes, dislikes, z=WILSON_Z):
+    n = likes + dislikes
+    if n <= 0:
+        return 0.0
+    p = likes / n
+    return (p + z * z / (2 * n) - z * math.sqrt((p * (1 - p) + z * z / (4 * n)) / n)) / (1 + z * z / n)
+    
+    
+def reaction_counter_key(kind, target_id):
+    return f"rx:{kind}:{int(target_id)}"
+    
+    
+def count_reactions(kind, target_ids, users=None):
+    
+    _, R, target_col = REACTION_TARGETS[kind]
+    counts = {tid: (0, 0) for tid in target_ids}
+    q = db.session.query(target_col, R.value, func.count()).filter(target_col.in_(list(target_ids)), R.value != 0)
+    if users is not None:
+        q = q.filter(R.user_id.in_(users))
+    for tid, value, n in q.group_by(target_col, R.value).all():
+        likes, dislikes = counts[tid]
+        counts[tid] = (n, dislikes) if value == 1 else (likes, n)
+    return counts
+    
+    
+def reaction_counts(kind, target_ids):
+    
+    target_ids = list(target_ids)
     try:
-        per_page = 10
-        viewer_id  = getattr(getattr(g, "user", None), "id", None)
+        r = get_redis()
+        pipe = r.pipeline(transaction=False)
+        for tid in target_ids:
+            pipe.hmget(reaction_counter_key(kind, tid), "likes", "dislikes")
+        out, missing = {}, []
+        for tid, (likes, dislikes) in zip(target_ids, pipe.execute()):
+            if likes is None or dislikes is None:
+                missing.append(tid)
+            else:
+                out[tid] = (int(likes), int(dislikes))
+                
+        if missing:
+            exact = count_reactions(kind, missing)
+            pipe = r.pipeline(transaction=False)
+            for tid, (likes, dislikes) in exact.items():
+                key = reaction_counter_key(kind, tid)
+                pipe.hsetnx(key, "likes", likes)
+                pipe.hsetnx(key, "dislikes", dislikes)
+                pipe.expire(key, REACTION_COUNTER_TTL)
+            pipe.execute()
+            out.update(exact)
+        return out
         
-        C = Comment
-        R = PostReactions
-        B = BlockedUsers
-        U = User     
-        C2 = aliased(C)
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] REACTION COUNTERS READ | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        return count_reactions(kind, target_ids)
         
-        not_blocked_post = true()
-        if viewer_id:
-            not_blocked_post = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == Post.author_id), and_(B.blocker_id == Post.author_id, B.blocked_id == viewer_id),)).correlate(Post))
         
-        pagination = (Post.query.join(User, User.id == Post.author_id).join(FavoriteUsers, db.and_(FavoriteUsers.liked_id == Post.author_id, FavoriteUsers.liker_id == g.user.id)).filter(User.is_suspended.is_(False),Post.category != 0, not_blocked_post).order_by(Post.created.desc(), Post.id.desc()).paginate(page=page, per_page=per_page, error_out=False))
+# Toggles user_id's reaction: sending the current value again removes it. Returns the new value (1, -1 or 0).
+def toggle_reaction(kind, target_id, user_id, value):
+    
+    _, R, target_col = REACTION_TARGETS[kind]
+    row = db.session.execute(select(R).where(R.user_id == user_id, target_col == target_id).with_for_update()).scalar_one_or_none()
+    old = row.value if row is not None else 0
+    new = 0 if old == value else value
+    
+    if row is None:
+        db.session.add(R(user_id=user_id, value=new, **{target_col.key: target_id}))
+    elif new == 0:
+        db.session.delete(row)
+    else:
+        row.value = new
+    db.session.commit()
+    
+    try:
+        r = get_redis()
+        if not r.eval(REACTION_INCR_SCRIPT, 1, reaction_counter_key(kind, target_id), int(new == 1) - int(old == 1), int(new == -1) - int(old == -1), REACTION_COUNTER_TTL):
+            reaction_counts(kind, [target_id])
+        r.sadd(REACTION_DIRTY_KEY, f"{kind}:{int(target_id)}")
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] REACTION COUNTERS WRITE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
         
-        if page > 0 and page > pagination.pages:
-            return jsonify({"items" : [] , "has_more": False}), 200
-            
-        posts = pagination.items
-        if not posts:
-            return jsonify({"items": [], "has_more": False}), 200
+    return new
+    
+    
+# Live totals as viewer_id sees them: reactions of users in their block set are left out.
+def viewer_reaction_counts(kind, target_id, viewer_id):
+    likes, dislikes = reaction_counts(kind, [target_id])[target_id]
+    hidden = viewer_block_ids(viewer_id)
+    if hidden:
+        hidden_likes, hidden_dislikes = count_reactions(kind, [target_id], users=hidden)[target_id]
+        likes, dislikes = likes - hidden_likes, dislikes - hidden_dislikes
+    return max(0, likes), max(0, dislikes)
+    
+    
+# The viewer's own reaction values for any mix of targets in one statement over the (user_id, target) primary keys:
+# viewer_reaction_groups(viewer_id, {"p": post_ids, "c": comment_ids}) -> {"p": {post_id: value}, "c": {...}}.
+def viewer_reaction_groups(viewer_id, groups):
+    
+    out = {kind: {} for kind in groups}
+    if viewer_id is None:
+        return out
+        
+    selects = []
+    for kind, ids in groups.items():
+        ids = list(ids)
+        if ids:
+            _, R, target_col = REACTION_TARGETS[kind]
+            selects.append(select(literal(kind).label("kind"), target_col.label("target_id"), R.value).where(R.user_id == viewer_id, target_col.in_(ids), R.value != 0))
             
-        post_ids   = [p.id for p in posts]
-        author_ids = [p.author_id for p in posts]
+    if selects:
+        for kind, tid, value in db.session.execute(union_all(*selects) if len(selects) > 1 else selects[0]):
+            out[kind][tid] = value
+    return out
+    
+    
+def viewer_reactions(viewer_id, kind, target_ids):
+    return viewer_reaction_groups(viewer_id, {kind: target_ids})[kind]
+    
+    
+VIEWER_REACTIONS_MAX_IDS = 200
+
+
+def parse_id_list(raw):
+    ids = []
+    for part in (raw or "").split(","):
+        part = part.strip()
+        if part:
+            ids.append(int(part))
+    return list(dict.fromkeys(ids))
+    
+    
+# Like state for a whole screen (or items restored from an offline cache): ?posts=1,2,3&comments=7,8
+@bp.route('/viewer-reactions', methods=['GET'])
+@limiter.limit("30 per 1 minute")
+@login_required
+def get_viewer_reactions():
+    
+    try:
+        post_ids = parse_id_list(request.args.get("posts"))
+        comment_ids = parse_id_list(request.args.get("comments"))
+    except ValueError:
+        return '', 400
         
-        atts = (db.session.query(PostAttachment.post_id, FileUpload).join(FileUpload, FileUpload.id == PostAttachment.file_upload_id).filter(PostAttachment.post_id.in_(post_ids)).all())
+    if len(post_ids) > VIEWER_REACTIONS_MAX_IDS or len(comment_ids) > VIEWER_REACTIONS_MAX_IDS:
+        return '', 400
         
-        attachs_by_comment = defaultdict(list)
-        for cid, fu in atts:
-            attachs_by_comment[cid].append(fu)
+    try:
+        found = viewer_reaction_groups(g.user.id, {"p": post_ids, "c": comment_ids})
         
-        usernames_by_author = dict(db.session.query(U.id, U.username).filter(U.id.in_(author_ids)).all())
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        return '', 500
         
-        if viewer_id is None:
+    return jsonify(posts={pid: found["p"].get(pid, 0) for pid in post_ids}, comments={cid: found["c"].get(cid, 0) for cid in comment_ids}), 200
+    
+    
+def flush_reaction_counters(batch_size=500):
+    
+    r = get_redis()
+    flushed = 0
+    
+    while True:
+        members = r.spop(REACTION_DIRTY_KEY, batch_size)
+        if not members:
+            break
             
-            not_blocked_parent = true()
-            not_blocked_child  = true()
+        targets = defaultdict(list)
+        for member in members:
+            kind, _, tid = member.decode().partition(":")
+            targets[kind].append(int(tid))
             
-        else:
-        
-            not_blocked_parent = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)).correlate(C))
-            not_blocked_child = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id),and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2)) 
-               
-        root_filter = C.parent_id.is_(None)
-        seed = db.session.query(C.id.label("id"), C.post_id.label("post_id")).join(U, U.id == C.author_id).filter(C.post_id.in_(post_ids), U.is_suspended.is_(False), root_filter, not_blocked_parent)
-        tree = seed.cte(name="visible_tree", recursive=True)
-        step = db.session.query(C2.id, C2.post_id).join(tree, C2.parent_id == tree.c.id).join(U, U.id == C2.author_id).filter(not_blocked_child, U.is_suspended.is_(False))
-        tree = tree.union_all(step)
-        visible_comments_by_post = dict(db.session.query(tree.c.post_id, func.count()).select_from(tree).group_by(tree.c.post_id).all()) 
-            
-        q_reactions = db.session.query(R.post_id, func.sum(case((R.value == 1, 1), else_=0)).label("likes"),func.sum(case((R.value == -1, 1), else_=0)).label("dislikes"),).filter(R.post_id.in_(post_ids))
-        if viewer_id is not None:
-            q_reactions = q_reactions.filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == R.user_id),and_(B.blocker_id == R.user_id, B.blocked_id == viewer_id),)))
-        reactions_by_post = { pid: {"likes": likes or 0, "dislikes": dislikes or 0} for pid, likes, dislikes in q_reactions.group_by(R.post_id).all()}
-        
-        user_reaction_by_post = {}
-        if viewer_id is not None:
-            for pid, val in (db.session.query(R.post_id, R.value).filter(R.post_id.in_(post_ids), R.user_id == viewer_id).all()):
-                user_reaction_by_post[pid] = val
-                                                     
-        def serialize_post_batched(p):
-            pid = p.id
-            val = user_reaction_by_post.get(pid)
-            attachs = attachs_by_comment.get(pid, [])
-            return {
-                "post_id": pid,
-                "author_id": p.author_id,
-                "title": p.title,
-                "category": p.category,
-                "body": p.body,
-                "slug": p.slug,
-                "is_modified": p.is_modified,
-                "likes": reactions_by_post.get(pid, {}).get("likes", 0),
-                "dislikes": reactions_by_post.get(pid, {}).get("dislikes", 0),
-                "created": to_iso_utc(p.created),
-                "n_comments": visible_comments_by_post.get(pid, 0),
-                "is_liked": (val == 1),
-                "is_disliked": (val == -1),
-                "isliking": False,
-                "isdisliking": False,
-                "isreplying": False,
-                "author_username": usernames_by_author.get(p.author_id, ""),
-                "attachments": [serialize_upload(a) for a in attachs],
-            } 
-               
-        items = [serialize_post_batched(p) for p in posts]
-        
-        return jsonify({"items" : items, "has_more": pagination.has_next}), 200        
+        try:
+            for kind, ids in targets.items():
+                model = REACTION_TARGETS[kind][0]
+                existing = set(db.session.scalars(select(model.id).where(model.id.in_(ids))))
+                rows = [{"id": tid, "likes": likes, "dislikes": dislikes} for tid, (likes, dislikes) in count_reactions(kind, existing).items()]
+                if kind == "c":
+                    for row in rows:
+                        row["score"] = wilson_score(row["likes"], row["dislikes"])
+                if rows:
+                    db.session.execute(update(model), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            r.sadd(REACTION_DIRTY_KEY, *members)
+            raise
             
-    except IntegrityError as ef:
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 400
+        # reseeded from the rows just counted on next use, which also drops any drift from seeding races
+        r.delete(*[reaction_counter_key(kind, tid) for kind, ids in targets.items() for tid in ids])
+        flushed += len(members)
         
-    except Exception as e:      
-        blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 500        
-
+    return flushed
+    
+    
+@bp.cli.command('backfill-comment-scores')
+@click.option('--batch-size', default=1000, show_default=True)
+def backfill_comment_scores_command(batch_size):
+    
+    C = Comment
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.session.execute(select(C.id, C.likes, C.dislikes).where(C.id > last_id).order_by(C.id.asc()).limit(batch_size)).all()
+        if not rows:
+            break
+        db.session.execute(update(C), [{"id": r.id, "score": wilson_score(r.likes or 0, r.dislikes or 0)} for r in rows])
+        db.session.commit()
+        last_id = rows[-1].id
+        total += len(rows)
         
+    click.echo(f"Scored {total} comments")
+    
+    
 ###############################################################################################################
 ###########################################Like & Dislike Post#################################################
 ###############################################################################################################
@@ -1913,30 +2223,18 @@ def retrieve_favorite_posts(page):
 @login_required
 def like_post(post_id):
 
-    post = Post.query.get_or_404(post_id)
+    post = Post.query.options(load_only(Post.id, Post.author_id, Post.lang, Post.category)).filter_by(id=post_id).first_or_404()
     
     if post.author_id == g.user.id:
         return '', 400
     
-    r = PostReactions.query.get((g.user.id, post_id))
-    
     try:
-        if r is None: 
-            db.session.add(PostReactions(user_id=g.user.id, post_id=post_id, value=1))
-        elif r.value == 1:
-            db.session.delete(r)
-        else:
-            r.value = 1
-        db.session.commit()
-        db.session.refresh(post)
-        
-        r = calc_likes_post(post)
-        likes = int(r["likes"] or 0)
-        dislikes = int(r["dislikes"] or 0)
-        liked = r["is_liked"]
-        disliked = r["is_disliked"]
+        value = toggle_reaction("p", post_id, g.user.id, 1)
+        bump_feed_versions([(post.lang, post.category)])
+        bump_post_versions(post.id)
+        likes, dislikes = viewer_reaction_counts("p", post_id, g.user.id)
 
-        return jsonify(liked=liked, disliked=disliked, likes=likes, dislikes=dislikes), 200
+        return jsonify(liked=(value == 1), disliked=(value == -1), likes=likes, dislikes=dislikes), 200
             
     except IntegrityError as ef:
         db.session.rollback()
@@ -1956,30 +2254,18 @@ def like_post(post_id):
 @login_required
 def dislike_post(post_id):
 
-    post = Post.query.get_or_404(post_id)
+    post = Post.query.options(load_only(Post.id, Post.author_id, Post.lang, Post.category)).filter_by(id=post_id).first_or_404()
     
     if post.author_id == g.user.id:
         return '', 400
     
-    r = PostReactions.query.get((g.user.id, post_id))
-    
     try:
-        if r is None: 
-            db.session.add(PostReactions(user_id=g.user.id, post_id=post_id, value=-1))
-        elif r.value == -1:
-            db.session.delete(r)
-        else:
-            r.value = -1
-        db.session.commit()
-        db.session.refresh(post)
-        
-        r = calc_likes_post(post)
-        likes = int(r["likes"] or 0)
-        dislikes = int(r["dislikes"] or 0)
-        liked = r["is_liked"]
-        disliked = r["is_disliked"]
+        value = toggle_reaction("p", post_id, g.user.id, -1)
+        bump_feed_versions([(post.lang, post.category)])
+        bump_post_versions(post.id)
+        likes, dislikes = viewer_reaction_counts("p", post_id, g.user.id)
 
-        return jsonify(liked=liked, disliked=disliked, likes=likes, dislikes=dislikes), 200
+        return jsonify(liked=(value == 1), disliked=(value == -1), likes=likes, dislikes=dislikes), 200
             
     except IntegrityError as ef:
         db.session.rollback()
@@ -1998,77 +2284,64 @@ def dislike_post(post_id):
 ###############################################################################################################
 
 
-def serialize_comment(comment):
-    comment_id = comment.id
-    post_id = comment.post_id
-    author_id = comment.author_id
-    parent_id = comment.parent_id
-    created = to_iso_utc(comment.created)
-    content = comment.content
-    likes = comment.likes
-    dislikes = comment.dislikes
-    n_replies = comment.n_replies
+# Serializes any number of comments for the current viewer (nobody with anonymous=True) in a fixed number of
+# statements: posts, parents, usernames, attachments, reactions from blocked users, the recursive visible-reply
+# count and the viewer's own reactions. Block flags come from the cached block sets, fetched for every author
+# involved at once.
+def serialize_comments(comments, anonymous=False):
     
-    post = db.session.get(Post, post_id)
-    author_username = (db.session.query(User.username).filter(User.id == author_id).scalar()) or ""
-    atts = (db.session.query(FileUpload).join(CommentAttachment, CommentAttachment.file_upload_id == FileUpload.id).filter(CommentAttachment.comment_id == comment_id).all())
-    
-    C = Comment
-    B = BlockedUsers
-    R = CommentReactions
-    U = User
+    if not comments:
+        return []
+        
+    C  = Comment
+    U  = User
     C2 = aliased(C)
     C3 = aliased(C)
-    viewer_id = getattr(getattr(g, "user", None), "id", None)    
+    viewer_id = None if anonymous else getattr(getattr(g, "user", None), "id", None)
+    hidden = viewer_block_ids(viewer_id)
     
-    if viewer_id is None:
+    ids = [c.id for c in comments]
+    post_authors = dict(db.session.query(Post.id, Post.author_id).filter(Post.id.in_({c.post_id for c in comments})).all())
+    usernames = dict(db.session.query(U.id, U.username).filter(U.id.in_({c.author_id for c in comments})).all())
+    parent_ids = {c.parent_id for c in comments if c.parent_id is not None}
+    parents = {}
+    if parent_ids:
+        parents = {cid: (aid, username) for cid, aid, username in db.session.query(C.id, C.author_id, U.username).join(U, U.id == C.author_id).filter(C.id.in_(parent_ids)).all()}
+    atts = load_attachments("comment", ids)
+    reactions = reaction_counts("c", ids)
+    hidden_reactions = count_reactions("c", ids, users=hidden) if hidden else {}
+    own = viewer_reactions(viewer_id, "c", ids)
     
-        not_blocked_child = true()
-        not_blocked_child3 = true()
-        
-    else:
+    seed = db.session.query(C2.id.label("id"), C2.parent_id.label("root_id")).join(U, U.id == C2.author_id).filter(C2.parent_id.in_(ids), C2.is_deleted.is_(False), not_hidden(C2.author_id, hidden), U.is_suspended.is_(False))
+    tree = seed.cte(name="visible_tree", recursive=True)
+    step = db.session.query(C3.id, tree.c.root_id).join(U, U.id == C3.author_id).join(tree, C3.parent_id == tree.c.id).filter(C3.is_deleted.is_(False), U.is_suspended.is_(False), not_hidden(C3.author_id, hidden))
+    tree = tree.union_all(step)
+    n_replies_by_comment = dict(db.session.query(tree.c.root_id, func.count()).select_from(tree).group_by(tree.c.root_id).all())
+    
+    sets = block_sets({c.author_id for c in comments} | {aid for aid, _ in parents.values()} | set(post_authors.values()) | {viewer_id})
+    def blocked(a, b):
+        return b in sets[a].blocking
         
-        not_blocked_child = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id),and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2))      
-        not_blocked_child3 = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C3.author_id),and_(B.blocker_id == C3.author_id, B.blocked_id == viewer_id),)).correlate(C3))
-        like_sum, dislike_sum = (db.session.query(func.sum(case((R.value == 1, 1), else_=0)), func.sum(case((R.value == -1, 1), else_=0)),).filter(R.comment_id == comment_id).filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == R.user_id), and_(B.blocker_id == R.user_id, B.blocked_id == viewer_id),)))).one()
+    out = []
+    for c in comments:
         
-        likes    = int(like_sum or 0)
-        dislikes = int(dislike_sum or 0)
+        post_author_id = post_authors.get(c.post_id)
+        if c.parent_id is not None:
+            parent_author_id, parent_username = parents.get(c.parent_id, (None, ""))
+        else:
+            parent_author_id, parent_username = post_author_id, ""
+            
+        likes, dislikes = reactions.get(c.id, (0, 0))
+        hidden_likes, hidden_dislikes = hidden_reactions.get(c.id, (0, 0))
+        value = own.get(c.id)
         
-    seed = db.session.query(C2.id.label("id"), C2.post_id.label("post_id")).join(U, U.id == C2.author_id).filter(C2.post_id == post_id, C2.parent_id == comment_id, not_blocked_child, U.is_suspended.is_(False))
-    tree = seed.cte(name="visible_tree", recursive=True)            
-    step = db.session.query(C3.id, C3.post_id).join(U, U.id == C3.author_id).join(tree, C3.parent_id == tree.c.id).filter(C3.post_id == post_id, U.is_suspended.is_(False), not_blocked_child3)
-    tree = tree.union_all(step)
-    n_replies = int(db.session.query(func.count()).select_from(tree).scalar() or 0)
-    
-    if parent_id is not None:
-        parent = db.session.get(Comment, parent_id)
-        parent_author_id = parent.author_id if parent else None
-        parent_username = (db.session.query(User.username).filter(User.id == parent_author_id).scalar()) if parent_author_id else ""
+        out.append({"comment_id" : c.id, "post_id" : c.post_id, "author_id" : c.author_id, "parent_id" : c.parent_id, "created" : to_iso_utc(c.created), "content" : c.content, "likes" : max(0, likes - hidden_likes), "dislikes" : max(0, dislikes - hidden_dislikes), "n_replies" : int(n_replies_by_comment.get(c.id, 0)), "is_liked" : (value == 1), "is_disliked" : (value == -1), "isliking" : False, "isdisliking" : False, "isreplying" : False, "showchildren" : False, "author_username": usernames.get(c.author_id, ""), "parent_username": parent_username or "", "im_blocked": viewer_id is not None and blocked(c.author_id, viewer_id), "is_blocked": viewer_id is not None and blocked(viewer_id, c.author_id), "is_parent_blocked": bool(parent_author_id) and blocked(c.author_id, parent_author_id), "im_blocked_by_parent": bool(parent_author_id) and blocked(parent_author_id, c.author_id), "parent_author_id": parent_author_id, "post_author_id": post_author_id, "attachments": atts.get(c.id, []),})
         
-    else:
-        parent_username = ''
-        parent_author_id = post.author_id if post else None
+    return out
     
-    is_parent_blocked = is_user_blocked(author_id, parent_author_id) if parent_author_id else False
-    im_blocked_by_parent = is_user_blocked(parent_author_id, author_id) if parent_author_id else False
-    post_author_id = post.author_id
     
-    if viewer_id is not None:
-        r = CommentReactions.query.get((viewer_id, comment_id))
-        is_liked   = (r is not None and r.value == 1)
-        is_disliked = (r is not None and r.value == -1)
-        im_blocked = is_user_blocked(author_id, viewer_id)
-        is_blocked = is_user_blocked(viewer_id, author_id)
-        
-    else:
-        is_liked = False
-        is_disliked = False
-        im_blocked = False
-        is_blocked = False
-               
-    data = {"comment_id" : comment_id, "post_id" : post_id, "author_id" : author_id, "parent_id" : parent_id, "created" : created, "content" : content, "likes" : likes, "dislikes" : dislikes, "n_replies" : n_replies, "is_liked" : is_liked, "is_disliked" : is_disliked, "isliking" : False, "isdisliking" : False, "isreplying" : False, "showchildren" : False, "author_username":author_username, "parent_username":parent_username, "im_blocked":im_blocked, "is_blocked":is_blocked, "is_parent_blocked":is_parent_blocked, "im_blocked_by_parent":im_blocked_by_parent, "parent_author_id":parent_author_id, "post_author_id":post_author_id, "attachments": [serialize_upload(a) for a in atts],}
-    return data
+def serialize_comment(comment):
+    return serialize_comments([comment])[0]
 
 
 
@@ -2078,12 +2351,12 @@ def calc_n_replies(comment):
     n_replies = comment.n_replies
     
     C = Comment
-    B = BlockedUsers
     R = CommentReactions
     U = User
     C2 = aliased(C)
     C3 = aliased(C)
     viewer_id = getattr(getattr(g, "user", None), "id", None)    
+    hidden = viewer_block_ids(viewer_id)
     
     if viewer_id is None:
     
@@ -2092,12 +2365,12 @@ def calc_n_replies(comment):
         
     else:
     
-        not_blocked_child3 = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C3.author_id),and_(B.blocker_id == C3.author_id, B.blocked_id == viewer_id),)).correlate(C3))
-        not_blocked_child = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id),and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2))      
+        not_blocked_child3 = not_hidden(C3.author_id, hidden)
+        not_blocked_child = not_hidden(C2.author_id, hidden)      
     
-    seed = db.session.query(C2.id.label("id"), C2.post_id.label("post_id")).join(U, U.id == C2.author_id).filter(C2.post_id == post_id, C2.parent_id == comment_id, not_blocked_child, U.is_suspended.is_(False))   
+    seed = db.session.query(C2.id.label("id"), C2.post_id.label("post_id")).join(U, U.id == C2.author_id).filter(C2.post_id == post_id, C2.parent_id == comment_id, C2.is_deleted.is_(False), not_blocked_child, U.is_suspended.is_(False))   
     tree = seed.cte(name="visible_tree", recursive=True)    
-    step = db.session.query(C3.id, C3.post_id).join(tree, C3.parent_id == tree.c.id).join(U, U.id == C3.author_id).filter(C3.post_id == post_id, U.is_suspended.is_(False)).filter(not_blocked_child3)
+    step = db.session.query(C3.id, C3.post_id).join(tree, C3.parent_id == tree.c.id).join(U, U.id == C3.author_id).filter(C3.post_id == post_id, C3.is_deleted.is_(False), U.is_suspended.is_(False)).filter(not_blocked_child3)
     tree = tree.union_all(step)
    
     n_replies = int(db.session.query(func.count()).select_from(tree).scalar() or 0)
@@ -2106,36 +2379,129 @@ def calc_n_replies(comment):
     return data
 
 
-def calc_likes_comment(comment):
-    comment_id = comment.id
-    likes = comment.likes
-    dislikes = comment.dislikes
+###############################################################################################################
+###############################################Comment Tree####################################################
+###############################################################################################################
+
+
+# comment_closure holds one row per (ancestor, descendant) pair, depth 0 being the comment itself, so ancestors,
+# descendants and depth are each one indexed read. Rows go away with the comments through ON DELETE CASCADE.
+COMMENT_MAX_DEPTH = 64
+
+
+def link_comment(session, comment_id, parent_id=None):
+    rows = select(literal(comment_id), literal(comment_id), literal(0))
+    if parent_id is not None:
+        rows = union_all(select(CommentClosure.ancestor_id, literal(comment_id), CommentClosure.depth + 1).where(CommentClosure.descendant_id == parent_id), rows)
+    session.execute(insert(CommentClosure).from_select(["ancestor_id", "descendant_id", "depth"], rows))
+    
+    
+def comment_depth(session, comment_id):
+    return session.scalar(select(func.max(CommentClosure.depth)).where(CommentClosure.descendant_id == comment_id)) or 0
+    
+    
+# comment_id first, then up to the root
+def comment_ancestor_ids(session, comment_id):
+    if comment_id is None:
+        return []
+    return list(session.execute(select(CommentClosure.ancestor_id).where(CommentClosure.descendant_id == comment_id).order_by(CommentClosure.depth.asc())).scalars().all())
     
     
+def comment_descendant_ids(session, root_id):
+    return list(session.execute(select(CommentClosure.descendant_id).where(CommentClosure.ancestor_id == root_id, CommentClosure.depth > 0)).scalars().all())
+    
+    
+# Deleting a comment only sets is_deleted on the subtree root (a tombstone) and takes the live subtree off the post
+# and ancestor counters; purge_comment_subtree removes the rows afterwards, from celery, in short batches.
+COMMENT_PURGE_BATCH = 500
+
+
+# True when neither the comment nor any of its ancestors is a tombstone
+def comment_live(comment_id):
+    CC = aliased(CommentClosure)
+    T = aliased(Comment)
+    return ~exists().where(CC.descendant_id == comment_id, CC.ancestor_id == T.id, T.is_deleted.is_(True))
+    
+    
+def comment_tombstoned(session, comment_id):
+    return not session.scalar(select(comment_live(comment_id)))
+    
+    
+def tombstone_comment(session, comment):
+    CC = CommentClosure
+    size = int(session.scalar(select(func.count()).select_from(CC).where(CC.ancestor_id == comment.id, comment_live(CC.descendant_id))) or 0)
+    comment.is_deleted = True
+    session.execute(update(Post).where(Post.id == comment.post_id).values(n_comments=func.greatest(Post.n_comments - size, 0)))
+    ancestor_ids = comment_ancestor_ids(session, comment.parent_id)
+    if ancestor_ids:
+        session.execute(update(Comment).where(Comment.id.in_(ancestor_ids)).values(n_replies=func.greatest(Comment.n_replies - size, 0)))
+    return size
+    
+    
+# Recounts post.n_comments and the n_replies of ancestor_ids from the live rows.
+def reconcile_comment_counters(session, post_id, ancestor_ids=()):
     C = Comment
-    B = BlockedUsers
-    R = CommentReactions
-    viewer_id = getattr(getattr(g, "user", None), "id", None)    
+    CC = CommentClosure
+    n_comments = session.scalar(select(func.count()).select_from(C).where(C.post_id == post_id, comment_live(C.id)))
+    session.execute(update(Post).where(Post.id == post_id).values(n_comments=int(n_comments or 0)))
+    if ancestor_ids:
+        counts = dict(session.execute(select(CC.ancestor_id, func.count()).where(CC.ancestor_id.in_(ancestor_ids), CC.depth > 0, comment_live(CC.descendant_id)).group_by(CC.ancestor_id)).all())
+        session.execute(update(C), [{"id": aid, "n_replies": int(counts.get(aid, 0))} for aid in ancestor_ids])
+    session.commit()
+    
+    
+# Deletes the subtree of a tombstoned comment, newest ids first (a reply always has a larger id than its parent, so
+# no batch cascades into rows outside it), committing after every batch. The counters were settled when the
+# tombstone was set, so each batch adds back what trg_comment_ad takes off post.n_comments. Safe to re-run after an
+# interruption; returns False when max_batches ran out before the root was gone.
+def purge_comment_subtree(root_id, batch_size=COMMENT_PURGE_BATCH, max_batches=None):
+    
+    s = db.session
+    CC = CommentClosure
+    root = s.execute(select(Comment.post_id, Comment.parent_id, Comment.is_deleted).where(Comment.id == root_id)).first()
+    if root is None or not root.is_deleted:
+        return True
+    post_id = root.post_id
+    ancestor_ids = comment_ancestor_ids(s, root.parent_id)
+    
+    batches = 0
+    while True:
+        ids = s.execute(select(CC.descendant_id).where(CC.ancestor_id == root_id).order_by(CC.descendant_id.desc()).limit(batch_size)).scalars().all()
+        if not ids:
+            break
+        s.execute(update(Post).where(Post.id == post_id).values(n_comments=Post.n_comments + len(ids)))
+        s.execute(delete(Comment).where(Comment.id.in_(ids)))
+        s.commit()
+        batches += 1
+        if max_batches and batches >= max_batches and root_id not in ids:
+            return False
+            
+    reconcile_comment_counters(s, post_id, ancestor_ids)
+    return True
     
-    if viewer_id is not None:
     
-        like_sum, dislike_sum = (db.session.query(func.sum(case((R.value == 1, 1), else_=0)), func.sum(case((R.value == -1, 1), else_=0)),).filter(R.comment_id == comment_id).filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == R.user_id), and_(B.blocker_id == R.user_id, B.blocked_id == viewer_id),)))).one()
+def purge_deleted_comments(batch_size=COMMENT_PURGE_BATCH):
+    for root_id in db.session.execute(select(Comment.id).where(Comment.is_deleted.is_(True)).order_by(Comment.id.asc())).scalars().all():
+        purge_comment_subtree(root_id, batch_size)
         
-        likes    = int(like_sum or 0)
-        dislikes = int(dislike_sum or 0)     
+        
+@bp.cli.command('backfill-comment-closure')
+def backfill_comment_closure_command():
     
-    if viewer_id is not None:   
-        r = CommentReactions.query.get((viewer_id, comment_id))
-        is_liked   = (r is not None and r.value == 1)
-        is_disliked = (r is not None and r.value == -1)
+    C = Comment
+    CC = CommentClosure
+    total = db.session.execute(mysql_insert(CC).prefix_with("IGNORE").from_select(["ancestor_id", "descendant_id", "depth"], select(C.id, C.id, literal(0)))).rowcount
+    db.session.commit()
+    
+    # each pass links every comment to the ancestors already known for its parent, i.e. one more level
+    while True:
+        added = db.session.execute(mysql_insert(CC).prefix_with("IGNORE").from_select(["ancestor_id", "descendant_id", "depth"], select(CC.ancestor_id, C.id, CC.depth + 1).join(CC, CC.descendant_id == C.parent_id))).rowcount
+        db.session.commit()
+        if not added:
+            break
+        total += added
         
-    else:
-        is_liked = False
-        is_disliked = False
-             
-    data = {"likes" : likes, "dislikes" : dislikes, "is_liked" : is_liked, "is_disliked" : is_disliked,}
-    return data
-
+    click.echo(f"Inserted {total} closure rows")
 
 
 ###############################################################################################################
@@ -2174,6 +2540,10 @@ def create_comment(post_id):
     if not post:
         return '', 404
     
+    # same rule serialize_comment reports as is_parent_blocked / im_blocked_by_parent, checked before writing
+    if is_user_blocked(g.user.id, post.author_id) or is_user_blocked(post.author_id, g.user.id):
+        return '', 403
+    
     if len(att_ids) != len(set(att_ids)):
         return '', 400    
             
@@ -2196,6 +2566,7 @@ def create_comment(post_id):
         new_comment = Comment(post_id=post_id, author_id=g.user.id, content=cleaned)
         db.session.add(new_comment)
         db.session.flush()
+        link_comment(db.session, new_comment.id)
         
         post = Post.query.get_or_404(post_id)
         
@@ -2222,17 +2593,11 @@ def create_comment(post_id):
         db.session.flush()
             
         payload = serialize_comment(new_comment)
-        
-        if payload["is_parent_blocked"]:
-            db.session.rollback()
-            return '', 403
-        elif payload["im_blocked_by_parent"]:
-            db.session.rollback()
-            return '', 403
-        
-        post_dict = calc_n_comments(post)
-        n_comments  = post_dict["n_comments"]
+        n_comments  = calc_n_comments(post)["n_comments"]
         db.session.commit()
+        bump_feed_versions([(post.lang, post.category)])
+        bump_post_versions(post.id, comments=True)
+        reset_comment_snapshots(post.id)
 
         return jsonify({"n_comments": n_comments, "comment": payload }), 201
         
@@ -2248,6 +2613,399 @@ def create_comment(post_id):
 
 
 
+###############################################################################################################
+##############################################Comment Pages####################################################
+###############################################################################################################
+
+
+# Comment pages are built once per (post, parent, cursor) as an anonymous visitor sees them and cached against
+# post:{id}:cver, which every comment, reply, delete and comment reaction bumps. viewer_comment_page() then drops
+# what the viewer has hidden and sets their own reaction flags.
+COMMENT_PAGE_TTL = 120
+COMMENTS_PER_PAGE = 10
+REPLIES_PER_PAGE = 15
+REPLY_PREFETCH_MAX = 5
+REPLY_PREFETCH_MAX_DEPTH = 3
+
+
+# Serializes comment rows of one post; attachments, usernames, reaction counters and visible reply counts are each
+# looked up once for the whole batch.
+def _comment_items(rows, post_id, post_author_id):
+
+    if not rows:
+        return []
+
+    C  = Comment
+    U  = User
+    C2 = aliased(C)
+    C3 = aliased(C)
+
+    ids = [r.id for r in rows]
+    attachs_by_comment = load_attachments("comment", ids)
+    usernames = dict(db.session.query(U.id, U.username).filter(U.id.in_({r.author_id for r in rows})).all())
+    parent_ids = {r.parent_id for r in rows if r.parent_id}
+    parent_usernames = dict(db.session.query(C.id, U.username).join(U, U.id == C.author_id).filter(C.id.in_(parent_ids)).all()) if parent_ids else {}
+    reactions_by_comment = reaction_counts("c", ids)
+
+    seed = db.session.query(C2.id.label("id"), C2.post_id.label("post_id"), C2.parent_id.label("parent_id"), C2.author_id.label("author_id"), C2.parent_id.label("root_id"),).join(U, U.id == C2.author_id).filter(C2.parent_id.in_(ids), C2.is_deleted.is_(False), U.is_suspended.is_(False), )
+    tree = seed.cte(name="visible_children_tree", recursive=True)
+    step = db.session.query(C3.id, C3.post_id, C3.parent_id, C3.author_id, tree.c.root_id).join(U, U.id == C3.author_id).join(tree, C3.parent_id == tree.c.id).filter(C3.is_deleted.is_(False), U.is_suspended.is_(False),)
+    tree = tree.union_all(step)
+    n_replies_by_comment = dict(db.session.query(tree.c.root_id, func.count()).select_from(tree).group_by(tree.c.root_id).all())
+
+    items = []
+    for r in rows:
+
+        cid, aid = r.id, r.author_id
+        likes, dislikes = reactions_by_comment.get(cid, (0, 0))
+
+        items.append({
+          "comment_id": cid,
+          "post_id": post_id,
+          "author_id": aid,
+          "parent_id": r.parent_id,
+          "created": to_iso_utc(r.created),
+          "content": r.content,
+          "likes": likes,
+          "dislikes": dislikes,
+          "n_replies": int(n_replies_by_comment.get(cid, 0)),
+          "is_liked": False,
+          "is_disliked": False,
+          "isliking": False,
+          "isdisliking": False,
+          "isreplying": False,
+          "showchildren": False,
+          "author_username": usernames.get(aid, ""),
+          "parent_username": parent_usernames.get(r.parent_id, ""),
+          "parent_author_id": post_author_id,
+          "post_author_id": post_author_id,
+          "attachments": attachs_by_comment.get(cid, []),
+        })
+
+    return items
+
+
+# First `limit` replies (oldest first, as retrieve-child-comments pages them) under every node of the subtrees of
+# root_ids, down to `depth` levels, in one windowed query over comment_closure. Returns the rows, parents before
+# their replies, and {parent_id: retrieve-child-comments cursor, or None when nothing is left} per expanded parent.
+def prefetch_replies(root_ids, limit, depth):
+
+    C  = Comment
+    U  = User
+    CC = CommentClosure
+
+    ranked = (select(C.id, C.author_id, C.post_id, C.parent_id, C.content, C.created, CC.depth, func.row_number().over(partition_by=C.parent_id, order_by=(C.created.asc(), C.id.asc())).label("rn"))
+              .join(CC, CC.descendant_id == C.id).join(U, U.id == C.author_id)
+              .where(CC.ancestor_id.in_(root_ids), CC.depth.between(1, depth), C.is_deleted.is_(False), U.is_suspended.is_(False)).subquery())
+    rows = db.session.execute(select(ranked).where(ranked.c.rn <= limit + 1).order_by(ranked.c.depth.asc(), ranked.c.parent_id.asc(), ranked.c.rn.asc())).all()
+
+    shown = set(root_ids)
+    replies = []
+    cursors = {}
+    last_by_parent = {}
+    for r in rows:
+        # replies under a reply that missed its own parent's cut are left to retrieve-child-comments
+        if r.parent_id not in shown:
+            continue
+        if r.rn > limit:
+            cursors[r.parent_id] = encode_cursor(*last_by_parent[r.parent_id])
+            continue
+        replies.append(r)
+        shown.add(r.id)
+        last_by_parent[r.parent_id] = (r.created, r.id)
+        cursors.setdefault(r.parent_id, None)
+
+    return replies, cursors
+
+
+# Top-level comments are ordered by (likes, created, id), or by (score, created, id) for sort=best, replies by
+# (created, id). Likes and scores move between loads, so top-level pages are served from a snapshot of that order
+# (post:{id}:csnap:{sort}:{generation}, a list of ids after a "-" marker, "+" when cut at COMMENT_SNAPSHOT_MAX):
+# the cursor carries the generation and the position reached, so every page of one read-through comes from the
+# same ranking however the counters change meanwhile. First pages read the generation from post:{id}:csnap:{sort}:cur,
+# which lives COMMENT_SNAPSHOT_REFRESH seconds and is dropped when a top-level comment is added, so reactions
+# (which only bump the comment-cache version) never cost a rebuild. Comments deleted or suspended since are skipped.
+# When the snapshot has expired or runs out, the cursor's (rank, created, id) of the last row served is sought past
+# instead. The page number is only honoured (as an offset into the snapshot) without a cursor.
+COMMENT_SORTS = {"top": "likes", "best": "score"}
+COMMENT_SNAPSHOT_TTL = 1800
+COMMENT_SNAPSHOT_REFRESH = 60
+COMMENT_SNAPSHOT_MAX = 5000
+COMMENT_SNAPSHOT_LIVE = -1
+
+
+def comment_snapshot_key(post_id, sort, generation):
+    return f"post:{int(post_id)}:csnap:{sort}:{int(generation)}"
+
+
+def comment_snapshot_pointer(post_id, sort):
+    return f"post:{int(post_id)}:csnap:{sort}:cur"
+
+
+def reset_comment_snapshots(post_id):
+    try:
+        get_redis().delete(*[comment_snapshot_pointer(post_id, sort) for sort in COMMENT_SORTS])
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] COMMENT SNAPSHOT | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+
+def comment_page_query(post, sort):
+    C = Comment
+    U = User
+    rank = getattr(C, COMMENT_SORTS[sort])
+    q = db.session.query(C.id, C.author_id, C.post_id, C.parent_id, C.content, C.created, rank.label("rank")).join(U, U.id == C.author_id).filter(C.post_id == post.id, C.is_deleted.is_(False), U.is_suspended.is_(False))
+    return q, rank
+
+
+def build_comment_snapshot(r, post, sort, generation):
+    q, rank = comment_page_query(post, sort)
+    ids = [row.id for row in q.with_entities(Comment.id).filter(Comment.parent_id.is_(None)).order_by(rank.desc(), Comment.created.asc(), Comment.id.asc()).limit(COMMENT_SNAPSHOT_MAX + 1)]
+    key = comment_snapshot_key(post.id, sort, generation)
+    staged = f"{key}:build:{uuid4().hex}"
+    pipe = r.pipeline(transaction=True)
+    pipe.rpush(staged, "+" if len(ids) > COMMENT_SNAPSHOT_MAX else "-", *ids[:COMMENT_SNAPSHOT_MAX])
+    pipe.rename(staged, key)
+    pipe.expire(key, COMMENT_SNAPSHOT_TTL)
+    pipe.execute()
+
+
+# generation first pages are served from, building a new snapshot once the current one is due
+def current_comment_snapshot(post, sort):
+    r = get_redis()
+    pointer = comment_snapshot_pointer(post.id, sort)
+    generation = r.get(pointer)
+    if generation is not None:
+        return int(generation)
+    generation = time.time_ns() // 1000
+    build_comment_snapshot(r, post, sort, generation)
+    r.set(pointer, generation, ex=COMMENT_SNAPSHOT_REFRESH)
+    return generation
+
+
+# (rows, their 1-based snapshot positions, has_more) for up to `limit` visible rows from position `pos` on, or None
+# when the snapshot is gone; rows past the end of a cut snapshot are left to the live query.
+def read_comment_snapshot(post, sort, generation, pos, limit):
+
+    r = get_redis()
+    key = comment_snapshot_key(post.id, sort, generation)
+    if not r.exists(key):
+        return None
+
+    q, _ = comment_page_query(post, sort)
+    rows, positions = [], []
+    while len(rows) <= limit:
+        ids = [int(i) for i in r.lrange(key, pos + 1, pos + limit + 1)]
+        if not ids:
+            break
+        by_id = {row.id: row for row in q.filter(Comment.id.in_(ids)).all()}
+        for i, cid in enumerate(ids, start=pos + 1):
+            if cid in by_id:
+                rows.append(by_id[cid])
+                positions.append(i)
+        pos += len(ids)
+        if len(ids) < limit + 1:
+            break
+
+    if len(rows) > limit:
+        return rows[:limit], positions[:limit], True
+    return rows, positions, r.lindex(key, 0) == b"+"
+
+
+def load_comment_page(post, parent_id, cursor, page, n_prefetch=0, depth=1, sort="top"):
+
+    C = Comment
+    per_page = COMMENTS_PER_PAGE if parent_id is None else REPLIES_PER_PAGE
+    q, rank = comment_page_query(post, sort)
+
+    if parent_id is None:
+        if cursor:
+            gen, pos, last_rank, last_created, last_id = cursor
+        else:
+            gen, pos, last_rank = None, max(page - 1, 0) * per_page, None
+
+        found = None
+        if pos != COMMENT_SNAPSHOT_LIVE:
+            try:
+                if gen is None:
+                    gen = current_comment_snapshot(post, sort)
+                found = read_comment_snapshot(post, sort, gen, pos, per_page)
+            except Exception as e:
+                blog_logger.error(f"[{datetime.utcnow()}] COMMENT SNAPSHOT | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+        rows, positions, has_more = found if found is not None else ([], [], True)
+        if has_more and len(rows) < per_page + 1 and (found is None or len(rows) < per_page):
+            # snapshot gone or cut short: continue live after the last row served
+            if rows:
+                last_rank, last_created, last_id = rows[-1].rank or 0, rows[-1].created, rows[-1].id
+            live = q.filter(C.parent_id.is_(None))
+            if last_rank is not None:
+                live = live.filter(or_(rank < last_rank, and_(rank == last_rank, or_(C.created > last_created, and_(C.created == last_created, C.id > last_id)))))
+            else:
+                live = live.offset(pos)
+            extra = live.order_by(rank.desc(), C.created.asc(), C.id.asc()).limit(per_page - len(rows) + 1).all()
+            has_more = len(rows) + len(extra) > per_page
+            rows = (rows + extra)[:per_page]
+            positions = (positions + [COMMENT_SNAPSHOT_LIVE] * len(extra))[:per_page]
+        cursors = [encode_cursor(gen or 0, at, row.rank or 0, row.created, row.id) for row, at in zip(rows, positions)]
+    else:
+        q = q.filter(C.parent_id == parent_id)
+        if cursor:
+            last_created, last_id = cursor
+            q = q.filter(or_(C.created > last_created, and_(C.created == last_created, C.id > last_id)))
+        rows = q.order_by(C.created.asc(), C.id.asc()).limit(per_page + 1).offset(0 if cursor else max(page - 1, 0) * per_page).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        cursors = [encode_cursor(row.created, row.id) for row in rows]
+
+    if not rows:
+        return {"comment_items": [], "cursors": [], "has_more": False, "next_cursor": None}
+    next_cursor = cursors[-1] if has_more else None
+
+    # parents and prefetched replies are hydrated as one batch
+    replies, reply_cursors = [], {}
+    if n_prefetch:
+        replies, reply_cursors = prefetch_replies([r.id for r in rows], n_prefetch, depth)
+    items = _comment_items(rows + replies, post.id, post.author_id)
+
+    data = {"comment_items": items[:len(rows)], "cursors": cursors, "has_more": has_more, "next_cursor": next_cursor}
+    if n_prefetch:
+        data["replies"] = items[len(rows):]
+        data["reply_cursors"] = reply_cursors
+    return data
+
+
+def cached_comment_page(post, parent_id, token, cursor, page, n_prefetch=0, depth=1, sort="top"):
+
+    key = f"post:{post.id}:cpage:{parent_id or 0}:{sort}:{token or page}:{n_prefetch}:{depth}"
+    r = None
+    version = 0
+
+    try:
+        r = get_redis()
+        raw, ver = r.mget(key, comment_version_key(post.id))
+        version = int(ver or 0)
+        if raw:
+            cached = json.loads(raw)
+            if cached.get("version") == version and "cursors" in cached["page"]:
+                return cached["page"]
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] COMMENT PAGE CACHE READ | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+    data = load_comment_page(post, parent_id, cursor, page, n_prefetch, depth, sort)
+
+    if r is not None:
+        try:
+            r.set(key, json.dumps({"version": version, "page": data}), ex=COMMENT_PAGE_TTL)
+        except Exception as e:
+            blog_logger.error(f"[{datetime.utcnow()}] COMMENT PAGE CACHE WRITE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+    return data
+
+
+# Per-viewer layer over comments serialized for an anonymous visitor, in the spirit of overlay_post_items(): take
+# blocked users' reactions out of the totals and the replies the viewer no longer reaches out of n_replies (one
+# grouped query each) and set the viewer's own reaction flags. Edits in place.
+def overlay_comment_items(items, viewer_id, hidden):
+
+    if viewer_id is None or not items:
+        return items
+
+    CC = CommentClosure
+    ids = [it["comment_id"] for it in items]
+    own = viewer_reactions(viewer_id, "c", ids)
+    hidden_reactions = {}
+    hidden_replies = {}
+
+    if hidden:
+        hidden_reactions = count_reactions("c", ids, users=hidden)
+        # the shared n_replies counts the descendants with no tombstone or suspended author between them and the
+        # item; of those, a viewer loses every one with a hidden author on that path, i.e. whole hidden subtrees
+        P1 = aliased(CC)
+        P2 = aliased(CC)
+        X = aliased(Comment)
+        XU = aliased(User)
+
+        def on_path(*cond):
+            return exists().where(P1.ancestor_id == CC.ancestor_id, P1.depth > 0, P2.ancestor_id == P1.descendant_id, P2.descendant_id == CC.descendant_id, X.id == P1.descendant_id, XU.id == X.author_id, *cond)
+
+        hidden_replies = dict(db.session.query(CC.ancestor_id, func.count()).filter(CC.ancestor_id.in_(ids), CC.depth > 0, on_path(X.author_id.in_(hidden)), ~on_path(or_(X.is_deleted.is_(True), XU.is_suspended.is_(True)))).group_by(CC.ancestor_id).all())
+
+    for it in items:
+        cid = it["comment_id"]
+        likes, dislikes = hidden_reactions.get(cid, (0, 0))
+        it["likes"] = max(0, it["likes"] - likes)
+        it["dislikes"] = max(0, it["dislikes"] - dislikes)
+        it["n_replies"] = max(0, it["n_replies"] - hidden_replies.get(cid, 0))
+        it["is_liked"] = (own.get(cid) == 1)
+        it["is_disliked"] = (own.get(cid) == -1)
+    return items
+
+
+def comment_cursor_types(parent_id, sort="top"):
+    if parent_id is None:
+        return int, int, int if sort == "top" else float, datetime, int
+    return datetime, int
+
+
+# Fills a viewer's page from consecutive shared pages, skipping the authors hidden from them, so every page but the
+# last holds a full page of comments and has_more is exact. After COMMENT_TOPUP_ROUNDS shared pages the page goes
+# out short, with has_more set and a cursor past everything read.
+COMMENT_TOPUP_ROUNDS = 4
+
+
+def viewer_comment_page(post, parent_id, token, cursor, page, viewer_id, n_prefetch=0, depth=1, sort="top"):
+
+    per_page = COMMENTS_PER_PAGE if parent_id is None else REPLIES_PER_PAGE
+    # the shared layer already excludes suspended authors; the set is re-checked for suspensions newer than the page
+    suspended = suspended_user_ids()
+    hidden = viewer_block_ids(viewer_id) - suspended
+    gone = hidden | suspended
+
+    items, replies, reply_cursors = [], [], {}
+    last_cursor = None
+    for _ in range(COMMENT_TOPUP_ROUNDS):
+        data = cached_comment_page(post, parent_id, token, cursor, page, n_prefetch, depth, sort)
+        replies += data.get("replies", [])
+        reply_cursors.update(data.get("reply_cursors", {}))
+
+        full = False
+        for it, it_cursor in zip(data["comment_items"], data["cursors"]):
+            if it["author_id"] in gone:
+                continue
+            if len(items) == per_page:
+                full = True
+                break
+            items.append(it)
+            last_cursor = it_cursor
+
+        if full:
+            has_more, next_cursor = True, last_cursor
+            break
+        if not data["has_more"]:
+            has_more, next_cursor = False, None
+            break
+        token = data["next_cursor"]
+        cursor = decode_cursor(token, *comment_cursor_types(parent_id, sort))
+    else:
+        has_more, next_cursor = True, token
+
+    out = {"comment_items": items, "has_more": has_more, "next_cursor": next_cursor}
+    batch = list(items)
+    if n_prefetch:
+        shown = {it["comment_id"] for it in items}
+        kept = []
+        for it in replies:
+            if it["author_id"] not in gone and it["parent_id"] in shown:
+                kept.append(it)
+                shown.add(it["comment_id"])
+        out["replies"] = kept
+        out["reply_cursors"] = {str(pid): c for pid, c in reply_cursors.items() if int(pid) in shown}
+        batch += kept
+
+    overlay_comment_items(batch, viewer_id, hidden)
+    return out
+
+
 ###############################################################################################################
 #########################################Retrieve Parent Comments##############################################
 ###############################################################################################################
@@ -2255,119 +3013,40 @@ def create_comment(post_id):
 
 @bp.route('/retrieve-parent-comments/<int:post_id>/<int:page>', methods=['GET'])
 @limiter.limit("20 per 1 minute")
+@conditional_get(thread_versions)
 def retrieve_comments(post_id, page):
     try:
-        per_page  = 10
+        sort = request.args.get("sort", "top")
+        if sort not in COMMENT_SORTS:
+            return jsonify({"error": "Invalid sort"}), 400
+        cursor = None
+        token = request.args.get("cursor")
+        if token:
+            cursor = decode_cursor(token, *comment_cursor_types(None, sort))
+            if cursor is None:
+                return jsonify({"error": "Invalid cursor"}), 400
         viewer_id = getattr(getattr(g, "user", None), "id", None)
-        C  = Comment
-        U  = User
-        B  = BlockedUsers
-        CR = CommentReactions
 
         post = db.session.get(Post, post_id)
-        
+
         if post is None:
             return '', 400
-        post_author_id = post.author_id    
-        
-        not_blocked_comment = true()
-        if viewer_id is not None:   
-            not_blocked_comment = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)).correlate(C))
-        
-        base_q = (db.session.query(C.id, C.author_id, C.post_id, C.content, C.created, C.likes.label("raw_likes"), C.dislikes.label("raw_dislikes"), C.n_replies.label("raw_n_replies"),).join(U, U.id == C.author_id).filter(C.post_id == post_id,C.parent_id.is_(None), U.is_suspended.is_(False), not_blocked_comment))
-        
-        base_q = base_q.order_by(C.likes.desc(), C.created.asc(), C.id.asc())
-        rows = base_q.limit(per_page + 1).offset(max(page - 1, 0) * per_page).all() 
-        has_more = len(rows) > per_page
-        parents = rows[:per_page]
-        
-        if not parents:
-            return jsonify({"comment_items": [], "has_more": False}), 200
-
-        parent_ids  = [r.id for r in parents]
-        author_ids  = list({r.author_id for r in parents})
-        atts = (db.session.query(CommentAttachment.comment_id, FileUpload).join(FileUpload, FileUpload.id == CommentAttachment.file_upload_id).filter(CommentAttachment.comment_id.in_(parent_ids)).all())
-        
-        attachs_by_comment = defaultdict(list)
-        for cid, fu in atts:
-            attachs_by_comment[cid].append(fu)
 
-        usernames = dict(db.session.query(U.id, U.username).filter(U.id.in_(author_ids)).all())
-        reactions_by_comment = {}
-        user_react_map = {}
-        n_replies_by_parent = {}
-        
-        C2 = aliased(C)
-        C3 = aliased(C)
-        
-        if viewer_id is None:
-        
-            not_blocked_C2 = true()
-            not_blocked_C3  = true()
-            
-        else:
-        
-            q_react = (db.session.query(CR.comment_id,func.sum(case((CR.value == 1, 1), else_=0)).label("likes"),func.sum(case((CR.value == -1, 1), else_=0)).label("dislikes"),).filter(CR.comment_id.in_(parent_ids)).filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == CR.user_id),and_(B.blocker_id == CR.user_id, B.blocked_id == viewer_id),)).correlate(CR)))
-            
-            reactions_by_comment = {cid: {"likes": int(likes or 0), "dislikes": int(dislikes or 0)} for cid, likes, dislikes in q_react.group_by(CR.comment_id).all()}
+        # ?replies=K[&depth=D] inlines the first K replies under each parent (and under those, D levels down)
+        n_prefetch = min(max(request.args.get("replies", 0, type=int), 0), REPLY_PREFETCH_MAX)
+        depth = min(max(request.args.get("depth", 1, type=int), 1), REPLY_PREFETCH_MAX_DEPTH) if n_prefetch else 1
 
-            for cid, val in (db.session.query(CR.comment_id, CR.value).filter(CR.comment_id.in_(parent_ids), CR.user_id == viewer_id).all()):
-                user_react_map[cid] = val
+        return jsonify(viewer_comment_page(post, None, token, cursor, page, viewer_id, n_prefetch, depth, sort)), 200
 
-            not_blocked_C2 = ~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id), and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2)
-            not_blocked_C3 = ~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C3.author_id), and_(B.blocker_id == C3.author_id, B.blocked_id == viewer_id),)).correlate(C3)
 
-      
-        seed = db.session.query(C2.id.label("id"), C2.post_id.label("post_id"), C2.parent_id.label("parent_id"), C2.author_id.label("author_id"), C2.parent_id.label("root_id"),).join(U, U.id == C2.author_id).filter(C2.parent_id.in_(parent_ids)).filter(not_blocked_C2, U.is_suspended.is_(False), )
-        tree = seed.cte(name="visible_children_tree", recursive=True)
-        step = db.session.query(C3.id, C3.post_id, C3.parent_id, C3.author_id, tree.c.root_id).join(U, U.id == C3.author_id).join(tree, C3.parent_id == tree.c.id).filter(not_blocked_C3, U.is_suspended.is_(False),)
-        tree = tree.union_all(step)
-        n_replies_by_parent = dict(db.session.query(tree.c.root_id, func.count()).select_from(tree).group_by(tree.c.root_id).all())
-        
-        items = []
-        for r in parents:
-        
-            cid, aid = r.id, r.author_id
-            likes = reactions_by_comment.get(cid, {}).get("likes", 0)
-            dislikes = reactions_by_comment.get(cid, {}).get("dislikes", 0)
-            attachs = attachs_by_comment.get(cid, [])
-            n_replies = int(n_replies_by_parent.get(cid, 0))
-            val = user_react_map.get(cid)
-            
-            items.append({
-              "comment_id": cid,
-              "post_id": post_id,
-              "author_id": aid,
-              "parent_id": None,
-              "created": to_iso_utc(r.created),
-              "content": r.content,
-              "likes": likes,
-              "dislikes": dislikes,
-              "n_replies": n_replies,
-              "is_liked": (val == 1),
-              "is_disliked": (val == -1),
-              "isliking": False,
-              "isdisliking": False,
-              "isreplying": False,
-              "showchildren": False,
-              "author_username": usernames.get(aid, ""),
-              "parent_username": "",                    
-              "parent_author_id": post_author_id,
-              "post_author_id": post_author_id,
-              "attachments": [serialize_upload(a) for a in attachs],
-            })
-
-        return jsonify({"comment_items": items, "has_more": has_more}), 200
-        
-            
     except IntegrityError as ef:
         blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
         return '', 400
-        
-    except Exception as e:      
+
+    except Exception as e:
         blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
         return '', 500
-        
+
 
 
 ###############################################################################################################
@@ -2375,137 +3054,115 @@ def retrieve_comments(post_id, page):
 ###############################################################################################################
 
 
-        
+
 @bp.route('/retrieve-child-comments/<int:post_id>/<int:parent_id>/<int:page>', methods=['GET'])
 @limiter.limit("25 per 1 minute")
+@conditional_get(thread_versions)
 def retrieve_children(post_id, parent_id, page):
     try:
-        per_page  = 15
+        cursor = None
+        token = request.args.get("cursor")
+        if token:
+            cursor = decode_cursor(token, *comment_cursor_types(parent_id))
+            if cursor is None:
+                return jsonify({"error": "Invalid cursor"}), 400
         viewer_id = getattr(getattr(g, "user", None), "id", None)
-        C  = Comment
-        U  = User
-        B  = BlockedUsers
-        CR = CommentReactions
-        
+
         parent = db.session.get(Comment, parent_id)
         post = db.session.get(Post, post_id)
-        
-        if post is None or parent is None:
-            return '',400
-        
-        parent_author_id = parent.author_id
-        post_author_id = post.author_id
-        parent_username = (db.session.query(U.username).filter(U.id == parent_author_id).scalar()if parent_author_id else "")
-        
-        not_blocked_comment = true()
-        if viewer_id is not None:   
-            not_blocked_comment = (~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)).correlate(C))
-        
-        base_q = (db.session.query(C.id, C.author_id, C.post_id, C.content, C.created, C.likes.label("raw_likes"), C.dislikes.label("raw_dislikes"), C.n_replies.label("raw_n_replies"),).join(U, U.id == C.author_id).filter(C.post_id == post_id,C.parent_id == parent_id, U.is_suspended.is_(False), not_blocked_comment))
-
-        base_q = base_q.order_by(C.created.asc(), C.id.asc())
-        rows = base_q.limit(per_page + 1).offset(max(page - 1, 0) * per_page).all()
-        has_more = len(rows) > per_page
-        children = rows[:per_page]
 
-        if not children:
-            return jsonify({"comment_items": [], "has_more": False}), 200
-
-        child_ids  = [r.id for r in children]
-        author_ids  = list({r.author_id for r in children})
-        atts = (db.session.query(CommentAttachment.comment_id, FileUpload).join(FileUpload, FileUpload.id == CommentAttachment.file_upload_id).filter(CommentAttachment.comment_id.in_(child_ids)).all())
-        
-        attachs_by_comment = defaultdict(list)
-        for cid, fu in atts:
-            attachs_by_comment[cid].append(fu)
+        if post is None or parent is None or comment_tombstoned(db.session, parent_id):
+            return '',400
 
-        usernames = dict(db.session.query(U.id, U.username).filter(U.id.in_(author_ids)).all())
-        reactions_by_comment = {}
-        user_react_map = {}
-        n_replies_by_child = {}
-        
-        C2 = aliased(C)
-        C3 = aliased(C)
-        
-        if viewer_id is None:
-            
-            not_blocked_C2 = true()
-            not_blocked_C3  = true()            
-            
-        else:
-            q_react = (db.session.query(CR.comment_id,func.sum(case((CR.value == 1, 1), else_=0)).label("likes"),func.sum(case((CR.value == -1, 1), else_=0)).label("dislikes"),).filter(CR.comment_id.in_(child_ids)).filter(~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == CR.user_id),and_(B.blocker_id == CR.user_id, B.blocked_id == viewer_id),)).correlate(CR)))
-            
-            reactions_by_comment = {cid: {"likes": int(likes or 0), "dislikes": int(dislikes or 0)} for cid, likes, dislikes in q_react.group_by(CR.comment_id).all()}
-
-            for cid, val in (db.session.query(CR.comment_id, CR.value).filter(CR.comment_id.in_(child_ids), CR.user_id == viewer_id).all()):
-                user_react_map[cid] = val
-        
-            not_blocked_C2 = ~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C2.author_id), and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2)
-            not_blocked_C3  = ~exists().where(or_(and_(B.blocker_id == viewer_id,  B.blocked_id == C3.author_id),and_(B.blocker_id == C3.author_id, B.blocked_id == viewer_id),)).correlate(C3)
-            
-        seed = db.session.query(C2.id.label("id"), C2.post_id.label("post_id"), C2.parent_id.label("parent_id"), C2.author_id.label("author_id"), C2.parent_id.label("root_id"),).join(U, U.id == C2.author_id).filter(C2.parent_id.in_(child_ids), U.is_suspended.is_(False)).filter(not_blocked_C2)
-        tree = seed.cte(name="visible_children_tree", recursive=True)
-        step = db.session.query(C3.id, C3.post_id, C3.parent_id, C3.author_id, tree.c.root_id).join(U, U.id == C3.author_id).join(tree, C3.parent_id == tree.c.id).filter(not_blocked_C3, U.is_suspended.is_(False))
-        tree = tree.union_all(step)
-        n_replies_by_child = dict(db.session.query(tree.c.root_id, func.count()).select_from(tree).group_by(tree.c.root_id).all())
-        
-        
-        items = []
-        for r in children:
-        
-            cid, aid = r.id, r.author_id
-            likes = reactions_by_comment.get(cid, {}).get("likes", 0)
-            dislikes = reactions_by_comment.get(cid, {}).get("dislikes", 0)
-            attachs = attachs_by_comment.get(cid, [])
-            n_replies = int(n_replies_by_child.get(cid, 0))
-            val = user_react_map.get(cid)                 
-            
-            items.append({
-              "comment_id": cid,
-              "post_id": post_id,
-              "author_id": aid,
-              "parent_id": parent_id,
-              "created": to_iso_utc(r.created),
-              "content": r.content,
-              "likes": likes,
-              "dislikes": dislikes,
-              "n_replies": n_replies,
-              "is_liked": (val == 1),
-              "is_disliked": (val == -1),
-              "isliking": False,
-              "isdisliking": False,
-              "isreplying": False,
-              "showchildren": False,
-              "author_username": usernames.get(aid, ""),
-              "parent_username": parent_username or "",                    
-              "parent_author_id": post_author_id,
-              "post_author_id": post_author_id,
-              "attachments": [serialize_upload(a) for a in attachs],
-            })
-
-        return jsonify({"comment_items": items, "has_more": has_more}), 200
+        return jsonify(viewer_comment_page(post, parent_id, token, cursor, page, viewer_id)), 200
 
     except IntegrityError as ef:
         blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
         return '', 400
     except Exception as e:
         blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 500 
+        return '', 500
 
 
 ###############################################################################################################
 #######################################Retrieve Notification Comments##########################################
 ###############################################################################################################
 
-def _ancestor_ids_loop(session, parent_id: int):
-    if parent_id is None:
-        return []
-    out = []
-    cur = parent_id
-    while cur is not None:
-        out.append(cur)
-        cur = session.execute(select(Comment.parent_id).where(Comment.id == cur)).scalar_one_or_none()
-    return out
+# A notified comment and its ancestors come out of one comment_closure join (root first, target last), serialized
+# for an anonymous visitor and cached against post:{id}:cver, since the same notification tends to be opened more
+# than once. The viewer and every block flag are layered on top per request.
+COMMENT_CHAIN_TTL = 600
+
+
+def load_comment_chain(post_id, comment_id):
+
+    C  = Comment
+    U  = User
+    CC = CommentClosure
+
+    rows = db.session.execute(select(C.id, C.post_id, C.author_id, C.parent_id, C.created, C.content, C.is_deleted, U.is_suspended).select_from(CC).join(C, C.id == CC.ancestor_id).join(U, U.id == C.author_id).where(CC.descendant_id == comment_id).order_by(CC.depth.desc())).all()
+
+    if not rows or rows[-1].post_id != post_id or rows[-1].is_suspended or any(r.is_deleted for r in rows):
+        return None
+
+    target, *ancestors = serialize_comments([rows[-1], *[r for r in rows[:-1] if not r.is_suspended]], anonymous=True)
+    return {"target": target, "ancestors": ancestors}
+
+
+def cached_comment_chain(post_id, comment_id):
+
+    key = f"post:{int(post_id)}:chain:{int(comment_id)}"
+    r = None
+    version = 0
+
+    try:
+        r = get_redis()
+        raw, ver = r.mget(key, comment_version_key(post_id))
+        version = int(ver or 0)
+        if raw:
+            cached = json.loads(raw)
+            if cached.get("version") == version:
+                return cached["chain"]
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] COMMENT CHAIN CACHE READ | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+    chain = load_comment_chain(post_id, comment_id)
+
+    if r is not None:
+        try:
+            r.set(key, json.dumps({"version": version, "chain": chain}), ex=COMMENT_CHAIN_TTL)
+        except Exception as e:
+            blog_logger.error(f"[{datetime.utcnow()}] COMMENT CHAIN CACHE WRITE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+    return chain
+
+
+def overlay_comment_chain(chain, viewer_id):
+
+    suspended = suspended_user_ids()
+    hidden = viewer_block_ids(viewer_id) - suspended
+    gone = hidden | suspended
+
+    target = chain["target"]
+    if target["author_id"] in gone:
+        return None
+    ancestors = [it for it in chain["ancestors"] if it["author_id"] not in gone]
+
+    chain_items = [target, *ancestors]
+    overlay_comment_items(chain_items, viewer_id, hidden)
+
+    # block flags are never cached with the chain: block changes don't bump the comment version
+    sets = block_sets({it["author_id"] for it in chain_items} | {it["parent_author_id"] for it in chain_items if it["parent_author_id"]} | {viewer_id})
+    for it in chain_items:
+        author_id, parent_author_id = it["author_id"], it["parent_author_id"]
+        it["im_blocked"] = viewer_id is not None and viewer_id in sets[author_id].blocking
+        it["is_blocked"] = viewer_id is not None and author_id in sets[viewer_id].blocking
+        it["is_parent_blocked"] = bool(parent_author_id) and parent_author_id in sets[author_id].blocking
+        it["im_blocked_by_parent"] = bool(parent_author_id) and author_id in sets[parent_author_id].blocking
+    for it in ancestors:
+        it["showchildren"] = True
+
+    return {"target": target, "ancestors": ancestors}
 
 
 @bp.route('/retrieve-notification-comments/<int:post_id>/<int:comment_id>', methods=['GET'])
@@ -2513,118 +3170,24 @@ def _ancestor_ids_loop(session, parent_id: int):
 @login_required
 def retrieve_notification_comments(post_id, comment_id):
     try:
-       
+
         viewer_id = getattr(getattr(g, "user", None), "id", None)
-        C  = Comment
-        U  = User
-        B  = BlockedUsers
-        CR = CommentReactions
-        A = CommentAttachment
-        F = FileUpload
-        
-        target_q = (db.session.query(C).join(U, U.id == C.author_id).filter(C.post_id == post_id, C.id == comment_id, U.is_suspended.is_(False)))
-        if viewer_id is not None:
-            target_q = target_q.filter(~exists().where(or_(and_(B.blocker_id == viewer_id, B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)))
-        target_row = target_q.one()
-        
-        target_comment = serialize_comment(target_row)
-        
-        ancestor_ids = _ancestor_ids_loop(db.session, target_row.parent_id)
-        if not ancestor_ids:
-            return jsonify({"target": target_comment}), 200
-        
-        ordered_ids = list(reversed(ancestor_ids))
-        order_case = case({cid: idx for idx, cid in enumerate(ordered_ids)}, value=C.id)
-        
-        anc_q = (db.session.query(C, U.username).join(U, U.id == C.author_id).filter(C.id.in_(ancestor_ids), C.post_id == post_id, U.is_suspended.is_(False)).order_by(order_case.asc()))
-        if viewer_id is not None:
-            anc_q = anc_q.filter(~exists().where(or_(and_(B.blocker_id == viewer_id, B.blocked_id == C.author_id), and_(B.blocker_id == C.author_id, B.blocked_id == viewer_id),)))
-        anc_rows = anc_q.all()
-        
-        anc_atts = (db.session.query(A.comment_id, F).join(F, F.id == A.file_upload_id).filter(A.comment_id.in_(ancestor_ids)).all())
-        attachs_by_comment = defaultdict(list)
-        for cid, fu in anc_atts:
-            attachs_by_comment[cid].append(fu)
-
-        reactions_by_comment, user_react_map = {}, {}
-        if viewer_id is not None:
-            q_react = (db.session.query(CR.comment_id, func.sum(case((CR.value == 1, 1), else_=0)).label("likes"), func.sum(case((CR.value == -1, 1), else_=0)).label("dislikes"),).filter(CR.comment_id.in_(ancestor_ids)).filter(~exists().where(or_(and_(B.blocker_id == viewer_id, B.blocked_id == CR.user_id), and_(B.blocker_id == CR.user_id, B.blocked_id == viewer_id),)).correlate(CR)).group_by(CR.comment_id))
-            
-            reactions_by_comment = { cid: {"likes": int(likes or 0), "dislikes": int(dislikes or 0)} for cid, likes, dislikes in q_react.all() }
-            
-            for cid, val in ( db.session.query(CR.comment_id, CR.value).filter(CR.comment_id.in_(ancestor_ids), CR.user_id == viewer_id).all()):
-                user_react_map[cid] = val
-  
-        else:
-            q_react = (db.session.query(CR.comment_id,func.sum(case((CR.value == 1, 1), else_=0)).label("likes"),func.sum(case((CR.value == -1, 1), else_=0)).label("dislikes"),).filter(CR.comment_id.in_(ancestor_ids)).group_by(CR.comment_id))          
-            reactions_by_comment = {cid: {"likes": int(likes or 0), "dislikes": int(dislikes or 0)} for cid, likes, dislikes in q_react.group_by(CR.comment_id).all()}
-
-        
-        def calc_bulk_replies(root_ids: list[int]) -> dict[int, int]:
-            if not root_ids:
-                return {}
-            C2, C3 = aliased(C), aliased(C)
-            not_blocked_2 = true()
-            not_blocked_3 = true()
-            if viewer_id is not None:
-                not_blocked_2 = ~exists().where(or_(and_(B.blocker_id == viewer_id, B.blocked_id == C2.author_id), and_(B.blocker_id == C2.author_id, B.blocked_id == viewer_id),)).correlate(C2)
-                not_blocked_3 = ~exists().where(or_(and_(B.blocker_id == viewer_id, B.blocked_id == C3.author_id), and_(B.blocker_id == C3.author_id, B.blocked_id == viewer_id),)).correlate(C3)
-
-            seed = (db.session.query(C2.id.label("id"), C2.post_id.label("post_id"), C2.parent_id.label("parent_id"), C2.parent_id.label("root_id"),).join(U, U.id == C2.author_id).filter(C2.parent_id.in_(root_ids), C2.post_id == post_id, U.is_suspended.is_(False), not_blocked_2))
-            tree = seed.cte(name="anc_tree", recursive=True)
-            step = (db.session.query(C3.id, C3.post_id, C3.parent_id, tree.c.root_id).join(U, U.id == C3.author_id).join(tree, C3.parent_id == tree.c.id).filter(C3.post_id == post_id, U.is_suspended.is_(False), not_blocked_3))
-            tree = tree.union_all(step)
-            return dict(db.session.query(tree.c.root_id, func.count()).select_from(tree).group_by(tree.c.root_id).all())
-
-        n_replies_by_root = calc_bulk_replies(ancestor_ids)
-        post = db.session.get(Post, post_id)
-        post_author_id = post.author_id if post else None
 
-        items = []
+        chain = cached_comment_chain(post_id, comment_id)
+        chain = overlay_comment_chain(chain, viewer_id) if chain else None
+        if chain is None:
+            return '', 404
 
-        for ancestor, anc_username in anc_rows:
-            likes = reactions_by_comment.get(ancestor.id, {}).get("likes", 0)
-            dislikes = reactions_by_comment.get(ancestor.id, {}).get("dislikes", 0)
-            attachs = attachs_by_comment.get(ancestor.id, [])
-            val = user_react_map.get(ancestor.id)
+        if not chain["target"]["parent_id"]:
+            return jsonify({"target": chain["target"]}), 200
+        return jsonify(chain), 200
 
-            parent_author_id = None            
-            parent_username = ""
-            if ancestor.parent_id:
-                parent_author_id = db.session.query(U.id).filter(U.id == db.session.query(C.author_id).filter(C.id == ancestor.parent_id).scalar()).scalar()
-                parent_username = db.session.query(U.username).filter(U.id == parent_author_id).scalar() or ""
-                 
-            items.append({
-                "comment_id": ancestor.id,
-                "post_id": ancestor.post_id,
-                "author_id": ancestor.author_id,
-                "parent_id": ancestor.parent_id,
-                "created": to_iso_utc(ancestor.created),
-                "content": ancestor.content,
-                "likes": likes,
-                "dislikes": dislikes,
-                "n_replies": int(n_replies_by_root.get(ancestor.id, 0)),
-                "is_liked": (val == 1),
-                "is_disliked": (val == -1),
-                "isliking": False,
-                "isdisliking": False,
-                "isreplying": False,
-                "showchildren": True,
-                "author_username": anc_username or "",
-                "parent_username": parent_username or "",
-                "parent_author_id": post_author_id,
-                "post_author_id": post_author_id,
-                "attachments": [serialize_upload(a) for a in attachs],
-            })
-
-        return jsonify({"target": target_comment, "ancestors": items}), 200
-
-    except IntegrityError:
-        db.session.rollback() 
+    except IntegrityError as ef:
+        db.session.rollback()
         blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
         return '', 400
     except Exception as e:
-        db.session.rollback() 
+        db.session.rollback()
         blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
         return '', 500
 
@@ -2641,30 +3204,17 @@ def retrieve_notification_comments(post_id, comment_id):
 @login_required
 def like_comment(comment_id):
 
-    comment = Comment.query.get_or_404(comment_id)
+    comment = Comment.query.options(load_only(Comment.id, Comment.author_id, Comment.post_id)).filter_by(id=comment_id).first_or_404()
     
     if comment.author_id == g.user.id:
         return '', 400
     
-    r = CommentReactions.query.get((g.user.id, comment_id))
-    
     try:
-        if r is None:
-            db.session.add(CommentReactions(user_id=g.user.id, comment_id=comment_id, value=1))
-        elif r.value == 1:
-            db.session.delete(r)
-        else:
-            r.value = 1
-        db.session.commit()
-        db.session.refresh(comment)
-        r = calc_likes_comment(comment)
-        
-        likes = int(r["likes"] or 0)
-        dislikes = int(r["dislikes"] or 0)
-        liked = int(r["is_liked"] or 0)
-        disliked = int(r["is_disliked"] or 0)
+        value = toggle_reaction("c", comment_id, g.user.id, 1)
+        bump_post_versions(comment.post_id, post=False, comments=True)
+        likes, dislikes = viewer_reaction_counts("c", comment_id, g.user.id)
 
-        return jsonify(liked=liked, disliked=disliked, likes=likes, dislikes=dislikes), 200
+        return jsonify(liked=int(value == 1), disliked=int(value == -1), likes=likes, dislikes=dislikes), 200
             
     except IntegrityError as ef:
         db.session.rollback()
@@ -2683,30 +3233,17 @@ def like_comment(comment_id):
 @login_required
 def dislike_comment(comment_id):
 
-    comment = Comment.query.get_or_404(comment_id)
+    comment = Comment.query.options(load_only(Comment.id, Comment.author_id, Comment.post_id)).filter_by(id=comment_id).first_or_404()
     
     if comment.author_id == g.user.id:
         return '', 400
     
-    r = CommentReactions.query.get((g.user.id, comment_id))
-    
     try:
-        if r is None: 
-            db.session.add(CommentReactions(user_id=g.user.id, comment_id=comment_id, value=-1))
-        elif r.value == -1:
-            db.session.delete(r)
-        else:
-            r.value = -1
-        db.session.commit()
-        db.session.refresh(comment)
-        r = calc_likes_comment(comment)
-        
-        likes = int(r["likes"] or 0)
-        dislikes = int(r["dislikes"] or 0)
-        liked = int(r["is_liked"] or 0)
-        disliked = int(r["is_disliked"] or 0)
+        value = toggle_reaction("c", comment_id, g.user.id, -1)
+        bump_post_versions(comment.post_id, post=False, comments=True)
+        likes, dislikes = viewer_reaction_counts("c", comment_id, g.user.id)
 
-        return jsonify(liked=liked, disliked=disliked, likes=likes, dislikes=dislikes), 200
+        return jsonify(liked=int(value == 1), disliked=int(value == -1), likes=likes, dislikes=dislikes), 200
             
     except IntegrityError as ef:
         db.session.rollback()
@@ -2792,20 +3329,28 @@ def reply_comment(parent_id):
     try:
 
         parent = db.session.execute(select(Comment).where(Comment.id == parent_id).with_for_update()).scalar_one_or_none()
-        if not parent:
+        if not parent or comment_tombstoned(db.session, parent_id):
             return '', 404
+        if comment_depth(db.session, parent_id) + 1 > COMMENT_MAX_DEPTH:
+            return '', 400
            
+        # same rule serialize_comment reports as is_parent_blocked / im_blocked_by_parent, checked before writing
+        if is_user_blocked(g.user.id, parent.author_id) or is_user_blocked(parent.author_id, g.user.id):
+            return '', 403
+            
         parent_user = User.query.get_or_404(parent.author_id)
         parent_username = parent_user.username
             
         post = db.session.execute(select(Post).where(Post.id == parent.post_id).with_for_update()).scalar_one()
         post_slug = post.slug
+        feed_entry = (post.lang, post.category)
         post = calc_n_comments(post)
         new_comment = Comment(post_id=parent.post_id, parent_id=parent_id, author_id=g.user.id, content=cleaned)
         db.session.add(new_comment)
         
         n_comments  = int(post["n_comments"] or 0) + 1
         db.session.flush()
+        link_comment(db.session, new_comment.id, parent_id)
         
         if parent.author_id != g.user.id:
             new_notification = Notification(user_id=parent.author_id, actor_id=g.user.id, parent_post_id=parent.post_id, parent_post_slug=post_slug, parent_comment_id=parent.id, parent_text=make_preview(parent.content), comment_id=new_comment.id, action='reply')
@@ -2829,24 +3374,17 @@ def reply_comment(parent_id):
             db.session.add(CommentAttachment(comment_id=new_comment.id, file_upload_id=u.id))
         db.session.flush()
         
-        ancestor_ids = _ancestor_ids_loop(db.session, parent_id=parent_id)
+        ancestor_ids = comment_ancestor_ids(db.session, parent_id)
         ids = list(set(ancestor_ids))
         if ids:
             stmt = (update(Comment).where(Comment.id.in_(ids)).values(n_replies=func.coalesce(Comment.n_replies, 0) + 1).execution_options(synchronize_session=False))
             db.session.execute(stmt)
  
         payload = serialize_comment(new_comment)
-        parent = calc_n_replies(parent)
-        
-        if payload["is_parent_blocked"]:
-            db.session.rollback()
-            return '', 403
-        elif payload["im_blocked_by_parent"]:
-            db.session.rollback()
-            return '', 403
-        
-        n_replies = int(parent["n_replies"])
+        n_replies = int(calc_n_replies(parent)["n_replies"])
         db.session.commit()
+        bump_feed_versions([feed_entry])
+        bump_post_versions(parent.post_id, comments=True)
 
         return jsonify({"n_comments": n_comments, "n_replies":  n_replies, "reply": payload, "ancestors":  ancestor_ids, "parent_username" : parent_username}), 201
         
@@ -2869,62 +3407,24 @@ def reply_comment(parent_id):
 
 
 
-def child_ids_all(session, root_id: int) -> list[int]:
-    out: list[int] = []
-    visited: set[int] = set()
-    frontier: set[int] = {root_id}
-
-    while frontier:
-        rows = session.execute(select(Comment.id).where(Comment.parent_id.in_(frontier))).scalars().all()
-        new = [cid for cid in rows if cid not in visited]
-        if not new:
-            break
-        out.extend(new)
-        visited.update(new)
-        frontier = set(new)
-
-    return out
-
-
-
 @bp.route('/delete-comment/<int:comment_id>', methods=['DELETE'])
 @limiter.limit("5 per 1 minute")
 @login_required
 def delete_comment(comment_id: int):
     
-    parent_id = None
-    post_id = None
-    ancestor_ids = []
-
     s = db.session
     try:    
         comment = s.execute(select(Comment).where(Comment.id == comment_id).with_for_update()).scalar_one_or_none()
-        if not comment:
+        if not comment or comment_tombstoned(s, comment_id):
             return '', 404
         parent_id = comment.parent_id
-        post_id = comment.post_id
-           
-        post = s.execute(select(Post).where(Post.id == post_id).with_for_update()).scalar_one()
+        post = s.get(Post, comment.post_id)
             
         if comment.author_id != g.user.id and post.author_id != g.user.id:
             return '', 403
-                
-        descendants = child_ids_all(s, root_id=comment_id)
-        ids_to_delete = list(set(descendants) | {comment_id})
-        subtree_size = len(ids_to_delete)
-
-        if parent_id is not None:
-            ancestor_ids = _ancestor_ids_loop(s, parent_id=parent_id)
-            if ancestor_ids:
-                _ = s.execute(select(Comment.id).where(Comment.id.in_(ancestor_ids)).with_for_update()).scalars().all()
-
-        s.query(Comment).filter(Comment.id.in_(ids_to_delete)).delete(synchronize_session=False)
-        n_comments = s.execute(select(func.count()).select_from(Comment).where(Comment.post_id == post_id)).scalar_one()
-        s.execute(update(Post).where(Post.id == post_id).values(n_comments=int(n_comments)))
-
-        if ancestor_ids:
-            stmt = update(Comment).where(Comment.id.in_(tuple(ancestor_ids))).values(n_replies=func.greatest(Comment.n_replies - bindparam("delta"), 0))
-            s.execute(stmt, {"delta": subtree_size})
+            
+        # the replies are removed by purge_comment_subtree in celery; readers skip them from here on
+        tombstone_comment(s, comment)
         
         n_replies = 0
         if parent_id:
@@ -2933,6 +3433,11 @@ def delete_comment(comment_id: int):
             n_replies = int(parent_dict["n_replies"] or 0)
         
         s.commit()
+        bump_feed_versions([(post.lang, post.category)])
+        bump_post_versions(post.id, comments=True)
+        
+        from .celery_tasks import purge_comment
+        purge_comment.delay(comment_id)
         
         post_dictionary = calc_n_comments(post)
         n_comments  = post_dictionary["n_comments"]
@@ -2942,50 +3447,7 @@ def delete_comment(comment_id: int):
     except IntegrityError as ef:
         s.rollback()
         blog_logger.error( f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {ef}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        
-        try:
-            if post_id is None:
-                root = s.get(Comment, comment_id)
-                if not root:
-                    return '', 404
-                post_id = root.post_id
-                parent_id = root.parent_id
-
-            ids = child_ids_all(s, root_id=comment_id)
-            ids.append(comment_id)
-            s.query(Comment).filter(Comment.id.in_(ids)).delete(synchronize_session=False)
-
-            if parent_id is not None:
-                ancestor_ids = _ancestor_ids_loop(s, parent_id=parent_id)
-                if ancestor_ids:
-                    _ = (s.execute(select(Comment.id).where(Comment.id.in_(ancestor_ids)).with_for_update()).scalars().all())
-
-            subtree_size = len(ids)
-
-            n_comments = s.execute(select(func.count()).select_from(Comment).where(Comment.post_id == post_id)).scalar_one()
-            s.execute(update(Post).where(Post.id == post_id).values(n_comments=int(n_comments)))
-
-            if ancestor_ids:
-                stmt = update(Comment).where(Comment.id.in_(tuple(ancestor_ids))).values(n_replies=func.greatest(Comment.n_replies - bindparam("delta"), 0))
-                s.execute(stmt, {"delta": subtree_size})
-
-            n_replies = 0
-            if parent_id:
-                parent = s.get(Comment, parent_id)
-                parent_dict = calc_n_replies(parent)
-                n_replies = int(parent_dict["n_replies"] or 0)
-            
-            s.commit()
-            
-            post_dictionary = calc_n_comments(post)
-            n_comments  = post_dictionary["n_comments"]   
-
-            return jsonify({ "n_comments": int(n_comments), "parent_id": parent_id, "n_replies": n_replies, }), 200
-
-        except Exception as e:
-            s.rollback()
-            blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {e}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-            return '', 500
+        return '', 400
 
     except Exception as e:
         s.rollback()
@@ -3012,8 +3474,12 @@ def delete_post(post_id: int):
         if post.author_id != g.user.id:
             return '', 403
 
+        indexed = (post.id, post.lang, post.category)
         s.delete(post)
         s.commit() 
+        feed_index_remove([indexed])
+        search_index_remove([post_id])
+        bump_post_versions(post_id, comments=True)
         return '', 200
 
     except Exception as e1:
@@ -3027,9 +3493,13 @@ def delete_post(post_id: int):
 
         try:
             
+            indexed = (post.id, post.lang, post.category)
             s.execute(delete(Comment).where(Comment.post_id == post_id))
             s.execute(delete(Post).where(Post.id == post_id))
             s.commit()
+            feed_index_remove([indexed])
+            search_index_remove([post_id])
+            bump_post_versions(post_id, comments=True)
             return '', 200
 
         except Exception as e2:
@@ -3043,6 +3513,7 @@ def delete_post(post_id: int):
                 return '', 403
                 
             try:
+                indexed = (post.id, post.lang, post.category)
                 id_rows = s.execute(select(Comment.id).where(Comment.post_id == post_id).order_by(Comment.id.desc())).scalars().all()
                 
                 BATCH = 10
@@ -3054,6 +3525,9 @@ def delete_post(post_id: int):
                 
                 s.execute(delete(Post).where(Post.id == post_id))
                 s.commit()
+                feed_index_remove([indexed])
+                search_index_remove([post_id])
+                bump_post_versions(post_id, comments=True)
                     
                 return '', 200
                 
@@ -3068,6 +3542,278 @@ def delete_post(post_id: int):
                 return '', 500
 
 
+###############################################################################################################
+###########################################Redis Search Index##################################################
+###############################################################################################################
+
+
+# Inverted index over post titles and bodies: one ZSET per (lang, term), sx:{lang}:{term}, scoring post ids by
+# term weight. Words are indexed whole, and title words also by their prefixes (sx:{lang}:>{prefix}) so the last
+# word of a type-ahead query matches while it is being typed (from SEARCH_PREFIX_MIN characters on, shorter prefix
+# sets would hold most of the corpus); CJK runs, which have no spaces, are indexed as
+# character bigrams. sx:doc:{id} keeps each post's terms so modify/delete can take them out again. The index is
+# only read once SEARCH_READY_KEY exists, i.e. after a full rebuild; until then search falls back to MySQL.
+SEARCH_READY_KEY = "sx:ready"
+SEARCH_REBUILD_LOCK = "sx:rebuild:lock"
+SEARCH_TITLE_WEIGHT = 5
+SEARCH_PREFIX_MIN = 3
+SEARCH_PREFIX_MAX = 10
+SEARCH_BODY_MAX_CHARS = 20000
+SEARCH_MAX_QUERY_TERMS = 8
+SEARCH_MAX_LIMIT = 50
+SEARCH_CACHE_TTL = 30
+SEARCH_FLIGHT_LOCK_MS = 3000
+SEARCH_FLIGHT_WAIT = 0.05
+SEARCH_FLIGHT_TRIES = 20
+SEARCH_CJK = r"\p{Han}\p{Hiragana}\p{Katakana}\p{Hangul}"
+SEARCH_TOKEN_RE = regex.compile(rf"[{SEARCH_CJK}]+|(?:(?![{SEARCH_CJK}])[\p{{L}}\p{{N}}])+")
+SEARCH_CJK_RE = regex.compile(rf"[{SEARCH_CJK}]")
+
+
+def search_key(lang, term):
+    return f"sx:{lang}:{term}"
+    
+    
+# bumped whenever a post enters or leaves the index, which retires every cached result for the language
+def search_version_key(lang):
+    return f"sx:ver:{lang}"
+
+
+# (term, is_cjk) pairs in text order
+def search_tokens(text):
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    out = []
+    for token in SEARCH_TOKEN_RE.findall(text):
+        if SEARCH_CJK_RE.match(token):
+            out.extend((token[i:i + 2], True) for i in range(max(len(token) - 1, 1)))
+        elif len(token) > 1 or token.isdigit():
+            out.append((token, False))
+    return out
+
+
+def search_postings(title, body):
+    weights = defaultdict(int)
+    for term, cjk in search_tokens(title):
+        weights[term] += SEARCH_TITLE_WEIGHT
+        if not cjk:
+            for n in range(SEARCH_PREFIX_MIN, min(len(term), SEARCH_PREFIX_MAX) + 1):
+                weights[">" + term[:n]] = max(weights[">" + term[:n]], SEARCH_TITLE_WEIGHT)
+    text = BeautifulSoup(body or "", "html.parser").get_text(" ")[:SEARCH_BODY_MAX_CHARS]
+    for term, _ in search_tokens(text):
+        weights[term] += 1
+    return weights
+
+
+def _search_unindex(r, post_ids):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    docs = r.mget([f"sx:doc:{int(pid)}" for pid in post_ids])
+    pipe = r.pipeline(transaction=False)
+    for pid, raw in zip(post_ids, docs):
+        if raw:
+            doc = json.loads(raw)
+            for term in doc["terms"]:
+                pipe.zrem(search_key(doc["lang"], term), _feed_member(pid))
+            pipe.delete(f"sx:doc:{int(pid)}")
+            pipe.incr(search_version_key(doc["lang"]))
+    pipe.execute()
+
+
+def _search_index(r, posts):
+    pipe = r.pipeline(transaction=False)
+    for p in posts:
+        weights = search_postings(p.title, p.body)
+        for term, weight in weights.items():
+            pipe.zadd(search_key(p.lang, term), {_feed_member(p.id): weight})
+        pipe.set(f"sx:doc:{int(p.id)}", json.dumps({"lang": p.lang, "terms": list(weights)}))
+        pipe.incr(search_version_key(p.lang))
+    pipe.execute()
+
+
+# posts need id, lang, title and body; re-adding a post replaces its previous terms
+def search_index_add(posts):
+    try:
+        r = get_redis()
+        _search_unindex(r, [p.id for p in posts])
+        _search_index(r, posts)
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] SEARCH INDEX ADD | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+
+def search_index_remove(post_ids):
+    try:
+        _search_unindex(get_redis(), post_ids)
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] SEARCH INDEX REMOVE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+
+def build_search_index(batch_size=500):
+
+    r = get_redis()
+    last_id = 0
+    count = 0
+    while True:
+        posts = db.session.query(Post.id, Post.lang, Post.title, Post.body).filter(Post.id > last_id).order_by(Post.id.asc()).limit(batch_size).all()
+        if not posts:
+            break
+        _search_unindex(r, [p.id for p in posts])
+        _search_index(r, posts)
+        last_id = posts[-1].id
+        count += len(posts)
+
+    r.set(SEARCH_READY_KEY, 1)
+    r.delete(SEARCH_REBUILD_LOCK)
+    return count
+
+
+def schedule_search_rebuild(r):
+    try:
+        if r.set(SEARCH_REBUILD_LOCK, 1, nx=True, ex=1800):
+            from .celery_tasks import rebuild_search_index
+            rebuild_search_index.delay()
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] SEARCH INDEX REBUILD | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+
+# Post ids matching every query term, best first (summed term weights, newer first on ties), plus has_more;
+# None when the index isn't ready and the caller has to fall back to MySQL.
+def search_index_query(lang, query, offset, limit):
+
+    r = get_redis()
+    if not r.exists(SEARCH_READY_KEY):
+        schedule_search_rebuild(r)
+        return None
+
+    tokens = search_tokens(query)[:SEARCH_MAX_QUERY_TERMS]
+    if not tokens:
+        return [], False
+
+    words = [search_key(lang, term) for term, _ in tokens[:-1]]
+    last, cjk = tokens[-1]
+    last_keys = [search_key(lang, last)]
+    if not cjk and len(last) >= SEARCH_PREFIX_MIN:
+        # the last word may still be incomplete: a whole word anywhere or a title prefix both match
+        last_keys.append(search_key(lang, ">" + last[:SEARCH_PREFIX_MAX]))
+
+    if not words:
+        # the top of each set is enough to rank their union, so nothing is copied
+        pipe = r.pipeline(transaction=False)
+        for key in last_keys:
+            pipe.zrevrange(key, 0, offset + limit, withscores=True)
+        best = {}
+        for rows in pipe.execute():
+            for member, score in rows:
+                best[member] = max(score, best.get(member, score))
+        members = sorted(best, key=lambda m: (best[m], m), reverse=True)[offset:offset + limit + 1]
+    else:
+        # ZINTERSTORE walks its smallest input, so with the other words intersected first nothing below scans more
+        # than the rarest of them, however common the last word or its prefix
+        tmp = f"sx:tmp:{uuid4().hex}"
+        parts = [f"{tmp}:{i}" for i in range(len(last_keys))]
+        base = words[0] if len(words) == 1 else f"{tmp}:base"
+        pipe = r.pipeline(transaction=True)
+        if len(words) > 1:
+            pipe.zinterstore(base, words, aggregate="SUM")
+        for part, key in zip(parts, last_keys):
+            pipe.zinterstore(part, [base, key], aggregate="SUM")
+        pipe.zunionstore(tmp, parts, aggregate="MAX")
+        pipe.zrevrange(tmp, offset, offset + limit)
+        pipe.delete(tmp, f"{tmp}:base", *parts)
+        members = pipe.execute()[-2]
+
+    ids = [int(m) for m in members]
+    return ids[:limit], len(ids) > limit
+
+
+# id, title, slug, author_id and author_username for each visible post, in the order given, from one statement
+def search_hits(post_ids):
+    if not post_ids:
+        return []
+    rows = db.session.query(Post.id, Post.title, Post.slug, Post.author_id, User.username).join(User, User.id == Post.author_id).filter(Post.id.in_(post_ids), User.is_suspended.is_(False)).all()
+    by_id = {row.id: row for row in rows}
+    return [by_id[pid] for pid in post_ids if pid in by_id]
+
+
+def search_post_ids(lang, query, offset, limit):
+
+    try:
+        found = search_index_query(lang, query, offset, limit)
+        if found is not None:
+            return found
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] SEARCH INDEX QUERY | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+    # every query term in the title, like the index (CJK as bigrams), whatever the query's length or punctuation
+    terms = list(dict.fromkeys(term for term, _ in search_tokens(query)))[:SEARCH_MAX_QUERY_TERMS]
+    if not terms:
+        return [], False
+    ids = db.session.execute(select(Post.id).join(User, User.id == Post.author_id).where(*[Post.title.ilike(f"%{escape_like(term)}%", escape="\\") for term in terms], Post.lang == lang, User.is_suspended.is_(False)).order_by(Post.likes.desc(), Post.created.desc()).offset(offset).limit(limit + 1)).scalars().all()
+    return list(ids[:limit]), len(ids) > limit
+    
+    
+# JSON value cached at key for ttl seconds. Of concurrent misses only the one holding {key}:lock runs build(), the
+# others poll for its result for up to SEARCH_FLIGHT_TRIES * SEARCH_FLIGHT_WAIT seconds before building it
+# themselves; without Redis every call builds.
+def single_flight(key, build, ttl=SEARCH_CACHE_TTL):
+    
+    r = None
+    try:
+        r = get_redis()
+        raw = r.get(key)
+        if raw is None and not r.set(f"{key}:lock", 1, nx=True, px=SEARCH_FLIGHT_LOCK_MS):
+            for _ in range(SEARCH_FLIGHT_TRIES):
+                time.sleep(SEARCH_FLIGHT_WAIT)
+                raw = r.get(key)
+                if raw is not None:
+                    break
+        if raw is not None:
+            return json.loads(raw)
+    except Exception as e:
+        r = None
+        blog_logger.error(f"[{datetime.utcnow()}] SEARCH CACHE READ | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        
+    value = build()
+    
+    if r is not None:
+        try:
+            pipe = r.pipeline(transaction=False)
+            pipe.set(key, json.dumps(value), ex=ttl)
+            pipe.delete(f"{key}:lock")
+            pipe.execute()
+        except Exception as e:
+            blog_logger.error(f"[{datetime.utcnow()}] SEARCH CACHE WRITE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+            
+    return value
+    
+    
+# Search results are cached per (lang, normalized query, offset, limit) and index version as every viewer sees
+# them; the viewer's blocked and newly suspended authors are dropped afterwards.
+def search_posts_page(query, offset, limit):
+    
+    lang = request.headers.get('X-Lang', 'en')
+    normalized = " ".join(term for term, _ in search_tokens(query))
+    if not normalized:
+        return [], False
+        
+    def build():
+        post_ids, has_more = search_post_ids(lang, normalized, offset, limit)
+        return {"hits": [[hit.id, hit.title, hit.slug, hit.author_id, hit.username] for hit in search_hits(post_ids)], "has_more": has_more}
+        
+    version = 0
+    try:
+        version = int(get_redis().get(search_version_key(lang)) or 0)
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] SEARCH CACHE READ | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        
+    digest = hashlib.sha1(normalized.encode()).hexdigest()
+    page = single_flight(f"sx:cache:{lang}:{version}:{digest}:{offset}:{limit}", build)
+    
+    hidden = viewer_block_ids(getattr(getattr(g, "user", None), "id", None)) | suspended_user_ids()
+    hits = [{"post_id": pid, "title": title, "slug": slug, "author_id": author_id, "author_username": username} for pid, title, slug, author_id, username in page["hits"] if author_id not in hidden]
+    return hits, page["has_more"]
+
+
 ###############################################################################################################
 ###########################################Search Posts######################################################
 ###############################################################################################################
@@ -3082,17 +3828,11 @@ def search_posts():
         query = request.args.get("query", "", type=str)
         limit = request.args.get("limit", type=int, default=10)
         
-        s = db.session
         if not query:
             return jsonify({"items": []})
             
-        query = sanitize_title(query)
-       
-        rows = select(Post).join(User, User.id == Post.author_id).where(Post.title.ilike(f"%{query}%"), User.is_suspended.is_(False)).limit(limit)
-        posts = s.execute(rows).scalars().all()
-        posts = [fetch_post_info(post) for post in posts]
-        
-        items = [{"post_id": post["post_id"], "title": post["title"], "slug": post["slug"], "author_username": post["author_username"] } for post in posts]
+        hits, _ = search_posts_page(query, 0, min(max(limit, 1), SEARCH_MAX_LIMIT))
+        items = [{"post_id": hit["post_id"], "title": hit["title"], "slug": hit["slug"], "author_username": hit["author_username"] } for hit in hits]
         
         return jsonify({"items": items})
         
@@ -3107,6 +3847,135 @@ def search_posts():
         
         
         
+###############################################################################################################
+###########################################Redis Username Index################################################
+###############################################################################################################
+
+
+# Every active account as "{casefolded username}\0{id}\0{username}" in one ZSET with equal scores, so
+# ZRANGEBYLEX returns the usernames starting with a prefix in order. Suspended accounts are taken out and put
+# back with their suspension; blocks are filtered with the viewer's cached block set. Read once
+# USER_INDEX_READY_KEY exists (after a full rebuild), MySQL until then.
+USER_INDEX_KEY = "uidx"
+USER_INDEX_READY_KEY = "uidx:ready"
+USER_INDEX_REBUILD_LOCK = "uidx:rebuild:lock"
+USER_INDEX_SCAN = 100
+
+
+def _username_key(username):
+    return unicodedata.normalize("NFC", username).casefold()
+
+
+def _username_member(user_id, username):
+    return f"{_username_key(username)}\x00{int(user_id)}\x00{username}"
+
+
+# users are (id, username) pairs
+def username_index_add(users):
+    try:
+        members = {_username_member(uid, username): 0 for uid, username in users if uid}
+        if members:
+            get_redis().zadd(USER_INDEX_KEY, members)
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] USERNAME INDEX ADD | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+
+def username_index_remove(users):
+    try:
+        members = [_username_member(uid, username) for uid, username in users]
+        if members:
+            get_redis().zrem(USER_INDEX_KEY, *members)
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] USERNAME INDEX REMOVE | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+
+def build_username_index(batch_size=5000):
+
+    r = get_redis()
+    staged = f"{USER_INDEX_KEY}:build:{uuid4().hex}"
+    last_id = 0
+    count = 0
+    while True:
+        rows = db.session.query(User.id, User.username).filter(User.id > last_id, User.is_suspended.is_(False)).order_by(User.id.asc()).limit(batch_size).all()
+        if not rows:
+            break
+        r.zadd(staged, {_username_member(uid, username): 0 for uid, username in rows if uid})
+        last_id = rows[-1].id
+        count += len(rows)
+
+    pipe = r.pipeline(transaction=True)
+    if count:
+        pipe.rename(staged, USER_INDEX_KEY)
+    else:
+        pipe.delete(USER_INDEX_KEY)
+    pipe.set(USER_INDEX_READY_KEY, 1)
+    pipe.delete(USER_INDEX_REBUILD_LOCK)
+    pipe.execute()
+
+    # accounts registered while the snapshot was being copied
+    username_index_add(db.session.query(User.id, User.username).filter(User.id > last_id, User.is_suspended.is_(False)).all())
+    return count
+
+
+def schedule_username_rebuild(r):
+    try:
+        if r.set(USER_INDEX_REBUILD_LOCK, 1, nx=True, ex=600):
+            from .celery_tasks import rebuild_username_index
+            rebuild_username_index.delay()
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] USERNAME INDEX REBUILD | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+
+# (id, username) pairs whose username starts with query, skipping the ids in exclude, plus has_more; None while
+# the index isn't ready.
+def username_index_search(query, exclude, offset, limit):
+
+    r = get_redis()
+    if not r.exists(USER_INDEX_READY_KEY):
+        schedule_username_rebuild(r)
+        return None
+
+    prefix = _username_key(query).encode()
+    low, high = b"[" + prefix, b"(" + prefix + b"\xff"
+    found = []
+    start = 0
+    while True:
+        chunk = r.zrangebylex(USER_INDEX_KEY, low, high, start=start, num=USER_INDEX_SCAN)
+        start += len(chunk)
+        for member in chunk:
+            _, uid, username = member.decode().split("\x00")
+            if int(uid) in exclude:
+                continue
+            if offset:
+                offset -= 1
+                continue
+            found.append((int(uid), username))
+            if len(found) > limit:
+                return found[:limit], True
+        if len(chunk) < USER_INDEX_SCAN:
+            return found, False
+
+
+# usernames may contain "_", which LIKE would otherwise read as a wildcard
+def escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_usernames(query, offset, limit):
+
+    viewer_id = g.user.id
+    exclude = viewer_block_ids(viewer_id) | suspended_user_ids() | {0, viewer_id}
+    try:
+        found = username_index_search(query, exclude, offset, limit)
+        if found is not None:
+            return found
+    except Exception as e:
+        blog_logger.error(f"[{datetime.utcnow()}] USERNAME INDEX QUERY | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+
+    rows = db.session.execute(select(User.id, User.username).where(User.username.ilike(f"{escape_like(query)}%", escape="\\"), User.is_suspended.is_(False), User.id.notin_(exclude)).order_by(User.username.asc()).offset(offset).limit(limit + 1)).all()
+    return [(row.id, row.username) for row in rows[:limit]], len(rows) > limit
+
+
 ###############################################################################################################
 ###########################################Search Users########################################################
 ###############################################################################################################
@@ -3118,28 +3987,17 @@ def search_posts():
 def search_users():
 
     try:
-        query = request.args.get("query", "", type=str)
+        query = request.args.get("query", "", type=str).strip()
         limit = request.args.get("limit", type=int, default=10)
         
-        s = db.session
         if not query:
             return jsonify({"items": []})
             
         if not is_valid_user(query):
             return jsonify({"items": []})
-            
-        B = BlockedUsers
-        U = User
-        
-        if g.user is None: 
-            not_blocked = true()
-        else:
-            not_blocked = ~exists().where(or_(and_(B.blocker_id == g.user.id,  B.blocked_id == U.id), and_(B.blocker_id == U.id, B.blocked_id == g.user.id),)).correlate(U)
         
-        rows = select(User).where(User.username.ilike(f"%{query}%"), User.is_suspended.is_(False), not_blocked, User.id != 0, User.id != g.user.id ).limit(limit)
-        users = s.execute(rows).scalars().all()
-        
-        items = [{ "id": user.id, "username": user.username,} for user in users]
+        users, _ = search_usernames(query, 0, min(max(limit, 1), SEARCH_MAX_LIMIT))
+        items = [{ "id": uid, "username": username,} for uid, username in users]
         
         return jsonify({"items": items})
         
@@ -3172,16 +4030,10 @@ def search_posts_batch(page):
         if not query:
             return jsonify({"items": []})
             
-        query = sanitize_title(query)
-             
-        page_obj = Post.query.join(User, User.id == Post.author_id).filter(Post.title.ilike(f"%{query}%"), User.is_suspended.is_(False)).order_by(Post.likes.desc(), Post.created.desc()).paginate(page=page, per_page=limit, error_out=False)
-        
-        posts = page_obj.items
-        posts = [fetch_post_info(post) for post in posts]
-        
-        items = [{"post_id": post["post_id"], "title": post["title"], "slug": post["slug"], "author_username": post["author_username"], "author_id": post["author_id"], } for post in posts ]
+        limit = min(max(limit, 1), SEARCH_MAX_LIMIT)
+        items, has_more = search_posts_page(query, max(page - 1, 0) * limit, limit)
         
-        return jsonify({"items": items, "has_more": page_obj.has_next})
+        return jsonify({"items": items, "has_more": has_more})
         
     except IntegrityError as ef:
         blog_logger.error(f"[{datetime.utcnow()}] USER: {getattr(getattr(g, 'user', None), 'username', 'anonymous')} | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
@@ -3204,7 +4056,7 @@ def search_posts_batch(page):
 def search_users_batch(page):
 
     try:
-        query = request.args.get("q", "", type=str)
+        query = request.args.get("q", "", type=str).strip()
         limit = request.args.get("limit", type=int, default=10)
         
         if not query:
@@ -3213,10 +4065,9 @@ def search_users_batch(page):
         if not is_valid_user(query):
             return jsonify({"items": []})
         
-        page_obj = User.query.filter(User.username.ilike(f"%{query}%"), User.is_suspended.is_(False), User.id != 0, User.id != g.user.id).order_by(User.id.desc()).paginate(page=page, per_page=limit, error_out=False)
-        users = page_obj.items
-        
-        items = [{ "id": user.id, "username": user.username, } for user in users]
+        limit = min(max(limit, 1), SEARCH_MAX_LIMIT)
+        users, _ = search_usernames(query, max(page - 1, 0) * limit, limit)
+        items = [{ "id": uid, "username": username, } for uid, username in users]
         
         return jsonify({"items": items})
         
@@ -3276,6 +4127,7 @@ def block_user(blocked_id: int):
     try:
         db.session.add(row)
         db.session.commit()
+        invalidate_block_sets(g.user.id, blocked_id)
         
         return jsonify(message='This user has been blocked.'), 200
         
@@ -3299,6 +4151,7 @@ def unblock_user(blocked_id: int):
     try:
         db.session.query(BlockedUsers).filter_by(blocker_id=g.user.id, blocked_id=blocked_id).delete()
         db.session.commit()
+        invalidate_block_sets(g.user.id, blocked_id)
         
         return '', 200
         
@@ -3426,12 +4279,13 @@ def suspend_user(user_id: int):
     try:
     
         user = User.query.filter_by(id = user_id).first()
-        if not check_password_hash(user.password, password):
+        if not verify_password(user.password, password):
             return jsonify({"message": "PASSWORD_WRONG"}), 400
             
         #suspend_billing()     
         user.is_suspended = True
         db.session.commit()
+        user_suspension_changed(user.id, True)
         
         return '', 200
         
@@ -3459,7 +4313,7 @@ def delete_user(user_id: int):
     
         user = User.query.filter_by(id = user_id).first()
         
-        if not check_password_hash(user.password, password):
+        if not verify_password(user.password, password):
             return jsonify({"message": "PASSWORD_WRONG"}), 400
             
         from .celery_tasks import send_delete_account_email
@@ -3494,6 +4348,7 @@ def confirm_account_deletion(token):
       user.delete_request_date = datetime.utcnow()
       
       db.session.commit()
+      user_suspension_changed(user.id, True)
       return '', 200
 
 
@@ -3642,6 +4497,7 @@ def upload():
                     fu = FileUpload.query.get(upload_id)
                     if fu:
                         fu.variants = {k: f"static/uploads/{v}" for k, v in saved_variants.items()}
+                        fu.public_urls = upload_public_urls(fu)
                         db.session.commit()
                 
                 except IntegrityError as ef:
@@ -3750,19 +4606,8 @@ def moderation_status(upload_id):
     }
 
     if fu.status=='approved':     
-        variants = getattr(fu, 'variants', None)
-        url = None
-        location = None
-        thumbnail = None
-        if not variants:
-            url = abs_url(f"static/uploads/{os.path.basename(fu.path)}")
-            if fu.thumbnail is not None:
-                thumbnail = abs_url(f"static/uploads/{os.path.basename(fu.thumbnail)}")
-        else:
-            for k, v in list(variants.items()):
-                variants[k] = abs_url(v)
-        
-        return jsonify({**base, 'variants': variants or None, 'location': url, "thumbnail": thumbnail}), 200
+        urls = serialize_upload(fu)
+        return jsonify({**base, 'variants': urls["variants"], 'location': urls["url"], "thumbnail": urls["thumbnail"]}), 200
         
     elif fu.status=='rejected':      
         return jsonify({**base, 'message': 'Upload was rejected due to content policy.'}), 200
@@ -3867,6 +4712,7 @@ def stripe_webhook():
         if user:
             user.is_premium = status in PREMIUM_TRUE
             db_session.commit()
+            invalidate_session_user(user.id)
             
     elif t == "customer.subscription.deleted":
         customer_id = obj["customer"]
@@ -3876,6 +4722,7 @@ def stripe_webhook():
             user.customer_id = None
             user.subscription_provider = ""
             db_session.commit()
+            invalidate_session_user(user.id)
             
     elif t == "checkout.session.completed":
         customer_id = obj.get("customer")
@@ -1,6 +1,7 @@
 import mimetypes, smtplib, logging, shutil, tempfile, fitz, subprocess, os, json, traceback, json, concurrent.futures
 from flask import current_app, render_template
-from .blog import upload_logger, blog_logger
+from .blog import upload_logger, blog_logger, build_feed_index, feed_index_remove, set_suspended_ids, upload_public_urls, build_hot_index, flush_reaction_counters, comment_tombstoned, tombstone_comment, purge_comment_subtree, purge_deleted_comments, COMMENT_PURGE_BATCH, build_search_index, search_index_remove, build_username_index, username_index_remove
+from .auth import invalidate_session_user
 from .models import User, FileUpload, MessageAttachment, PostAttachment, CommentAttachment, BioAttachment, Comment, Post, ThreadUser,Thread, Message
 from .extensions import db
 from datetime import datetime, timezone, timedelta
@@ -200,8 +201,11 @@ def moderate_file_async(path, mime, username, ip, filename, is_animated=None):
             strip_pdf_metadata(path, username, ip, filename)
         
         try:
-            rows_updated = FileUpload.query.filter_by(path=path).update({"status": "approved"})
-            if rows_updated:
+            rows = FileUpload.query.filter_by(path=path).all()
+            for fu in rows:
+                fu.status = "approved"
+                fu.public_urls = upload_public_urls(fu)
+            if rows:
                 db.session.commit()
             else:
                 pass
@@ -578,172 +582,31 @@ def delete_backed_up_files():
 ###############################################################################################################       
                 
                       
+# Same path as the delete-comment route: tombstone, then purge the subtree in batches.
 def delete_comment(comment_id: int):
     
-    parent_id = None
-    post_id = None
-    ancestor_ids = []
-
     s = db.session
-    try:    
-        comment = s.execute(select(Comment).where(Comment.id == comment_id).with_for_update()).scalar_one_or_none()
-        if not comment:
-            return '', 404
-        parent_id = comment.parent_id
-        post_id = comment.post_id
-           
-        post = s.execute(select(Post).where(Post.id == post_id).with_for_update()).scalar_one()
-            
-        if comment.author_id != g.user.id and post.author_id != g.user.id:
-            return '', 403
-                
-        descendants = child_ids_all(s, root_id=comment_id)
-        ids_to_delete = list(set(descendants) | {comment_id})
-        subtree_size = len(ids_to_delete)
-
-        if parent_id is not None:
-            ancestor_ids = _ancestor_ids_loop(s, parent_id=parent_id)
-            if ancestor_ids:
-                _ = s.execute(select(Comment.id).where(Comment.id.in_(ancestor_ids)).with_for_update()).scalars().all()
-
-        s.query(Comment).filter(Comment.id.in_(ids_to_delete)).delete(synchronize_session=False)
-        n_comments = s.execute(select(func.count()).select_from(Comment).where(Comment.post_id == post_id)).scalar_one()
-        s.execute(update(Post).where(Post.id == post_id).values(n_comments=int(n_comments)))
-
-        if ancestor_ids:
-            stmt = update(Comment).where(Comment.id.in_(tuple(ancestor_ids))).values(n_replies=func.greatest(Comment.n_replies - bindparam("delta"), 0))
-            s.execute(stmt, {"delta": subtree_size})
-        
-        n_replies = 0
-        if parent_id:
-            parent = s.get(Comment, parent_id)
-            parent_dict = calc_n_replies(parent)
-            n_replies = int(parent_dict["n_replies"] or 0)
-        
-        s.commit()
-        
-        post_dictionary = calc_n_comments(post)
-        n_comments  = post_dictionary["n_comments"]
-
-        return jsonify({ "n_comments": int(n_comments), "parent_id": parent_id, "n_replies": n_replies, }), 200
-
-    except IntegrityError as ef:
-        s.rollback()
-        
-        try:
-            if post_id is None:
-                root = s.get(Comment, comment_id)
-                if not root:
-                    return '', 404
-                post_id = root.post_id
-                parent_id = root.parent_id
-
-            ids = child_ids_all(s, root_id=comment_id)
-            ids.append(comment_id)
-            s.query(Comment).filter(Comment.id.in_(ids)).delete(synchronize_session=False)
-
-            if parent_id is not None:
-                ancestor_ids = _ancestor_ids_loop(s, parent_id=parent_id)
-                if ancestor_ids:
-                    _ = (s.execute(select(Comment.id).where(Comment.id.in_(ancestor_ids)).with_for_update()).scalars().all())
-
-            subtree_size = len(ids)
-
-            n_comments = s.execute(select(func.count()).select_from(Comment).where(Comment.post_id == post_id)).scalar_one()
-            s.execute(update(Post).where(Post.id == post_id).values(n_comments=int(n_comments)))
-
-            if ancestor_ids:
-                stmt = update(Comment).where(Comment.id.in_(tuple(ancestor_ids))).values(n_replies=func.greatest(Comment.n_replies - bindparam("delta"), 0))
-                s.execute(stmt, {"delta": subtree_size})
-
-            n_replies = 0
-            if parent_id:
-                parent = s.get(Comment, parent_id)
-                parent_dict = calc_n_replies(parent)
-                n_replies = int(parent_dict["n_replies"] or 0)
-            
-            s.commit()
-            
-            post_dictionary = calc_n_comments(post)
-            n_comments  = post_dictionary["n_comments"]   
-
-            return jsonify({ "n_comments": int(n_comments), "parent_id": parent_id, "n_replies": n_replies, }), 200
-
-        except Exception as e:
-            s.rollback()
-            manteinance_logger.error(f"[{datetime.utcnow()}] | TASK: CLEANUP_DB | ERROR: {e}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-            return '', 500
-
-    except Exception as e:
-        s.rollback()
-        manteinance_logger.error(f"[{datetime.utcnow()}] | TASK: CLEANUP_DB | ERROR: {e}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-        return '', 500                
+    comment = s.get(Comment, comment_id)
+    if comment is None or comment_tombstoned(s, comment_id):
+        return
+    tombstone_comment(s, comment)
+    s.commit()
+    purge_comment_subtree(comment_id)
 
 
 
-def delete_post(post_id: int):
+def delete_post(post_id: int, batch_size=COMMENT_PURGE_BATCH):
+    
     s = db.session
-    try:
-        post = s.execute(select(Post).where(Post.id == post_id).with_for_update()).scalar_one_or_none()
-        if not post:
-            return '', 404
-        if post.author_id != g.user.id:
-            return '', 403
-
-        s.delete(post)
-        s.commit() 
-        return '', 200
-
-    except Exception as e1:
-        s.rollback()
+    while True:
+        ids = s.execute(select(Comment.id).where(Comment.post_id == post_id).order_by(Comment.id.desc()).limit(batch_size)).scalars().all()
+        if not ids:
+            break
+        s.execute(delete(Comment).where(Comment.id.in_(ids)))
+        s.commit()
         
-        post = s.execute(select(Post).where(Post.id == post_id).with_for_update()).scalar_one_or_none()
-        if not post:
-            return '', 404
-        if post.author_id != g.user.id:
-            return '', 403
-
-        try:
-            
-            s.execute(delete(Comment).where(Comment.post_id == post_id))
-            s.execute(delete(Post).where(Post.id == post_id))
-            s.commit()
-            return '', 200
-
-        except Exception as e2:
-            
-            s.rollback()
-            post = s.execute(select(Post).where(Post.id == post_id).with_for_update()).scalar_one_or_none()
-            
-            if not post:
-                return '', 404
-            if post.author_id != g.user.id:
-                return '', 403
-                
-            try:
-                id_rows = s.execute(select(Comment.id).where(Comment.post_id == post_id).order_by(Comment.id.desc())).scalars().all()
-                
-                BATCH = 10
-
-                for i in range(0, len(id_rows), BATCH):
-                    batch = id_rows[i:i+BATCH]
-                    if batch:
-                        s.execute(delete(Comment).where(Comment.id.in_(batch)))
-                
-                s.execute(delete(Post).where(Post.id == post_id))
-                s.commit()
-                    
-                return '', 200
-                
-            except IntegrityError as ef:
-                s.rollback()
-                manteinance_logger.error(f"[{datetime.utcnow()}] | TASK: CLEANUP_DB | ERROR: {str(ef)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-                return '', 400
-
-            except Exception as e3:
-                s.rollback()
-                manteinance_logger.error(f"[{datetime.utcnow()}] | TASK: CLEANUP_DB | ERROR: {str(e3)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
-                return '', 500              
+    s.execute(delete(Post).where(Post.id == post_id))
+    s.commit()
                 
                 
             
@@ -773,10 +636,16 @@ def cleanup_db():
         if not ids:
             break
         ids_tuple = tuple(ids)
+        authored = s.query(Post.id, Post.lang, Post.category).filter(Post.author_id.in_(ids_tuple)).all()
+        feed_index_remove(authored)
+        search_index_remove([p.id for p in authored])
+        username_index_remove(s.query(User.id, User.username).filter(User.id.in_(ids_tuple)).all())
             
         try:       
             s.query(User).filter(User.id.in_(ids_tuple)).delete(synchronize_session=False)   
             s.commit()
+            set_suspended_ids(ids, False)
+            invalidate_session_user(*ids)
             continue
         
         except Exception:            
@@ -798,10 +667,10 @@ def cleanup_db():
                 s.query(MessageReaction).filter(MessageReaction.user_id.in_(ids_tuple)).delete(synchronize_session=False)
                 s.query(Message).filter(Message.sender_id.in_(ids_tuple)).delete(synchronize_session=False)
             
-                for comment in s.query(Comment).filter(Comment.author_id.in_(ids_tuple)).yield_per(500):
-                    delete_comment(comment.id)
-                for post in s.query(Post).filter(Post.author_id.in_(ids_tuple)).yield_per(200):
-                    delete_post(post.id)
+                for comment_id in s.execute(select(Comment.id).where(Comment.author_id.in_(ids_tuple)).order_by(Comment.id.asc())).scalars().all():
+                    delete_comment(comment_id)
+                for post_id in s.execute(select(Post.id).where(Post.author_id.in_(ids_tuple))).scalars().all():
+                    delete_post(post_id)
                 
                 s.commit()
             except Exception as e:
@@ -811,9 +680,89 @@ def cleanup_db():
         try:
             s.query(User).filter(User.id.in_(ids_tuple)).delete(synchronize_session=False)
             s.commit()
+            set_suspended_ids(ids, False)
+            invalidate_session_user(*ids)
         except Exception as e:
             s.rollback()
             manteinance_logger.error(f"[{datetime.utcnow()}] | TASK: CLEANUP_DB |ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
             continue
                        
     
+                
+                
+                
+@celery.task(name='server.celery_tasks.maintenance.rebuild_feed_index', autoretry_for=(ConnectionError, TimeoutError), retry_backoff=True, retry_jitter=True, retry_kwargs={'max_retries': 5})                                                             
+def rebuild_feed_index():
+    
+    try:
+        build_feed_index()
+    except Exception as e:
+        db.session.rollback()
+        manteinance_logger.error(f"[{datetime.utcnow()}] | TASK: REBUILD_FEED_INDEX | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        
+        
+        
+@celery.task(name='server.celery_tasks.maintenance.rebuild_search_index', autoretry_for=(ConnectionError, TimeoutError), retry_backoff=True, retry_jitter=True, retry_kwargs={'max_retries': 5})                                                             
+def rebuild_search_index():
+    
+    try:
+        build_search_index()
+    except Exception as e:
+        db.session.rollback()
+        manteinance_logger.error(f"[{datetime.utcnow()}] | TASK: REBUILD_SEARCH_INDEX | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        
+        
+        
+@celery.task(name='server.celery_tasks.maintenance.rebuild_username_index', autoretry_for=(ConnectionError, TimeoutError), retry_backoff=True, retry_jitter=True, retry_kwargs={'max_retries': 5})                                                             
+def rebuild_username_index():
+    
+    try:
+        build_username_index()
+    except Exception as e:
+        db.session.rollback()
+        manteinance_logger.error(f"[{datetime.utcnow()}] | TASK: REBUILD_USERNAME_INDEX | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        
+        
+        
+@celery.task(name='server.celery_tasks.maintenance.rank_hot_posts')
+def rank_hot_posts():
+    
+    try:
+        build_hot_index()
+    except Exception as e:
+        db.session.rollback()
+        manteinance_logger.error(f"[{datetime.utcnow()}] | TASK: RANK_HOT_POSTS | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        
+        
+        
+@celery.task(name='server.celery_tasks.maintenance.flush_reaction_counters')
+def flush_reactions():
+    
+    try:
+        flush_reaction_counters()
+    except Exception as e:
+        db.session.rollback()
+        manteinance_logger.error(f"[{datetime.utcnow()}] | TASK: FLUSH_REACTION_COUNTERS | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        
+        
+        
+@celery.task(name='server.celery_tasks.maintenance.purge_comment', autoretry_for=(ConnectionError, TimeoutError), retry_backoff=True, retry_jitter=True, retry_kwargs={'max_retries': 5})
+def purge_comment(comment_id):
+    
+    try:
+        purge_comment_subtree(comment_id)
+    except Exception as e:
+        db.session.rollback()
+        manteinance_logger.error(f"[{datetime.utcnow()}] | TASK: PURGE_COMMENT | COMMENT: {comment_id} | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
+        
+        
+        
+# picks up tombstones whose purge_comment never ran or stopped half way
+@celery.task(name='server.celery_tasks.maintenance.purge_deleted_comments')
+def purge_tombstones():
+    
+    try:
+        purge_deleted_comments()
+    except Exception as e:
+        db.session.rollback()
+        manteinance_logger.error(f"[{datetime.utcnow()}] | TASK: PURGE_DELETED_COMMENTS | ERROR: {str(e)}\nTRACEBACK:\n{traceback.format_exc()}\n{'-'*60}")
@@ -1,20 +1,19 @@
 from flask import Flask, request, session, g, current_app
 from flask_socketio import emit, join_room, leave_room
 from datetime import timezone, datetime
-from sqlalchemy import func, exists, and_, select, case, tuple_, or_
+from sqlalchemy import func, exists, and_, select, case, tuple_
 from sqlalchemy.orm import aliased
 import uuid
 import logging
 import traceback
 from .extensions import socketio, r, db
-from .models import Thread, ThreadUser, Message, MessageReaction, User, BlockedUsers, MessageAttachment, FileUpload, Notification
+from .models import Thread, ThreadUser, Message, MessageReaction, User, MessageAttachment, FileUpload, Notification
 from collections import defaultdict, Counter
 import os
-from urllib.parse import urljoin
 from time import time
 import math
 import bleach
-from .blog import is_effectively_empty, sanitize_title, TITLE_RE
+from .blog import is_effectively_empty, sanitize_title, TITLE_RE, viewer_block_ids, not_hidden, serialize_upload, load_attachments
 import regex
 import boto3
 from pathlib import Path
@@ -170,11 +169,9 @@ def get_threads():
     msgs = aliased(Message) 
     su   = aliased(User)
 
-    blocked_ids_q = db.session.query(BlockedUsers.blocked_id).filter(BlockedUsers.blocker_id == me)
-    blockers_ids_q = db.session.query(BlockedUsers.blocker_id).filter(BlockedUsers.blocked_id == me)
-    forbidden_ids_q = blocked_ids_q.union(blockers_ids_q)
+    forbidden_ids = viewer_block_ids(me)
 
-    other_participant_exists = exists(select(1).select_from(ThreadUser).join(User, User.id == ThreadUser.user_id).where(ThreadUser.thread_id == Thread.id, ThreadUser.user_id != me, User.is_suspended.is_(False),~ThreadUser.user_id.in_(forbidden_ids_q),)).correlate(Thread)  
+    other_participant_exists = exists(select(1).select_from(ThreadUser).join(User, User.id == ThreadUser.user_id).where(ThreadUser.thread_id == Thread.id, ThreadUser.user_id != me, User.is_suspended.is_(False), not_hidden(ThreadUser.user_id, forbidden_ids),)).correlate(Thread)  
     
     lr = func.coalesce(me_link.last_read_message_id, 0)
     usernames_expr = func.group_concat(func.distinct(User.username).op("ORDER BY")(User.username)).label("usernames_csv")
@@ -226,43 +223,6 @@ def on_join_thread(data):
     join_room(_thread_room(thread_id))
 
 
-PUBLIC_BASE_URL = os.getenv('FRONTEND_URL')
-def abs_url(path: str) -> str:
-    path = "/api/" + path.lstrip("/")
-    return urljoin(PUBLIC_BASE_URL, path)
-
-
-
-
-def serialize_upload(fu):    
-    variants = getattr(fu, 'variants', None)
-    url = None
-    thumbnail = None
-    if not variants:
-        url = abs_url(f"static/uploads/{os.path.basename(fu.path)}")
-        if fu.thumbnail is not None:
-            thumbnail = abs_url(f"static/uploads/{os.path.basename(fu.thumbnail)}")
-    else:
-        for k, v in list(variants.items()):
-            variants[k] = abs_url(v)
-
-    return {
-        "id": int(fu.id),
-        "mime": fu.mime,
-        "variants": variants,
-        "url": url,
-        "w_variants": fu.w_variants,
-        "w_path": fu.w_path,
-        "width": getattr(fu, 'width', None),
-        "height": getattr(fu, 'height', None),
-        "duration_sec": getattr(fu, 'duration_sec', None),
-        "status": fu.status,
-        "name": fu.filename,
-        "thumbnail": thumbnail
-    }
-
-
-
 @socketio.on('load_thread')
 def on_load_thread(data):
     
@@ -287,11 +247,7 @@ def on_load_thread(data):
     last_read_id = (db.session.query(ThreadUser.last_read_message_id).filter(ThreadUser.thread_id == thread_id, ThreadUser.user_id == user_id).scalar()) or 0
     
     message_ids = [m.id for m in messages]
-    atts = (db.session.query(MessageAttachment.message_id, FileUpload).join(FileUpload, FileUpload.id == MessageAttachment.file_upload_id).filter(MessageAttachment.message_id.in_(message_ids)).all())
-    
-    attachs_by_message = defaultdict(list)
-    for cid, fu in atts:
-        attachs_by_message[cid].append(fu)
+    attachs_by_message = load_attachments("message", message_ids)
     
     rx_rows = (db.session.query(MessageReaction.message_id, MessageReaction.user_id, MessageReaction.emoji, User.username,).join(User, User.id == MessageReaction.user_id).filter(MessageReaction.message_id.in_(message_ids),User.is_suspended.is_(False),).all())
     raw_by_msg = defaultdict(list)
@@ -318,7 +274,7 @@ def on_load_thread(data):
         d["isFirstUnread"] = (m.id == first_unread_id)
         d["reactions"] = raw
         d["reactionCounts"] = [{"emoji": e, "count": c} for e, c in cnt.most_common()]
-        d["attachments"] = [serialize_upload(a) for a in attachs]
+        d["attachments"] = attachs
         out.append(d)
         
     return out
@@ -958,10 +914,9 @@ def on_notifications_sync_request(data):
             return
                 
         lang = str(data.get("lang") or "en")
-        B = BlockedUsers
-        blocked_exists = exists().where( or_( and_(B.blocker_id == me, B.blocked_id == Notification.actor_id), and_(B.blocker_id == Notification.actor_id, B.blocked_id == me), ))
+        not_blocked = not_hidden(Notification.actor_id, viewer_block_ids(me))
         
-        notifs = db.session.query(Notification, User.username).join(User, User.id == Notification.actor_id).filter(Notification.user_id == me).filter(~blocked_exists ,User.is_suspended.is_(False)).order_by(Notification.created_at.desc(), Notification.id.desc()).limit(200).all()
+        notifs = db.session.query(Notification, User.username).join(User, User.id == Notification.actor_id).filter(Notification.user_id == me).filter(not_blocked, User.is_suspended.is_(False)).order_by(Notification.created_at.desc(), Notification.id.desc()).limit(200).all()
         
         groups = defaultdict(list)
 
@@ -27,10 +27,10 @@ def init_redis(app):
     r = client  
 
 
-#def get_redis():
-    #client = current_app.extensions.get('redis_client')
-    #if client is None:
-    #    url = current_app.config['REDIS_URL']
-    #    client = Redis.from_url(url)
-    #    current_app.extensions['redis_client'] = client
-    #return client
+def get_redis():
+    client = current_app.extensions.get('redis_client')
+    if client is None:
+        url = current_app.config['REDIS_URL']
+        client = Redis.from_url(url)
+        current_app.extensions['redis_client'] = client
+    return client
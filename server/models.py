@@ -155,7 +155,8 @@ class BioAttachment(db.Model):
 
 class Post(db.Model):
     __tablename__ = 'post'
-    __table_args__ = ( UniqueConstraint('title', 'author_id', name='uix_title_author'), CheckConstraint("lang IN ('en', 'it', 'fr', 'es', 'de', 'pt', 'ru', 'zh', 'ja', 'ar', 'hi')", name="check_post_lang"),)
+    __table_args__ = ( UniqueConstraint('title', 'author_id', name='uix_title_author'), CheckConstraint("lang IN ('en', 'it', 'fr', 'es', 'de', 'pt', 'ru', 'zh', 'ja', 'ar', 'hi')", name="check_post_lang"),
+                       db.Index('ix_post_lang_created', 'lang', 'created', 'id'), db.Index('ix_post_lang_category_created', 'lang', 'category', 'created', 'id'), db.Index('ix_post_author_created', 'author_id', 'created', 'id'),)
     id = db.Column(db.BigInteger, primary_key=True)
     author_id = db.Column(db.BigInteger, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
     created = db.Column(db.DateTime, default=utcnow_naive, nullable=False)
@@ -171,8 +172,22 @@ class Post(db.Model):
     								     
 									     
 									     								     
+class PostSlugHistory(db.Model):
+    __tablename__ = 'post_slug_history'
+    slug = db.Column(db.String(60), primary_key=True)
+    post_id = db.Column(db.BigInteger, db.ForeignKey('post.id', ondelete='CASCADE'), nullable=False, index=True)
+    created = db.Column(db.DateTime, default=utcnow_naive, nullable=False)
+    
+    
+class SlugCounter(db.Model):
+    __tablename__ = 'slug_counter'
+    base = db.Column(db.String(60), primary_key=True)
+    n = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    
+    
 class Comment(db.Model):
     __tablename__ = 'comment'
+    __table_args__ = (db.Index('ix_comment_post_author', 'post_id', 'author_id'), db.Index('ix_comment_post_parent_likes', 'post_id', 'parent_id', 'likes', 'created', 'id'), db.Index('ix_comment_post_parent_created', 'post_id', 'parent_id', 'created', 'id'), db.Index('ix_comment_deleted', 'is_deleted'), db.Index('ix_comment_post_parent_score', 'post_id', 'parent_id', 'score', 'created', 'id'),)
     id = db.Column(db.BigInteger, primary_key=True)
     post_id = db.Column(db.BigInteger, db.ForeignKey('post.id', ondelete='CASCADE'), nullable=False)
     author_id = db.Column(db.BigInteger, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
@@ -182,6 +197,17 @@ class Comment(db.Model):
     likes = db.Column(db.BigInteger, default=0, server_default="0")
     dislikes = db.Column(db.BigInteger, default=0, server_default="0")
     n_replies = db.Column(db.BigInteger, default= 0)
+    is_deleted = db.Column(db.Boolean, default=False, server_default="0", nullable=False)
+    score = db.Column(db.Double, default=0, server_default="0", nullable=False)
+    
+
+# Every (ancestor, descendant) pair of the comment tree, including each comment with itself at depth 0.
+class CommentClosure(db.Model):
+    __tablename__ = 'comment_closure'
+    __table_args__ = (db.Index('ix_comment_closure_descendant', 'descendant_id', 'depth'),)
+    ancestor_id = db.Column(db.BigInteger, db.ForeignKey('comment.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.BigInteger, db.ForeignKey('comment.id', ondelete='CASCADE'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
     
 
 class BlacklistedEmails(db.Model):
@@ -210,6 +236,7 @@ class FileUpload(db.Model):
     filename = Column(db.String(80), nullable=True, default=None) 
     thumbnail = Column(db.String(80), nullable=True, default=None)
     is_ondisk = Column(db.Boolean, nullable=False, default=True)
+    public_urls = Column(JSON, nullable=True, default=None)
     
 class Notification(db.Model):
     __tablename__ = 'notifications'
@@ -0,0 +1,32 @@
+import os
+from gevent import monkey, get_hub
+from gevent.lock import BoundedSemaphore
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+###############################################################################################################
+##############################################Password Hashing#################################################
+###############################################################################################################
+
+# pbkdf2 runs for tens of milliseconds and, called from a request greenlet, holds the gevent hub (and every chat
+# socket on the worker) for that long. Under the gevent patch it runs on the hub's native threadpool instead,
+# where hashlib releases the GIL, with at most PASSWORD_HASH_CONCURRENCY hashes at once so a login burst can't
+# take every core; unpatched processes (celery, CLI) hash inline.
+PASSWORD_HASH_METHOD = "pbkdf2:sha256"
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", 4))
+password_hash_slots = BoundedSemaphore(PASSWORD_HASH_CONCURRENCY)
+
+
+def run_password_kdf(fn, *args, **kwargs):
+    if not monkey.is_module_patched("threading"):
+        return fn(*args, **kwargs)
+    with password_hash_slots:
+        return get_hub().threadpool.apply(fn, args, kwargs)
+
+
+def hash_password(password):
+    return run_password_kdf(generate_password_hash, password, method=PASSWORD_HASH_METHOD)
+
+
+def verify_password(pwhash, password):
+    return run_password_kdf(check_password_hash, pwhash, password)
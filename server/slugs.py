@@ -0,0 +1,23 @@
+from slugify import slugify
+
+
+###############################################################################################################
+##################################################Post Slugs###################################################
+###############################################################################################################
+
+# Allocation of post slugs, kept free of the app and the database so it can be tested on its own; blog.create_slug
+# wires it to slug_counter, post and post_slug_history.
+SLUG_BASE_MAX = 50
+
+
+def slug_base(title):
+    return slugify(title, max_length=SLUG_BASE_MAX) or "post"
+
+
+# bump() returns the next suffix for base (0 the first time), taken(slug) whether the slug is already in use
+def next_free_slug(base, bump, taken):
+    while True:
+        n = bump()
+        slug = f"{base}-{n}" if n else base
+        if not taken(slug):
+            return slug
@@ -0,0 +1,37 @@
+from server.slugs import next_free_slug, slug_base
+
+
+# slug_counter, post.slug and the seeding create_slug does, kept in memory
+class SlugStore:
+
+    def __init__(self):
+        self.counters = {}
+        self.slugs = set()
+
+    def create(self, title):
+        base = slug_base(title)
+
+        def bump():
+            self.counters[base] = self.counters[base] + 1 if base in self.counters else 0
+            return self.counters[base]
+
+        slug = next_free_slug(base, bump, self.slugs.__contains__)
+        if slug != base:
+            self.counters.setdefault(slug, 0)
+        self.slugs.add(slug)
+        return slug
+
+
+def test_suffix_skips_slug_taken_by_another_title():
+    store = SlugStore()
+    assert store.create("Foo 1") == "foo-1"
+    assert store.create("Foo") == "foo"
+    assert store.create("Foo") == "foo-2"
+    assert store.create("Foo") == "foo-3"
+
+
+def test_derived_slug_seeds_its_own_counter():
+    store = SlugStore()
+    assert store.create("Foo") == "foo"
+    assert store.create("Foo") == "foo-1"
+    assert store.create("Foo 1") == "foo-1-1"